@@ -0,0 +1,117 @@
+"""In-memory stand-in for the Postgres connection pool, for offline benchmarks.
+
+install() puts a FakePool in place of utils.db_client's process-wide pool,
+so DBClient.insert_artifacts runs its real code path (row building and
+execute_values, including value quoting) against connections that only
+count statements and optionally sleep to simulate a round trip.
+"""
+
+import os
+import threading
+import time
+from typing import Any, List, Tuple
+
+from psycopg2.extensions import QuotedString
+from psycopg2.extras import Json
+
+from utils import db_client
+
+
+def _quote(value: Any) -> bytes:
+    if value is None:
+        return b"NULL"
+    if isinstance(value, Json):
+        value = value.dumps(value.adapted)
+    qs = QuotedString(str(value))
+    qs.encoding = "utf8"
+    return qs.getquoted()
+
+
+class FakeCursor:
+    def __init__(self, conn: "FakeConnection"):
+        self.connection = conn
+
+    def mogrify(self, template: bytes, args: Tuple[Any, ...]) -> bytes:
+        return b"(" + b",".join(_quote(a) for a in args) + b")"
+
+    def execute(self, sql: Any, args: Any = None):
+        self.connection.pool.record(len(sql))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    encoding = "UTF8"
+    closed = 0
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.pool.latency:
+            time.sleep(self.pool.latency)
+        self.pool.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """
+    Connection pool whose connections accept any statement.
+
+    `latency` seconds are slept on every commit, in the calling thread,
+    as a real round trip would.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.statements = 0
+        self.sql_bytes = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def record(self, size: int):
+        with self._lock:
+            self.statements += 1
+            self.sql_bytes += size
+
+    def getconn(self) -> FakeConnection:
+        return FakeConnection(self)
+
+    def putconn(self, conn: FakeConnection, close: bool = False):
+        pass
+
+    def closeall(self):
+        pass
+
+
+def install(latency: float = 0.0, maxconn: int = 10) -> FakePool:
+    """Replace the process-wide DB pool with a FakePool and return it."""
+    pool = FakePool(latency)
+    with db_client._pool_lock:
+        db_client._pool = pool
+        db_client._pool_slots = threading.BoundedSemaphore(maxconn)
+        db_client._pool_pid = os.getpid()
+    return pool
+
+
+def sample_artifacts(n: int, content_chars: int = 1500) -> List[dict]:
+    """Artifact dicts shaped like the pipeline's, for insert benchmarks."""
+    content = ("lorem ipsum dolor sit amet " * (content_chars // 27 + 1))[:content_chars]
+    return [
+        {
+            "id": f"know_bench{i:08d}",
+            "created_at": "2025-01-01T00:00:00Z",
+            "content": content,
+            "epistemic_trace": {
+                "justification": "Offline benchmark verdict.",
+                "diagnostic_flags": [],
+                "detected_by": "EpistemicContourAgent",
+            },
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,169 @@
+"""Local stand-in for the OpenAI model, for offline benchmarks.
+
+FakeModel implements the Agents SDK Model interface. It sleeps for a
+configurable latency (plus uniform jitter), fails a configurable fraction
+of calls, and otherwise answers with schema-valid output: contour results
+for every segment in the input, or a call to the first tool when the agent
+has tools (the assembler). Verdicts, and the confidence reported when the
+schema asks for one (the cascade's fast tier), are derived from a hash of
+the segment id, so the same input always yields the same artifacts
+regardless of the order in which concurrent calls complete.
+"""
+
+import asyncio
+import json
+import random
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from agents.items import ModelResponse
+from agents.models.interface import Model, ModelProvider
+from agents.usage import Usage
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+
+
+class FakeModelError(Exception):
+    """Injected model failure."""
+
+
+def _last_user_text(model_input: Any) -> str:
+    if isinstance(model_input, str):
+        return model_input
+    for item in reversed(model_input):
+        if isinstance(item, dict) and item.get("role") == "user" and isinstance(item.get("content"), str):
+            return item["content"]
+    raise ValueError("No user message in model input")
+
+
+def _result_fields(output_schema: Any) -> set:
+    """Fields of one result in the contour output schema (e.g. "text" if it is echoed back)."""
+    schema = output_schema.json_schema()
+    items = schema["properties"]["segments"]["items"]
+    if "$ref" in items:
+        items = schema["$defs"][items["$ref"].rsplit("/", 1)[-1]]
+    return set(items.get("properties", {}))
+
+
+class FakeModel(Model):
+    """
+    Model that answers locally after a simulated delay.
+
+    `latency` and `jitter` are in seconds; each call sleeps for
+    latency ± jitter (uniformly). `error_rate` is the fraction of calls that
+    raise FakeModelError, and `artifact_rate` the fraction of segments
+    judged to be artifacts.
+    """
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        artifact_rate: float = 0.5,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.artifact_rate = artifact_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        # Wall time of every call, including the simulated delay
+        self.call_seconds: List[float] = []
+
+    def is_artifact(self, segment_id: str) -> bool:
+        return zlib.crc32(segment_id.encode("utf-8")) % 1000 < self.artifact_rate * 1000
+
+    def confidence(self, segment_id: str) -> float:
+        """Self-rated confidence between 0.5 and 1, skewed towards 1."""
+        u = zlib.crc32(f"confidence:{segment_id}".encode("utf-8")) % 1000 / 1000
+        return round(1 - u ** 3 * 0.5, 3)
+
+    def _respond(self, text: str, tools: list, output_schema: Any) -> Any:
+        if tools:
+            tool = tools[0]
+            arg = next(iter(tool.params_json_schema["properties"]))
+            return ResponseFunctionToolCall(
+                id=f"fc_{self.calls}",
+                call_id=f"call_{self.calls}",
+                name=tool.name,
+                arguments=json.dumps({arg: text}),
+                type="function_call",
+                status="completed",
+            )
+        data = json.loads(text)
+        segments = data["segments"] if "segments" in data else [data]
+        fields = _result_fields(output_schema)
+        results = []
+        for seg in segments:
+            res = {
+                "id": seg["id"],
+                "is_artifact": self.is_artifact(seg["id"]),
+                "justification": "Offline benchmark verdict.",
+                "diagnostic_flags": [],
+            }
+            if "text" in fields:
+                res["text"] = seg["text"]
+            if "confidence" in fields:
+                res["confidence"] = self.confidence(seg["id"])
+            results.append(res)
+        return ResponseOutputMessage(
+            id=f"msg_{self.calls}",
+            type="message",
+            role="assistant",
+            status="completed",
+            content=[ResponseOutputText(type="output_text", text=json.dumps({"segments": results}), annotations=[])],
+        )
+
+    async def get_response(
+        self,
+        system_instructions: Optional[str],
+        input: Any,
+        model_settings: Any,
+        tools: list,
+        output_schema: Any,
+        handoffs: list,
+        tracing: Any,
+        *,
+        previous_response_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        prompt: Any = None,
+    ) -> ModelResponse:
+        start = time.perf_counter()
+        self.calls += 1
+        try:
+            await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+            if self._rng.random() < self.error_rate:
+                self.errors += 1
+                raise FakeModelError("Injected model failure")
+            text = _last_user_text(input)
+            item = self._respond(text, tools, output_schema)
+        finally:
+            self.call_seconds.append(time.perf_counter() - start)
+        # Roughly four characters per token
+        input_tokens = len(text) // 4
+        output_tokens = len(item.model_dump_json()) // 4
+        return ModelResponse(
+            output=[item],
+            usage=Usage(
+                requests=1,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                total_tokens=input_tokens + output_tokens,
+            ),
+            response_id=None,
+        )
+
+    async def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        raise NotImplementedError("FakeModel does not support streaming")
+
+
+class FakeModelProvider(ModelProvider):
+    """Serves the FakeModel in `models` by model name, and `model` for every other name."""
+    def __init__(self, model: FakeModel, models: Optional[Dict[str, FakeModel]] = None):
+        self.model = model
+        self.models = models or {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return self.models.get(model_name, self.model)
@@ -0,0 +1,375 @@
+"""Offline benchmarks for the artifacting pipeline.
+
+Runs the real segmentation, SegmentPipeline, run_pipeline (CLI), run_ingest
+(API) and DBClient.insert_artifacts code against a local FakeModel and an
+in-memory DB pool, so no network access or API credits are needed. Inputs
+are data/input_sessions/gpt-session.txt and synthetic sessions built by
+reshuffling its paragraphs up to a multiple of its size.
+
+Usage (from the repository root):
+    python -m benchmarks.run
+    python -m benchmarks.run --scales 1,4,16 --latency 0.05 --jitter 0.02 --error-rate 0.01
+    python -m benchmarks.run --json bench.json --baseline main.json --max-regression 0.2
+
+The report gives throughput, per-stage latency percentiles and peak traced
+memory per scenario; the pipeline_cascade scenarios add a fast tier four
+times quicker than the main model (see utils.cascade). With --baseline, the exit status is 1 if any scenario's
+throughput dropped by more than --max-regression relative to the baseline.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Keep every side effect of the pipeline inside a scratch directory, and make
+# sure nothing can reach the real API or database
+_SCRATCH = tempfile.mkdtemp(prefix="artifact-bench-")
+os.environ["ARTIFACT_STORE_DIR"] = str(Path(_SCRATCH) / "artifacts")
+os.environ["VERDICT_CACHE_PATH"] = ""
+os.environ["DEDUP_INDEX_PATH"] = ""
+os.environ["PREFILTER_THRESHOLD"] = "0"
+os.environ["DB_WRITE_BEHIND"] = "false"
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from agents import set_tracing_disabled  # noqa: E402
+from agents.run import RunConfig  # noqa: E402
+
+from benchmarks import fake_db  # noqa: E402
+from benchmarks.fake_model import FakeModel, FakeModelProvider  # noqa: E402
+from orchestration import api  # noqa: E402
+from orchestration.main import run_pipeline  # noqa: E402
+from orchestration.pipeline import SegmentPipeline  # noqa: E402
+from project_agents.epistemic_contour_agent import EpistemicContourAgent  # noqa: E402
+from project_agents.artifact_assembler_agent import ArtifactAssemblerAgent  # noqa: E402
+from project_agents.segmentation import iter_lines, iter_paragraphs, iter_segments, segment_paragraphs  # noqa: E402
+from utils.config import PIPELINE_CONCURRENCY, CONTOUR_BATCH_CHARS  # noqa: E402
+from utils.cascade import CascadePolicy  # noqa: E402
+from utils.db_client import DBClient  # noqa: E402
+from utils.metrics import PipelineMetrics  # noqa: E402
+
+SESSION = ROOT / "data" / "input_sessions" / "gpt-session.txt"
+# Model name of the cascade's fast tier in the pipeline_cascade scenarios
+CASCADE_BENCH_MODEL = "fast-contour"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of `values` in milliseconds (nearest rank)."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(p * len(ordered)) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(rank(0.50), 3),
+        "p90_ms": round(rank(0.90), 3),
+        "p99_ms": round(rank(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def synthetic_session(base: str, scale: float, seed: int = 0) -> str:
+    """
+    A session of roughly `scale` times the size of `base`, made of its
+    paragraphs in shuffled order (so it segments like real input but does
+    not simply repeat it).
+    """
+    if scale == 1:
+        return base
+    paragraphs = [p for p in base.split("\n\n") if p.strip()]
+    rng = random.Random(seed)
+    target = int(len(base) * scale)
+    out: List[str] = []
+    size = 0
+    while size < target:
+        rng.shuffle(paragraphs)
+        for para in paragraphs:
+            out.append(para)
+            size += len(para) + 2
+            if size >= target:
+                break
+    return "\n\n".join(out)
+
+
+class Timeline:
+    """Records when each segment leaves segmentation and reaches later stages."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.emitted: Dict[str, float] = {}
+        self.stages: Dict[str, List[float]] = {"segmentation": [], "verdict": [], "artifact": []}
+
+    def segments(self, source: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        last = time.perf_counter()
+        for seg in source:
+            now = time.perf_counter()
+            self.stages["segmentation"].append(now - last)
+            self.emitted[seg["id"]] = now
+            yield seg
+            last = time.perf_counter()
+
+    def on_outcome(self, event: str, outcome: Any):
+        if event in ("verdict", "artifact"):
+            self.stages[event].append(time.perf_counter() - self.emitted[outcome.segment_id])
+
+
+def measure(func: Callable[[], Dict[str, Any]], memory: bool) -> Dict[str, Any]:
+    """Run a scenario for timing and, if asked, once more under tracemalloc."""
+    result = func()
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_segmentation(text: str, mode: str = "paragraph", repeat: int = 3) -> Dict[str, Any]:
+    """The `mode` segmenter over the whole text, best of `repeat` runs."""
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(list(segment_paragraphs(iter_paragraphs(iter_lines(text)), mode)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "segments": count,
+        "seconds": round(best, 4),
+        "mb_per_s": round(len(text.encode("utf-8")) / 1e6 / best, 2),
+        "segments_per_s": round(count / best, 1),
+    }
+
+
+def bench_pipeline(
+    text: str, model: FakeModel, args: argparse.Namespace, fast: Optional[FakeModel] = None
+) -> Dict[str, Any]:
+    """
+    SegmentPipeline over the streamed session, with per-stage latencies.
+    With `fast`, segments go through a model cascade with that model as
+    its fast tier.
+    """
+    models = {CASCADE_BENCH_MODEL: fast} if fast is not None else None
+    run_config = RunConfig(model_provider=FakeModelProvider(model, models), tracing_disabled=True)
+    calls_before = len(model.call_seconds)
+    timeline = Timeline()
+    cascade: Dict[str, Any] = {}
+    if fast is not None:
+        cascade = dict(
+            fast_contour_agent=EpistemicContourAgent(model=CASCADE_BENCH_MODEL, with_confidence=True),
+            cascade=CascadePolicy(),
+            metrics=PipelineMetrics(),
+        )
+    pipeline = SegmentPipeline(
+        EpistemicContourAgent(),
+        ArtifactAssemblerAgent() if args.assembler == "agent" else None,
+        concurrency=args.concurrency,
+        batch_chars=args.batch_chars,
+        on_outcome=timeline.on_outcome,
+        run_config=run_config,
+        **cascade,
+    )
+    segments = timeline.segments(iter_segments(iter_paragraphs(io.StringIO(text))))
+    start = time.perf_counter()
+    outcomes = asyncio.run(pipeline.run(segments))
+    elapsed = time.perf_counter() - start
+    stages = {name: percentiles(values) for name, values in timeline.stages.items()}
+    stages["model_call"] = percentiles(model.call_seconds[calls_before:])
+    result = {
+        "segments": len(outcomes),
+        "artifacts": sum(1 for o in outcomes if o.artifact is not None),
+        "errors": sum(1 for o in outcomes if o.error),
+        "model_calls": len(model.call_seconds) - calls_before,
+        "seconds": round(elapsed, 4),
+        "segments_per_s": round(len(outcomes) / elapsed, 1),
+        "stages": stages,
+    }
+    if fast is not None:
+        result["fast_model_calls"] = len(fast.call_seconds)
+        result["cascade"] = cascade["metrics"].report()["cascade"]
+    return result
+
+
+def bench_cli(path: Path, model: FakeModel, args: argparse.Namespace) -> Dict[str, Any]:
+    """orchestration.main.run_pipeline end to end, with its console output discarded."""
+    run_config = RunConfig(model_provider=FakeModelProvider(model), tracing_disabled=True)
+    calls_before = len(model.call_seconds)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        asyncio.run(run_pipeline(
+            str(path),
+            concurrency=args.concurrency,
+            batch_chars=args.batch_chars,
+            assembler=args.assembler,
+            use_cache=False,
+            use_dedup=False,
+            run_config=run_config,
+        ))
+    elapsed = time.perf_counter() - start
+    generated = re.search(r"^\[\+\] Generated (\d+) segments", out.getvalue(), re.M)
+    segments = int(generated.group(1)) if generated else 0
+    return {
+        "segments": segments,
+        "model_calls": len(model.call_seconds) - calls_before,
+        "seconds": round(elapsed, 4),
+        "segments_per_s": round(segments / elapsed, 1),
+    }
+
+
+def bench_ingest(text: str, model: FakeModel, pool: fake_db.FakePool) -> Dict[str, Any]:
+    """orchestration.api.run_ingest with the session split into turns, against the fake DB."""
+    run_config = RunConfig(model_provider=FakeModelProvider(model), tracing_disabled=True)
+    turns = [{"text": turn} for turn in text.split("\n\n\n") if turn.strip()]
+    commits_before = pool.commits
+    counts: Dict[str, int] = {}
+
+    def progress(stage: str, count: int):
+        counts[stage] = counts.get(stage, 0) + count
+
+    start = time.perf_counter()
+    result = asyncio.run(api.run_ingest(turns, progress=progress, run_config=run_config))
+    elapsed = time.perf_counter() - start
+    return {
+        "turns": len(turns),
+        "segments": counts.get("segmented", 0),
+        "knowledge_ids": len(result["knowledge_ids"]),
+        "errors": len(result["errors"]),
+        "db_commits": pool.commits - commits_before,
+        "seconds": round(elapsed, 4),
+        "segments_per_s": round(counts.get("segmented", 0) / elapsed, 1),
+    }
+
+
+def bench_db_insert(rows: int, batch: int) -> Dict[str, Any]:
+    """DBClient.insert_artifacts in batches of `batch` rows against the fake pool."""
+    artifacts = fake_db.sample_artifacts(rows)
+    client = DBClient()
+    per_call: List[float] = []
+    start = time.perf_counter()
+    for i in range(0, rows, batch):
+        t = time.perf_counter()
+        client.insert_artifacts(artifacts[i:i + batch])
+        per_call.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "batch": batch,
+        "seconds": round(elapsed, 4),
+        "rows_per_s": round(rows / elapsed, 1),
+        "stages": {"insert_call": percentiles(per_call)},
+    }
+
+
+def throughput(result: Dict[str, Any]) -> float:
+    for key in ("segments_per_s", "rows_per_s"):
+        if key in result:
+            return result[key]
+    return 0.0
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Scenarios whose throughput fell more than `max_regression` below the baseline."""
+    failures = []
+    for name, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or not throughput(base):
+            continue
+        change = throughput(result) / throughput(base) - 1
+        if change < -max_regression:
+            failures.append(f"{name}: {throughput(result)} vs {throughput(base)} ({change:+.1%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline pipeline benchmarks.")
+    parser.add_argument('--scales', default="1,4", help='Comma-separated session size multiples (default: 1,4).')
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake model latency in seconds (default: 0.02).')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Uniform latency jitter in seconds (default: 0.01).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of model calls that fail (default: 0).')
+    parser.add_argument('--artifact-rate', type=float, default=0.5, help='Fraction of segments judged artifacts (default: 0.5).')
+    parser.add_argument('--concurrency', type=int, default=PIPELINE_CONCURRENCY, help='Model calls in flight.')
+    parser.add_argument('--batch-chars', type=int, default=CONTOUR_BATCH_CHARS, help='Contour batch size in characters.')
+    parser.add_argument('--assembler', choices=['local', 'agent'], default='local', help='Artifact assembly mode.')
+    parser.add_argument('--db-latency', type=float, default=0.0, help='Simulated seconds per DB commit (default: 0).')
+    parser.add_argument('--db-rows', type=int, default=5000, help='Rows for the insert benchmark (default: 5000).')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass for peak memory.')
+    parser.add_argument('--json', help='Also write the report to this file.')
+    parser.add_argument('--baseline', help='Earlier --json report to compare throughput against.')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed throughput drop vs. baseline (default: 0.2).')
+    args = parser.parse_args()
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(_SCRATCH, ignore_errors=True)
+
+
+def run(args: argparse.Namespace):
+    set_tracing_disabled(True)
+    pool = fake_db.install(latency=args.db_latency)
+    base = SESSION.read_text(encoding="utf-8")
+    memory = not args.no_memory
+
+    def new_model(latency: Optional[float] = None) -> FakeModel:
+        return FakeModel(args.latency if latency is None else latency, args.jitter, args.error_rate, args.artifact_rate)
+
+    scenarios: Dict[str, Any] = {}
+    for scale in (float(s) for s in args.scales.split(",")):
+        text = synthetic_session(base, scale)
+        path = Path(_SCRATCH) / f"session-x{scale:g}.txt"
+        path.write_text(text, encoding="utf-8")
+        label = f"x{scale:g}"
+        scenarios[f"segmentation/{label}"] = measure(lambda: bench_segmentation(text), memory)
+        scenarios[f"segmentation_topic/{label}"] = measure(lambda: bench_segmentation(text, "topic"), memory)
+        scenarios[f"pipeline/{label}"] = measure(lambda: bench_pipeline(text, new_model(), args), memory)
+        scenarios[f"pipeline_cascade/{label}"] = measure(
+            lambda: bench_pipeline(text, new_model(), args, fast=new_model(args.latency / 4)), memory
+        )
+        scenarios[f"cli/{label}"] = measure(lambda: bench_cli(path, new_model(), args), memory)
+        scenarios[f"ingest/{label}"] = measure(lambda: bench_ingest(text, new_model(), pool), memory)
+    for batch in (1, 100, 1000):
+        scenarios[f"db_insert/batch{batch}"] = measure(lambda: bench_db_insert(args.db_rows, batch), memory)
+
+    report = {
+        "settings": {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "artifact_rate": args.artifact_rate,
+            "concurrency": args.concurrency,
+            "batch_chars": args.batch_chars,
+            "assembler": args.assembler,
+            "db_latency": args.db_latency,
+        },
+        "scenarios": scenarios,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        failures = compare(report, baseline, args.max_regression)
+        if failures:
+            print("Throughput regressions:\n  " + "\n  ".join(failures), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
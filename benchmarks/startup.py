@@ -0,0 +1,146 @@
+"""Import-time and cold-start benchmarks.
+
+Each measurement runs in a fresh interpreter, so nothing is cached between
+runs: the time to import an entry point (the segmenter, submit_to_db.py,
+the CLI, the API), and the API's cold start, i.e. importing the app and
+warming up its registry (see orchestration.registry) as a new worker does.
+The report also lists which heavy dependencies (the Agents SDK, openai,
+psycopg2, numpy) each import pulled in, so an eager import that slips back
+in shows up even where the time barely moves.
+
+Usage (from the repository root):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --json startup.json
+    python -m benchmarks.startup --baseline startup.json --max-regression 0.2
+
+With --baseline, the exit status is 1 if any scenario's best time grew by
+more than --max-regression (and by at least --min-delta-ms) relative to the
+baseline.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Entry points whose import time is tracked
+IMPORTS = (
+    "utils.config",
+    "project_agents.segmentation",
+    "submit_to_db",
+    "orchestration.pipeline",
+    "orchestration.main",
+    "orchestration.api",
+)
+# Dependencies that take tens of milliseconds or more to import
+HEAVY_MODULES = ("agents", "openai", "psycopg2", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{after}
+done = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "total_ms": (done - start) * 1000,
+    "loads": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def probe(module: str, scratch: str, warm_up: bool = False) -> Dict[str, Any]:
+    """Import `module` (then warm up the API registry, if asked) in a new interpreter and time it."""
+    after = "from orchestration import registry; registry.warm_up()" if warm_up else ""
+    code = _PROBE.format(module=module, after=after, heavy=HEAVY_MODULES)
+    env = dict(os.environ)
+    # Stores are opened in a scratch directory; a placeholder key lets the agents be built
+    env.update(
+        PYTHONPATH=str(ROOT),
+        OPENAI_API_KEY=env.get("OPENAI_API_KEY") or "offline-benchmark",
+        ARTIFACT_STORE_DIR=str(Path(scratch) / "artifacts"),
+        VERDICT_CACHE_PATH=str(Path(scratch) / "verdicts.sqlite3"),
+        DEDUP_INDEX_PATH=str(Path(scratch) / "dedup.sqlite3"),
+        THREAD_STATE_PATH=str(Path(scratch) / "threads.sqlite3"),
+        JOB_STATE_PATH=str(Path(scratch) / "jobs.sqlite3"),
+        PREFILTER_AUDIT_PATH=str(Path(scratch) / "prefilter_audit.jsonl"),
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=scratch, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(module: str, repeat: int, scratch: str, warm_up: bool = False) -> Dict[str, Any]:
+    """Best and median of `repeat` fresh runs."""
+    runs = [probe(module, scratch, warm_up) for _ in range(repeat)]
+    key = "total_ms" if warm_up else "import_ms"
+    times = [run[key] for run in runs]
+    result = {
+        "best_ms": round(min(times), 1),
+        "median_ms": round(statistics.median(times), 1),
+        "loads": runs[0]["loads"],
+    }
+    if warm_up:
+        result["import_ms"] = round(min(run["import_ms"] for run in runs), 1)
+    return result
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float, min_delta_ms: float
+) -> List[str]:
+    """Scenarios whose best time grew more than `max_regression` (and `min_delta_ms`) over the baseline."""
+    failures = []
+    for name, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or not base.get("best_ms"):
+            continue
+        delta = result["best_ms"] - base["best_ms"]
+        change = delta / base["best_ms"]
+        if change > max_regression and delta >= min_delta_ms:
+            failures.append(f"{name}: {result['best_ms']}ms vs {base['best_ms']}ms ({change:+.1%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import times and the API's cold start.")
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per scenario (default: 5).')
+    parser.add_argument('--json', help='Also write the report to this file.')
+    parser.add_argument('--baseline', help='Earlier --json report to compare against.')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed slowdown vs. baseline (default: 0.2).')
+    parser.add_argument('--min-delta-ms', type=float, default=20.0,
+                        help='Ignore slowdowns smaller than this many milliseconds (default: 20).')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="artifact-startup-")
+    try:
+        scenarios: Dict[str, Any] = {}
+        for module in IMPORTS:
+            scenarios[f"import/{module}"] = measure(module, args.repeat, scratch)
+        scenarios["cold_start/api"] = measure("orchestration.api", args.repeat, scratch, warm_up=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {"settings": {"repeat": args.repeat, "python": sys.version.split()[0]}, "scenarios": scenarios}
+    print(json.dumps(report, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        failures = compare(report, baseline, args.max_regression, args.min_delta_ms)
+        if failures:
+            print("Startup regressions:\n  " + "\n  ".join(failures), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,661 @@
+import asyncio
 import json
+import logging
+import os
+import weakref
+from contextlib import asynccontextmanager, nullcontext
+from itertools import islice
+from typing import (
+    TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+)
 
 from starlette.applications import Starlette
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from starlette.routing import Route
 
 import uvicorn
 
-from utils.db_client import DBClient
-from project_agents.segmentation_agent import segmentation_agent
-from project_agents.epistemic_contour_agent import EpistemicContourAgent
-from project_agents.artifact_assembler_agent import ArtifactAssemblerAgent
-from agents.run import Runner
+from utils.config import (
+    PIPELINE_CONCURRENCY,
+    CONTOUR_BATCH_CHARS,
+    INGEST_JOB_WORKERS,
+    INGEST_JOB_QUEUE_DEPTH,
+    DB_WRITE_BEHIND,
+    DB_FLUSH_INTERVAL_MS,
+    DB_FLUSH_MAX_ROWS,
+    ARTIFACT_PAGE_SIZE,
+    ARTIFACT_MAX_PAGE_SIZE,
+    INGEST_MAX_BODY_MB,
+    WARM_UP_ON_START,
+)
+from utils.db_client import DBClient, ArtifactWriteBuffer, close_pool
+from utils.artifact_query import decode_cursor, encode_cursor
+from utils.models import SegmentOutcome
+from utils.segments import SegmentSpan, SessionBuffer, segment_spans
+from utils.json_stream import InvalidJSONError, JSONObjectStream, PayloadTooLargeError
+from utils.metrics import Gauge, PipelineMetrics
+from project_agents.artifact_assembly import get_artifact_store
+from project_agents.segmentation import iter_turn_paragraphs, segment_builder
+from orchestration.pipeline import SegmentPipeline, ProgressHook
+from orchestration.jobs import JobManager, QueueFullError
+from orchestration.scheduler import BATCH, INTERACTIVE, get_scheduler
+from orchestration.incremental import IngestPlan, ThreadConflictError, plan_ingest, finish_ingest
+from orchestration import registry
+from orchestration.registry import (  # noqa: F401
+    get_artifact_query,
+    get_dedup_index,
+    get_job_store,
+    get_prefilter,
+    get_thread_store,
+    get_verdict_cache,
+)
+
+if TYPE_CHECKING:
+    from agents.run import RunConfig
+
+# Startup messages go to uvicorn's log, which is configured when the app runs under it
+logger = logging.getLogger("uvicorn.error")
+# One lock per thread being ingested, so requests for the same thread in this process take turns
+_thread_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+job_manager = JobManager(workers=INGEST_JOB_WORKERS, max_queue=INGEST_JOB_QUEUE_DEPTH)
+# Shared group-commit buffer, created at startup when DB_WRITE_BEHIND is enabled
+write_buffer = None
+# Process-wide pipeline metrics, exposed at /metrics
+metrics = PipelineMetrics()
+metrics.registry.register(Gauge(
+    "artifacting_ingest_jobs_queued", "Async ingest jobs waiting for a worker.",
+    callback=lambda: job_manager.queue_depth,
+))
+metrics.registry.register(Gauge(
+    "artifacting_model_concurrency_limit", "Current adaptive limit on concurrent model calls.",
+    callback=lambda: get_scheduler().limit,
+))
+metrics.registry.register(Gauge(
+    "artifacting_model_calls_throttled", "Model calls rejected with HTTP 429 since startup.",
+    callback=lambda: get_scheduler().throttled,
+))
+
+
+def thread_lock(user_id, thread_id) -> asyncio.Lock:
+    """Lock serializing ingests of one thread within this process."""
+    key = (str(user_id), str(thread_id))
+    lock = _thread_locks.get(key)
+    if lock is None:
+        lock = _thread_locks[key] = asyncio.Lock()
+    return lock
+
+
+def turn_text(turn) -> str:
+    """Extract the text of a single conversation turn."""
+    if isinstance(turn, dict):
+        if "text" in turn:
+            return turn["text"]
+        if "content" in turn:
+            return turn["content"]
+        return json.dumps(turn)
+    if isinstance(turn, str):
+        return turn
+    return str(turn)
+
+
+async def iter_turn_texts(turns: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[str]:
+    """The text of every turn, from a list or from turns parsed as a request body arrives."""
+    if hasattr(turns, "__aiter__"):
+        async for turn in turns:
+            yield turn_text(turn)
+    else:
+        for turn in turns:
+            yield turn_text(turn)
+
+
+async def segment_turns(texts: AsyncIterable[str]) -> AsyncIterator[SegmentSpan]:
+    """Segment turns as they arrive; the same segments as segment_paragraphs over all of them."""
+    builder = segment_builder()
+    buffer = SessionBuffer()
+    async for text in texts:
+        for seg in segment_spans(builder.feed(iter_turn_paragraphs([text])), buffer):
+            yield seg
+    for seg in segment_spans(builder.finish(), buffer):
+        yield seg
+
+
+class DBInsertionError(Exception):
+    """Raised when artifacts could not be written to the database."""
+
+
+def build_pipeline(
+    progress: Optional[ProgressHook] = None,
+    run_config: Optional["RunConfig"] = None,
+    priority: int = INTERACTIVE,
+    user_id=None,
+    thread_id=None,
+    provisional=None,
+) -> SegmentPipeline:
+    """
+    SegmentPipeline configured for the API from utils.config, sharing the
+    process-wide model scheduler at the given priority. Artifacts are
+    tagged with the user and thread they came from. Agents and stores come
+    from this worker's registry, so they are built once, not per request.
+    Dedup entries of new artifacts are resolved by the caller once the
+    artifacts are in the database; `provisional` segments get none.
+    """
+    fast_agent, cascade = registry.get_cascade()
+    return SegmentPipeline(
+        registry.get_contour_agent(),
+        registry.get_assembler_agent(),
+        concurrency=PIPELINE_CONCURRENCY,
+        batch_chars=CONTOUR_BATCH_CHARS,
+        verdict_cache=get_verdict_cache(),
+        progress=progress,
+        dedup_index=get_dedup_index(),
+        prefilter=get_prefilter(),
+        run_config=run_config,
+        metrics=metrics,
+        scheduler=get_scheduler(),
+        priority=priority,
+        user_id=str(user_id) if user_id is not None else None,
+        thread_id=str(thread_id) if thread_id is not None else None,
+        fast_contour_agent=fast_agent,
+        cascade=cascade,
+        defer_dedup=True,
+        provisional=provisional,
+    )
+
+
+async def insert_artifact_dicts(art_dicts: list):
+    """Write artifacts through the group-commit buffer if running, else directly."""
+    with metrics.time("db_insert"):
+        if write_buffer is not None:
+            await write_buffer.write(art_dicts)
+        else:
+            await DBClient().insert_artifacts_async(art_dicts)
+    metrics.db_rows.inc(len(art_dicts))
+
+
+async def delete_artifacts(knowledge_ids: List[str]):
+    """Delete artifacts from the local store and the database."""
+    if not knowledge_ids:
+        return
+    await asyncio.to_thread(get_artifact_store().delete_many, knowledge_ids)
+    await DBClient().delete_artifacts_async(knowledge_ids)
+
+
+async def discard_artifacts(knowledge_ids: List[str]):
+    """
+    Delete the artifacts of an ingest that lost its thread to a concurrent
+    one, so none stays stored without a thread pointing to it. A failure is
+    logged, not raised: the caller is already reporting the conflict.
+    """
+    try:
+        await delete_artifacts(knowledge_ids)
+    except Exception:
+        logger.warning("Could not delete %d artifacts of a conflicting ingest", len(knowledge_ids), exc_info=True)
+
+
+async def run_ingest(
+    turns: Union[Iterable[Any], AsyncIterable[Any]],
+    progress: Optional[ProgressHook] = None,
+    run_config: Optional["RunConfig"] = None,
+    priority: int = INTERACTIVE,
+    user_id=None,
+    thread_id=None,
+) -> Dict[str, Any]:
+    """
+    Run the artifacting pipeline over a thread's turns and insert the artifacts.
+
+    Returns the knowledge_ids, any per-segment errors, and the segments
+    skipped as near-duplicates (with the knowledge_id they duplicate, if the
+    original became an artifact). Raises
+    DBInsertionError if the artifacts could not be stored.
+
+    Given user_id and thread_id (and with THREAD_STATE_PATH enabled), only
+    the turns added since the thread was last ingested are processed, and
+    knowledge_ids covers the whole thread; re-sending the same turns makes
+    no model calls. Raises ThreadConflictError if another worker advanced
+    the thread at the same time; the artifacts of this ingest are then
+    deleted again.
+
+    `turns` may be an async iterable, such as turns parsed from a request
+    body as it arrives; they are segmented as they come in.
+    """
+    texts = iter_turn_texts(turns)
+    store = get_thread_store() if user_id is not None and thread_id is not None else None
+    if store is None:
+        # 1. Segmentation, streamed turn by turn into the pipeline
+        segments = segment_turns(texts)
+        outcomes, knowledge_ids = await _run_segments(segments, progress, run_config, priority, user_id, thread_id)
+        return _ingest_result(knowledge_ids, outcomes)
+
+    async with thread_lock(user_id, thread_id):
+        # 1. Segmentation of the new turns, resumed from the thread's stored state
+        plan = plan_ingest(store, user_id, thread_id, texts)
+        outcomes, knowledge_ids = await _run_segments(
+            plan.asegments(), progress, run_config, priority, user_id, thread_id, plan=plan, store=store
+        )
+        # 6. Drop the artifacts of a tail that has changed
+        try:
+            await delete_artifacts(plan.superseded)
+        except Exception as e:
+            raise DBInsertionError(f"Deleting superseded artifacts failed: {str(e)}") from e
+    return {**_ingest_result(knowledge_ids, outcomes), "new_turns": plan.new_turns}
+
+
+async def _run_segments(
+    segments,
+    progress: Optional[ProgressHook],
+    run_config: Optional["RunConfig"],
+    priority: int,
+    user_id=None,
+    thread_id=None,
+    plan: Optional[IngestPlan] = None,
+    store=None,
+) -> Tuple[List[SegmentOutcome], List[str]]:
+    """
+    Run segments through a pipeline and insert their artifacts; returns the
+    outcomes and the knowledge_ids. With a `plan`, the thread's watermark
+    is then advanced in `store` (see finish_ingest); if another ingest got
+    there first, the artifacts are deleted again before ThreadConflictError
+    is raised. Dedup entries are only resolved once the artifacts are
+    stored and, with a plan, the thread points to them.
+    """
+    # 2. Epistemic contour filtering & assembly, segments processed concurrently
+    provisional = plan.in_tail if plan is not None else None
+    pipeline = build_pipeline(progress, run_config, priority, user_id, thread_id, provisional)
+    try:
+        outcomes = await pipeline.run(segments)
+        artifacts = [o.artifact for o in outcomes if o.artifact is not None]
+
+        # 3. Bulk insert artifacts into DB, off the event loop
+        try:
+            # Convert pydantic models to dicts for insertion
+            art_dicts = [a.model_dump() for a in artifacts]
+            await insert_artifact_dicts(art_dicts)
+        except Exception as e:
+            raise DBInsertionError(f"DB insertion failed: {str(e)}") from e
+        if plan is None:
+            knowledge_ids = [a.id for a in artifacts]
+        else:
+            # 5. Advance the thread's watermark
+            try:
+                knowledge_ids = finish_ingest(store, plan, outcomes)
+            except ThreadConflictError:
+                await discard_artifacts([a.id for a in artifacts])
+                raise
+        # Only stored artifacts may be linked to by later near-duplicates
+        pipeline.resolve_duplicates(outcomes)
+    finally:
+        # Failed insert, lost thread, or the run was aborted: forget entries that were never resolved
+        pipeline.release_duplicates()
+    if progress is not None and artifacts:
+        progress("inserted", len(artifacts))
+    return outcomes, knowledge_ids
+
+
+def _ingest_result(knowledge_ids: List[str], outcomes: List[SegmentOutcome]) -> Dict[str, Any]:
+    # 4. Return list of knowledge_ids
+    errors = [{"segment_id": o.segment_id, "error": o.error} for o in outcomes if o.error]
+    duplicates = [
+        {"segment_id": o.segment_id, "knowledge_id": o.duplicate_of}
+        for o in outcomes if o.skip_reason and o.skip_reason.startswith("near-duplicate")
+    ]
+    return {"knowledge_ids": knowledge_ids, "errors": errors, "duplicates": duplicates}
+
+
+async def stream_ingest(
+    turns: Union[Iterable[Any], AsyncIterable[Any]], user_id=None, thread_id=None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the pipeline over a thread's turns, yielding events as segments complete.
+
+    Yields a "verdict" event per judged segment, an "artifact" event per
+    artifact once it has been inserted, "skipped" for near-duplicates and
+    "error" for failed segments (including failed inserts), then a final
+    "summary" with the same fields as run_ingest's result. Closing the
+    generator cancels the remaining pipeline work. Threads are ingested
+    incrementally as in run_ingest; if a concurrent ingest advanced the
+    thread, the artifacts already sent are deleted again and the summary
+    reports the conflict.
+    """
+    texts = iter_turn_texts(turns)
+    store = get_thread_store() if user_id is not None and thread_id is not None else None
+    async with thread_lock(user_id, thread_id) if store is not None else nullcontext():
+        plan: Optional[IngestPlan] = None
+        if store is None:
+            segments = segment_turns(texts)
+        else:
+            plan = plan_ingest(store, user_id, thread_id, texts)
+            segments = plan.asegments()
+        # Latest outcome per segment, with failed inserts recorded as errors
+        outcomes: Dict[str, SegmentOutcome] = {}
+        knowledge_ids, errors, duplicates = [], [], []
+        # Outcomes whose artifacts were inserted
+        stored: List[SegmentOutcome] = []
+        pipeline = build_pipeline(
+            user_id=user_id, thread_id=thread_id, provisional=plan.in_tail if plan is not None else None
+        )
+        try:
+            async for event, outcome in pipeline.stream(segments):
+                outcomes[outcome.segment_id] = outcome
+                if event == "verdict":
+                    yield {
+                        "event": "verdict",
+                        "segment_id": outcome.segment_id,
+                        **outcome.verdict.model_dump(exclude={"id"}),
+                    }
+                elif event == "skipped":
+                    if outcome.skip_reason.startswith("near-duplicate"):
+                        duplicates.append({"segment_id": outcome.segment_id, "knowledge_id": outcome.duplicate_of})
+                    yield {"event": "skipped", "segment_id": outcome.segment_id,
+                           "reason": outcome.skip_reason, "knowledge_id": outcome.duplicate_of}
+                elif event == "error":
+                    errors.append({"segment_id": outcome.segment_id, "error": outcome.error})
+                    yield {"event": "error", "segment_id": outcome.segment_id, "error": outcome.error}
+                elif event == "artifact":
+                    art = outcome.artifact.model_dump()
+                    try:
+                        await insert_artifact_dicts([art])
+                    except Exception as e:
+                        error = f"DB insertion failed: {str(e)}"
+                        outcomes[outcome.segment_id] = outcome.replace(artifact=None, error=error)
+                        pipeline.release_duplicates([outcome.segment_id])
+                        errors.append({"segment_id": outcome.segment_id, "error": error})
+                        yield {"event": "error", "segment_id": outcome.segment_id, "error": error}
+                        continue
+                    stored.append(outcome)
+                    knowledge_ids.append(art["id"])
+                    yield {"event": "artifact", "segment_id": outcome.segment_id,
+                           "knowledge_id": art["id"], "artifact": art}
+            if plan is not None:
+                try:
+                    knowledge_ids = finish_ingest(store, plan, list(outcomes.values()))
+                    await delete_artifacts(plan.superseded)
+                except ThreadConflictError as e:
+                    await discard_artifacts([o.artifact.id for o in stored])
+                    stored, knowledge_ids = [], []
+                    errors.append({"segment_id": None, "error": str(e)})
+                except Exception as e:
+                    errors.append({"segment_id": None, "error": f"Deleting superseded artifacts failed: {str(e)}"})
+            # Only stored artifacts of a saved thread may be linked to by later near-duplicates
+            pipeline.resolve_duplicates(stored)
+        finally:
+            # Client went away, inserts failed or the thread was lost: forget unresolved entries
+            pipeline.release_duplicates()
+        summary: Dict[str, Any] = {"event": "summary"}
+        if plan is not None:
+            summary["new_turns"] = plan.new_turns
+    yield {**summary, "knowledge_ids": knowledge_ids, "errors": errors, "duplicates": duplicates}
+
+
+def stream_response(events: AsyncIterator[Dict[str, Any]], sse: bool) -> StreamingResponse:
+    """Encode ingest events as Server-Sent Events or newline-delimited JSON."""
+    async def body():
+        async for event in events:
+            data = json.dumps(event, ensure_ascii=False, default=str)
+            if sse:
+                yield f"event: {event['event']}\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    # Disable proxy buffering so each event reaches the client immediately
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def body_too_large(max_bytes: int) -> JSONResponse:
+    return JSONResponse({"error": f"Request body exceeds the limit of {max_bytes} bytes"}, status_code=413)
+
+
+async def body_turns(body: JSONObjectStream) -> AsyncIterator[Any]:
+    """The turns of a request body as they are parsed, then a check of the rest of the body."""
+    async for turn in body.items():
+        yield turn
+    # A malformed end of the body fails the ingest before the thread's tail is judged
+    await body.rest()
 
 
 async def ingest(request: Request):
     """
     Ingest endpoint: receives user_id, thread_id, and turns[] JSON.
     Runs artifacting pipeline and inserts artifacts into the database.
-    Returns list of knowledge_ids.
+    Returns list of knowledge_ids, plus any per-segment errors.
+
+    Turns already ingested for the same user_id and thread_id are not
+    processed again: only new turns are, and knowledge_ids lists the
+    artifacts of the whole thread. A repeated payload is a no-op. 409 means
+    another worker ingested the same thread concurrently; retry.
+
+    With ?mode=async the pipeline runs on the background job pool instead:
+    the response is 202 with a job id to poll at /jobs/{id}, or 429 if the
+    job queue is full.
+
+    With ?mode=stream the response streams one event per verdict, artifact,
+    skipped or failed segment as it happens, then a summary: as Server-Sent
+    Events if the client accepts text/event-stream, otherwise as NDJSON.
+
+    The body is parsed as it arrives. In the default mode, if user_id and
+    thread_id come before turns, each turn is segmented as soon as it has
+    been received; otherwise the turns' texts are read first. Bodies larger
+    than INGEST_MAX_BODY_MB are rejected with 413.
     """
+    max_bytes = INGEST_MAX_BODY_MB * 1024 * 1024
+    length = request.headers.get("content-length", "")
+    if max_bytes and length.isdigit() and int(length) > max_bytes:
+        return body_too_large(max_bytes)
+    mode = request.query_params.get("mode")
+    body = JSONObjectStream(request.stream(), max_bytes)
     try:
-        payload = await request.json()
-    except json.JSONDecodeError:
+        payload = await body.members_until("turns")
+        # Async jobs outlive the request, and a streaming response competes with
+        # the body for the connection, so both get the turns read up front
+        streamed = body.found and mode not in ("async", "stream") and None not in (
+            payload.get("user_id"), payload.get("thread_id")
+        )
+        if body.found and not streamed:
+            texts = [turn_text(turn) async for turn in body.items()]
+            payload.update(await body.rest())
+            payload["turns"] = texts
+    except PayloadTooLargeError:
+        return body_too_large(max_bytes)
+    except InvalidJSONError:
         return JSONResponse({"error": "Invalid JSON payload"}, status_code=400)
 
     user_id = payload.get("user_id")
     thread_id = payload.get("thread_id")
-    turns = payload.get("turns")
+    turns = body_turns(body) if streamed else payload.get("turns")
     if user_id is None or thread_id is None or turns is None:
         return JSONResponse({"error": "Missing required fields: user_id, thread_id, turns"}, status_code=400)
 
-    # Aggregate turns into text
-    texts = []
-    for t in turns:
-        if isinstance(t, dict):
-            if "text" in t:
-                texts.append(t["text"])
-            elif "content" in t:
-                texts.append(t["content"])
-            else:
-                texts.append(json.dumps(t))
-        elif isinstance(t, str):
-            texts.append(t)
-        else:
-            texts.append(str(t))
-    full_text = "\n\n".join(texts)
-
-    # 1. Segmentation
-    segments = segmentation_agent(full_text)
-
-    contour_agent = EpistemicContourAgent()
-    assembler_agent = ArtifactAssemblerAgent()
-    artifacts = []
-
-    # 2. Epistemic contour filtering & assembly
-    for seg in segments:
-        seg_json = json.dumps(seg, ensure_ascii=False)
-        contour_result = await Runner.run(contour_agent, seg_json)
-        seg_out = contour_result.final_output
-        if seg_out.is_artifact:
-            art_result = await Runner.run(
-                assembler_agent,
-                json.dumps(seg_out.model_dump(), ensure_ascii=False)
-            )
-            artifact = art_result.final_output
-            artifacts.append(artifact)
-
-    # 3. Bulk insert artifacts into DB
+    if mode == "async":
+        try:
+            # Background jobs yield model capacity to requests a client is waiting on
+            job = job_manager.submit(lambda job: run_ingest(
+                turns, progress=job.advance, priority=BATCH, user_id=user_id, thread_id=thread_id
+            ))
+        except QueueFullError as e:
+            return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": "5"})
+        return JSONResponse(
+            {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"},
+            status_code=202,
+        )
+
+    if mode == "stream":
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        return stream_response(stream_ingest(turns, user_id, thread_id), sse)
+
+    try:
+        result = await run_ingest(turns, user_id=user_id, thread_id=thread_id)
+    except PayloadTooLargeError:
+        return body_too_large(max_bytes)
+    except InvalidJSONError:
+        return JSONResponse({"error": "Invalid JSON payload"}, status_code=400)
+    except DBInsertionError as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    except ThreadConflictError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return JSONResponse(result)
+
+
+async def iter_in_thread(results: Iterator[Any], chunk: int = 100) -> AsyncIterator[Any]:
+    """Drain a blocking iterator `chunk` items at a time in a worker thread."""
     try:
-        db = DBClient()
-        # Convert pydantic models to dicts for insertion
-        art_dicts = [a.model_dump() for a in artifacts]
-        db.insert_artifacts(art_dicts)
-    except Exception as e:
-        return JSONResponse({"error": f"DB insertion failed: {str(e)}"}, status_code=500)
+        while True:
+            batch = await asyncio.to_thread(lambda: list(islice(results, chunk)))
+            if not batch:
+                return
+            for item in batch:
+                yield item
     finally:
-        try:
-            db.close()
-        except Exception:
-            pass
+        close = getattr(results, "close", None)
+        if close is not None:
+            close()
+
+
+def page_params(request: Request) -> Tuple[int, Optional[List[Any]]]:
+    """The limit and decoded cursor of a paged request. Raises ValueError if either is invalid."""
+    try:
+        limit = int(request.query_params.get("limit", ARTIFACT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    if not 1 <= limit <= ARTIFACT_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {ARTIFACT_MAX_PAGE_SIZE}")
+    cursor = request.query_params.get("cursor")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+async def stream_page(results: Iterator[Tuple[List[Any], Dict[str, Any]]], limit: int) -> StreamingResponse:
+    """
+    Stream a page of (key, artifact) results as {"artifacts": [...], "next_cursor": ...},
+    writing each artifact as it is read. next_cursor is null on the last page.
+    """
+    rows = iter_in_thread(results)
+    # Read the first result before responding, so query errors still get a proper status
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def body():
+        count, key = 0, None
+        yield '{"artifacts": ['
+        if first is not None:
+            key, art = first
+            count = 1
+            yield json.dumps(art, ensure_ascii=False, default=str)
+            try:
+                async for key, art in rows:
+                    count += 1
+                    yield "," + json.dumps(art, ensure_ascii=False, default=str)
+            finally:
+                # Release the query's connection even if the client went away
+                await rows.aclose()
+        next_cursor = encode_cursor(key) if count == limit else None
+        yield '], "next_cursor": ' + json.dumps(next_cursor) + "}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+async def list_artifacts(request: Request):
+    """
+    A user's artifacts, optionally only those of one thread, oldest first.
+    Query parameters: user_id (required), thread_id, limit, and cursor (the
+    next_cursor of the previous page).
+    """
+    user_id = request.query_params.get("user_id")
+    if not user_id:
+        return JSONResponse({"error": "Missing required parameter: user_id"}, status_code=400)
+    try:
+        limit, after = page_params(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    query = await asyncio.to_thread(get_artifact_query)
+    results = query.list_artifacts(user_id, request.query_params.get("thread_id"), limit=limit, after=after)
+    return await stream_page(results, limit)
+
+
+async def search_artifacts(request: Request):
+    """
+    Full-text search over artifact content and justifications, best match
+    first. Query parameters: q (required), optional user_id and thread_id
+    filters, limit and cursor as for /artifacts.
+    """
+    q = request.query_params.get("q", "").strip()
+    if not q:
+        return JSONResponse({"error": "Missing required parameter: q"}, status_code=400)
+    try:
+        limit, after = page_params(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    query = await asyncio.to_thread(get_artifact_query)
+    results = query.search(
+        q, request.query_params.get("user_id"), request.query_params.get("thread_id"), limit=limit, after=after
+    )
+    return await stream_page(results, limit)
+
+
+async def get_artifact(request: Request):
+    """A single artifact by knowledge_id."""
+    query = await asyncio.to_thread(get_artifact_query)
+    artifact = await asyncio.to_thread(query.get, request.path_params["knowledge_id"])
+    if artifact is None:
+        return JSONResponse({"error": "Unknown knowledge_id"}, status_code=404)
+    return JSONResponse(artifact)
+
+
+async def job_status(request: Request):
+    """Status, per-stage progress and (once finished) results of an ingest job."""
+    job = await job_manager.get(request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Unknown job id"}, status_code=404)
+    return JSONResponse(job.model_dump())
+
+async def metrics_endpoint(request: Request):
+    """Pipeline metrics for this worker process, in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-    # 4. Return list of knowledge_ids
-    knowledge_ids = [artifact.id for artifact in artifacts]
-    return JSONResponse({"knowledge_ids": knowledge_ids})
- 
 async def health(request: Request):
     """Health check endpoint returning service status."""
     return JSONResponse({"status": "ok"})
 
 
-app = Starlette(debug=True, routes=[
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """
+    Start the background job workers (and write buffer) for the lifetime of
+    the app. Runs in each worker process, so with WARM_UP_ON_START every
+    worker builds its own agents and stores before serving requests.
+    """
+    global write_buffer
+    if WARM_UP_ON_START:
+        timings = registry.warm_up()
+        logger.info(
+            "Worker %d warmed up in %.2fs (%s)", os.getpid(), sum(timings.values()),
+            ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()),
+        )
+    await job_manager.start(store=get_job_store())
+    if DB_WRITE_BEHIND:
+        write_buffer = ArtifactWriteBuffer(
+            flush_interval=DB_FLUSH_INTERVAL_MS / 1000,
+            max_rows=DB_FLUSH_MAX_ROWS,
+        )
+        await write_buffer.start()
+    try:
+        yield
+    finally:
+        await job_manager.stop()
+        if write_buffer is not None:
+            await write_buffer.stop()
+            write_buffer = None
+        close_pool()
+
+
+app = Starlette(debug=True, lifespan=lifespan, routes=[
     Route("/ingest", ingest, methods=["POST"]),
+    Route("/jobs/{job_id}", job_status, methods=["GET"]),
+    Route("/artifacts", list_artifacts, methods=["GET"]),
+    Route("/artifacts/search", search_artifacts, methods=["GET"]),
+    Route("/artifacts/{knowledge_id}", get_artifact, methods=["GET"]),
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
     Route("/health", health, methods=["GET"]),
 ])
 
@@ -0,0 +1,195 @@
+"""Batch mode: run the pipeline over many session files at once.
+
+Session files are segmented in a process pool, and the segments of every
+session are fed into one SegmentPipeline, so all sessions share the same
+bounded pool of in-flight model calls. Each session gets a JSON summary in
+the summary directory; a session whose summary says it succeeded (for the
+same file size and modification time) is skipped on the next run. A failing
+session is recorded as failed and does not stop the others.
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config import (
+    PIPELINE_CONCURRENCY,
+    CONTOUR_BATCH_CHARS,
+    ASSEMBLY_MODE,
+    PREFILTER_THRESHOLD,
+    SEGMENTATION_MODE,
+    CONTOUR_CASCADE_MODEL,
+)
+from utils.segments import SegmentSpan, segment_spans
+from orchestration.pipeline import SegmentPipeline, outcome_label
+from orchestration.scheduler import BATCH
+from orchestration.local_pipeline import build_pipeline, close_pipeline, write_timings
+from project_agents.segmentation import iter_paragraphs, segment_paragraphs
+
+DEFAULT_SUMMARY_DIR = "data/batch_summaries"
+
+
+def find_sessions(pattern: str) -> List[Path]:
+    """
+    Session files matching `pattern`: every .txt file in it if it is a
+    directory, otherwise the files matching it as a glob (** recurses).
+    """
+    path = Path(pattern)
+    if path.is_dir():
+        return sorted(p for p in path.glob("*.txt") if p.is_file())
+    return sorted(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+
+
+def segment_session(path: str, mode: Optional[str] = None) -> List[SegmentSpan]:
+    """
+    Segment one session file. Runs in a worker process; the spans share one
+    buffer, which is pickled back to the parent only once.
+    """
+    with open(path, encoding="utf-8") as fh:
+        return list(segment_spans(segment_paragraphs(iter_paragraphs(fh), mode)))
+
+
+def summary_path(summary_dir: Path, session: Path) -> Path:
+    """Summary file for a session, unique per resolved session path."""
+    digest = hashlib.sha1(str(session.resolve()).encode("utf-8")).hexdigest()[:8]
+    return summary_dir / f"{session.stem}-{digest}.json"
+
+
+def is_finished(session: Path, summary_file: Path) -> bool:
+    """Whether the summary records a successful run over the file as it is now."""
+    try:
+        summary = json.loads(summary_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    stat = session.stat()
+    return (
+        summary.get("status") == "succeeded"
+        and summary.get("size") == stat.st_size
+        and summary.get("mtime_ns") == stat.st_mtime_ns
+    )
+
+
+def write_summary(summary_file: Path, summary: Dict[str, Any]):
+    """Write a summary atomically, so an interrupted run never leaves a partial file."""
+    tmp = summary_file.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, summary_file)
+
+
+async def run_sessions(
+    sessions: List[Path],
+    pipeline: SegmentPipeline,
+    summary_dir: Path,
+    workers: int = 0,
+    max_active: int = 0,
+    segmenter: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Segment `sessions` in a process pool and run them all through `pipeline`.
+
+    At most `max_active` sessions (default: twice the worker count) are
+    segmented or in the pipeline at once, which bounds memory. Returns the
+    summaries in session order. Status is "succeeded", "partial" (some
+    segments failed; rerun to retry them) or "failed".
+    """
+    summary_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    active = asyncio.Semaphore(max_active or 2 * workers)
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async def run_one(session: Path) -> Dict[str, Any]:
+            async with active:
+                stat = session.stat()
+                summary: Dict[str, Any] = {
+                    "session": str(session),
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "started_at": time.time(),
+                }
+                start = time.perf_counter()
+                try:
+                    segments = await loop.run_in_executor(pool, segment_session, str(session), segmenter)
+                    outcomes = await pipeline.run(segments)
+                    counts = {"artifact": 0, "rejected": 0, "error": 0, "skipped": 0}
+                    for outcome in outcomes:
+                        counts[outcome_label(outcome)] += 1
+                    summary.update(
+                        status="partial" if counts["error"] else "succeeded",
+                        segments=len(outcomes),
+                        artifacts=counts["artifact"],
+                        rejected=counts["rejected"],
+                        skipped=counts["skipped"],
+                        knowledge_ids=[o.artifact.id for o in outcomes if o.artifact is not None],
+                        errors=[{"segment_id": o.segment_id, "error": o.error} for o in outcomes if o.error],
+                    )
+                except Exception as e:
+                    summary.update(status="failed", error=f"{type(e).__name__}: {e}")
+                summary["seconds"] = round(time.perf_counter() - start, 3)
+                write_summary(summary_path(summary_dir, session), summary)
+                return summary
+
+        return await asyncio.gather(*(run_one(s) for s in sessions))
+
+
+async def run_batch(
+    pattern: str,
+    concurrency: int = PIPELINE_CONCURRENCY,
+    batch_chars: int = CONTOUR_BATCH_CHARS,
+    assembler: str = ASSEMBLY_MODE,
+    use_cache: bool = True,
+    use_dedup: bool = True,
+    prefilter_threshold: float = PREFILTER_THRESHOLD,
+    segmenter: str = SEGMENTATION_MODE,
+    cascade_model: str = CONTOUR_CASCADE_MODEL,
+    workers: int = 0,
+    summary_dir: str = DEFAULT_SUMMARY_DIR,
+    force: bool = False,
+    run_config=None,
+    timings: Optional[str] = None,
+):
+    """
+    Run the artifacting pipeline over every session file matching `pattern`.
+
+    Sessions that already finished are skipped unless `force` is set.
+    """
+    summaries = Path(summary_dir)
+    sessions = find_sessions(pattern)
+    if not sessions:
+        print(f"Error: no session files match {pattern}")
+        return
+    pending = [s for s in sessions if force or not is_finished(s, summary_path(summaries, s))]
+    print(f"[*] {len(sessions)} sessions found, {len(sessions) - len(pending)} already finished.")
+    if not pending:
+        return
+
+    pipeline = build_pipeline(
+        concurrency, batch_chars, assembler, use_cache, use_dedup, prefilter_threshold, cascade_model,
+        run_config=run_config, timings=timings, priority=BATCH,
+    )
+    started = time.perf_counter()
+    print(f"[*] Processing {len(pending)} sessions ({concurrency} calls in flight)...")
+    try:
+        results = await run_sessions(pending, pipeline, summaries, workers=workers, segmenter=segmenter)
+    finally:
+        close_pipeline(pipeline)
+
+    for summary in results:
+        if summary["status"] == "failed":
+            print(f"[!] {summary['session']} failed: {summary['error']}")
+        else:
+            print(
+                f"[{'+' if summary['status'] == 'succeeded' else '!'}] {summary['session']}: "
+                f"{summary['segments']} segments, {summary['artifacts']} artifacts, "
+                f"{len(summary['errors'])} errors ({summary['seconds']}s)"
+            )
+    failed = sum(1 for s in results if s["status"] != "succeeded")
+    print(f"Batch completed: {len(results) - failed} succeeded, {failed} need a rerun. Summaries in {summaries}/")
+
+    write_timings(pipeline, timings, started, sessions=len(results))
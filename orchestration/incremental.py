@@ -0,0 +1,221 @@
+"""Incremental ingestion of growing threads.
+
+Clients re-send the whole `turns` array each time a conversation grows.
+plan_ingest() compares it with the thread's stored state and returns only
+the segments that need processing: those closed by the new turns, plus the
+thread's open tail segment. finish_ingest() then records the new watermark.
+
+The tail (the open segments at the end, which later turns may still
+change) is judged every time so a thread's last idea is never lost, and its
+verdicts are stored by content hash: when a tail segment is later closed
+unchanged, it is not judged or artifacted again. If it does change, the new
+version is judged and its artifact supersedes the old one: finish_ingest()
+lists the superseded knowledge_ids in `plan.superseded` for the caller to
+delete. Tail segments are never added to the near-duplicate index (see
+IngestPlan.in_tail), so a grown tail is not mistaken for a repeat of its
+own earlier version.
+"""
+
+import hashlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+from project_agents.segmentation import iter_turn_paragraphs, segment_builder
+from utils.models import SegmentOutcome
+from utils.segments import Segment, SessionBuffer, segment_spans
+from utils.thread_state import ThreadStateStore
+
+
+class ThreadConflictError(Exception):
+    """Raised when another ingest advanced the same thread concurrently."""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def turns_digest(texts: Sequence[str]) -> str:
+    """Digest of a sequence of turn texts, sensitive to turn boundaries."""
+    h = hashlib.sha256()
+    for text in texts:
+        data = text.encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class IngestPlan:
+    """
+    What an ingest of a thread has to do, given what was ingested before.
+
+    Turns are taken one at a time, from a list or as they are parsed from a
+    request body: iterating `segments` (or `asegments`) consumes `texts` and
+    yields the segments to run through the pipeline. `reused` maps the ids
+    of segments whose verdict is already known (unchanged segments of the
+    former tail) to their knowledge_id, or None if they were not artifacts.
+    `superseded` lists the knowledge_ids of former tail artifacts that
+    this ingest replaced, once finish_ingest() has saved the new state.
+    Until the turns already ingested have all arrived, they are held in
+    case they turn out to differ from the stored ones; after that, turns
+    are segmented as they come in.
+    """
+    def __init__(
+        self,
+        user_id: str,
+        thread_id: str,
+        texts: Union[Iterable[str], AsyncIterable[str]],
+        previous: Optional[Dict[str, Any]],
+    ):
+        self.user_id = user_id
+        self.thread_id = thread_id
+        self.texts = texts
+        self.previous = previous
+        self.turn_count = 0
+        self.expected_turns: Optional[int] = previous["turn_count"] if previous is not None else None
+        self.knowledge_ids: List[str] = []
+        self.closed: List[Segment] = []
+        self.tail: List[Segment] = []
+        self.reused: Dict[str, Optional[str]] = {}
+        self.superseded: List[str] = []
+        self.unchanged = False
+        # Turns not covered by the stored watermark
+        self.new_turns = 0
+        self.segmenter_state: Optional[Dict[str, Any]] = None
+
+        self._hash = hashlib.sha256()
+        # Content hash -> knowledge_id (or None) of the former tail's segments
+        self._old_tail: Dict[str, Optional[str]] = {}
+        # Ids of the tail segments, known once the last turn has been taken
+        self._tail_ids: Set[str] = set()
+        self._buffer = SessionBuffer()
+        self._builder = None
+        # Whether the turns continue the stored ones
+        self._resumed = False
+        # Leading turns held until they can be compared with the stored digest
+        self._held: Optional[List[str]] = [] if previous is not None else None
+        if self._held is not None and previous["turn_count"] == 0:
+            self._resume()
+
+    @property
+    def digest(self) -> str:
+        """turns_digest() of the turns taken so far."""
+        return self._hash.hexdigest()
+
+    @property
+    def segments(self) -> Iterator[Segment]:
+        """Take every turn of a synchronous `texts` and yield the segments to process."""
+        for text in self.texts:
+            yield from self.add_turn(text)
+        yield from self.finish()
+
+    async def asegments(self) -> AsyncIterator[Segment]:
+        """`segments`, for a `texts` that is an async iterable."""
+        async for text in self.texts:
+            for seg in self.add_turn(text):
+                yield seg
+        for seg in self.finish():
+            yield seg
+
+    def _resume(self):
+        """Continue after the stored turns if the held ones are the same, else start over."""
+        held, self._held = self._held, None
+        previous = self.previous
+        if len(held) == previous["turn_count"] and self.digest == previous["digest"]:
+            self._old_tail = {t["hash"]: t["knowledge_id"] for t in previous["tail"]}
+            self.knowledge_ids = list(previous["knowledge_ids"])
+            self._builder = segment_builder(previous["segmenter"])
+            self._resumed = True
+            return []
+        self._builder = segment_builder()
+        self.new_turns = len(held)
+        return self._select(self._builder.feed(iter_turn_paragraphs(held)), self.closed)
+
+    def add_turn(self, text: str) -> List[Segment]:
+        """Take the next turn and return the segments it closed that need processing."""
+        data = text.encode("utf-8")
+        self._hash.update(len(data).to_bytes(8, "little"))
+        self._hash.update(data)
+        self.turn_count += 1
+        if self._held is not None:
+            self._held.append(text)
+            return self._resume() if len(self._held) == self.previous["turn_count"] else []
+        if self._builder is None:
+            self._builder = segment_builder()
+        self.new_turns += 1
+        return self._select(self._builder.feed(iter_turn_paragraphs([text])), self.closed)
+
+    def finish(self) -> List[Segment]:
+        """After the last turn: the thread's open tail segments that need processing."""
+        selected = self._resume() if self._held is not None else []
+        if self._builder is None:
+            self._builder = segment_builder()
+        selected += self._select(self._builder.tail(), self.tail)
+        self._tail_ids = {seg["id"] for seg in self.tail}
+        self.segmenter_state = self._builder.state()
+        self.unchanged = self._resumed and self.new_turns == 0
+        return selected
+
+    def _select(self, produced: Iterable[Dict[str, str]], into: List[Segment]) -> List[Segment]:
+        selected = []
+        for seg in segment_spans(produced, self._buffer):
+            into.append(seg)
+            digest = text_hash(seg["text"])
+            if digest in self._old_tail:
+                self.reused[seg["id"]] = self._old_tail[digest]
+            else:
+                selected.append(seg)
+        return selected
+
+    def in_tail(self, seg: Segment) -> bool:
+        """Whether `seg` is one of the thread's open tail segments, which later turns may still change."""
+        return seg["id"] in self._tail_ids
+
+    def result_ids(self, outcomes: List[SegmentOutcome]) -> Dict[str, Optional[str]]:
+        """
+        knowledge_id (or None) of every processed or reused segment. A
+        near-duplicate stands for the artifact it duplicates.
+        """
+        ids: Dict[str, Optional[str]] = dict(self.reused)
+        for outcome in outcomes:
+            ids[outcome.segment_id] = outcome.artifact.id if outcome.artifact is not None else outcome.duplicate_of
+        return ids
+
+    def thread_knowledge_ids(self, outcomes: List[SegmentOutcome]) -> List[str]:
+        """All current knowledge_ids of the thread: closed segments first, then the tail."""
+        ids = self.result_ids(outcomes)
+        return self.knowledge_ids + [ids[s["id"]] for s in self.closed + self.tail if ids.get(s["id"])]
+
+
+def plan_ingest(
+    store: ThreadStateStore, user_id: str, thread_id: str, texts: Union[Iterable[str], AsyncIterable[str]]
+) -> IngestPlan:
+    """Work out, as its turns are taken, which segments of a (re-)posted thread still need processing."""
+    return IngestPlan(user_id, thread_id, texts, store.get(str(user_id), str(thread_id)))
+
+
+def finish_ingest(store: ThreadStateStore, plan: IngestPlan, outcomes: List[SegmentOutcome]) -> List[str]:
+    """
+    Record the thread's new watermark and return all of its knowledge_ids.
+
+    State is only saved when every segment was processed without error, so
+    failed segments are retried by the next ingest. Once it is saved, the
+    former tail's artifacts that are no longer part of the thread are
+    listed in `plan.superseded`. Raises ThreadConflictError if the thread
+    was advanced concurrently.
+    """
+    knowledge_ids = plan.thread_knowledge_ids(outcomes)
+    if plan.unchanged or any(o.error for o in outcomes):
+        return knowledge_ids
+    ids = plan.result_ids(outcomes)
+    closed_ids = [ids[s["id"]] for s in plan.closed if ids.get(s["id"])]
+    state = {
+        "turn_count": plan.turn_count,
+        "digest": plan.digest,
+        "segmenter": plan.segmenter_state,
+        "knowledge_ids": plan.knowledge_ids + closed_ids,
+        "tail": [{"hash": text_hash(s["text"]), "knowledge_id": ids.get(s["id"])} for s in plan.tail],
+    }
+    if not store.put(str(plan.user_id), str(plan.thread_id), state, plan.expected_turns):
+        raise ThreadConflictError(f"Thread {plan.thread_id} was updated by a concurrent ingest")
+    live = set(knowledge_ids)
+    plan.superseded = [kid for kid in plan._old_tail.values() if kid is not None and kid not in live]
+    return knowledge_ids
@@ -0,0 +1,224 @@
+"""Background ingest jobs.
+
+A JobManager runs submitted jobs on a fixed pool of asyncio worker tasks.
+The queue of jobs waiting for a worker is bounded; submitting to a full
+queue raises QueueFullError so the API can shed load with a 429.
+Job state lives in memory in the worker process that runs the job. Given a
+JobStore, it is also written there as the job advances, so any worker
+process sharing the store can report on it. The store is written by a
+single background task in a worker thread, never by request handlers.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel, Field
+
+from utils.job_store import JobStore
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its configured depth."""
+
+
+class Job(BaseModel):
+    """Status of a background ingest job."""
+    id: str
+    status: str = "queued"  # queued | running | succeeded | failed
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stage: Optional[str] = None
+    progress: Dict[str, int] = Field(default_factory=dict)
+    knowledge_ids: List[str] = Field(default_factory=list)
+    errors: List[Dict[str, Any]] = Field(default_factory=list)
+    error: Optional[str] = None
+
+    def advance(self, stage: str, count: int = 1):
+        """Record that `count` more items completed `stage`."""
+        self.stage = stage
+        self.progress[stage] = self.progress.get(stage, 0) + count
+
+
+# A job body receives its Job (to report progress) and returns the result fields
+JobFunc = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """
+    Bounded queue of jobs processed by a fixed number of worker tasks.
+
+    With a `store`, running jobs save their progress every `save_interval`
+    seconds, and get() falls back to the store for jobs of other processes.
+    Saving only marks a job as changed: a writer task writes the latest
+    state of changed jobs in a worker thread, one transaction at a time,
+    and prunes the store's finished jobs every `prune_interval` seconds.
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 32,
+        max_finished: int = 1000,
+        save_interval: float = 1.0,
+        prune_interval: float = 60.0,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.save_interval = save_interval
+        self.prune_interval = prune_interval
+        self.store: Optional[JobStore] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs changed since the writer task last wrote them to the store
+        self._dirty: Dict[str, Job] = {}
+        self._changed: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, store: Optional[JobStore] = None):
+        """
+        Start the worker tasks, recording job state in `store` if given.
+        Must be called from the running event loop.
+        """
+        self.store = store
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if store is not None:
+            self._changed = asyncio.Event()
+            self._closing = False
+            self._writer = asyncio.create_task(self._write_store())
+
+    async def stop(self):
+        """
+        Cancel the worker tasks; jobs still queued or running are abandoned
+        and recorded as failed. Waits for the store to be written.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._jobs.values():
+            if job.status in ("queued", "running"):
+                job.status = "failed"
+                job.error = "Abandoned: the worker process stopped before the job finished"
+                job.finished_at = job.finished_at or time.time()
+                self._save(job)
+        if self._writer is not None:
+            self._closing = True
+            self._changed.set()
+            await self._writer
+            self._writer = None
+
+    def submit(self, func: JobFunc) -> Job:
+        """
+        Queue `func` for execution and return its Job.
+
+        Raises QueueFullError if the queue is at max_queue.
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager has not been started")
+        job = Job(id=f"job_{uuid4().hex}", created_at=time.time())
+        try:
+            self._queue.put_nowait((job, func))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+        self._jobs[job.id] = job
+        self._save(job)
+        self._prune()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with the given id, if it is still known."""
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            data = await asyncio.to_thread(self.store.load, job_id)
+            if data is not None:
+                job = Job(**data)
+        return job
+
+    def _save(self, job: Job):
+        """Have the writer task record the job's current state in the store."""
+        if self.store is not None:
+            self._dirty[job.id] = job
+            self._changed.set()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished; the writer task prunes the store."""
+        finished = [j.id for j in self._jobs.values() if j.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _write(self, records: Dict[str, Dict[str, Any]], prune: bool):
+        """Write job states and optionally prune the store; runs in a worker thread."""
+        if records:
+            self.store.save_many(records)
+        if prune:
+            self.store.prune(self.max_finished)
+
+    async def _write_store(self):
+        last_prune = time.monotonic()
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.prune_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._changed.clear()
+            dirty, self._dirty = self._dirty, {}
+            # Snapshot on the event loop, where jobs change, so each write has their latest state
+            records = {job_id: job.model_dump() for job_id, job in dirty.items()}
+            prune = time.monotonic() - last_prune >= self.prune_interval
+            try:
+                await asyncio.to_thread(self._write, records, prune)
+            except Exception:
+                logger.exception("Writing %d jobs to the job store failed", len(records))
+                if not self._closing:
+                    # Retry with the next write, unless a newer state is already pending
+                    for job_id, job in dirty.items():
+                        self._dirty.setdefault(job_id, job)
+            else:
+                if prune:
+                    last_prune = time.monotonic()
+            if self._closing and not self._dirty:
+                return
+
+    async def _save_progress(self, job: Job):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            self._save(job)
+
+    async def _worker(self):
+        while True:
+            job, func = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._save(job)
+            saver = asyncio.create_task(self._save_progress(job)) if self.store is not None else None
+            try:
+                result = await func(job)
+                job.knowledge_ids = result.get("knowledge_ids", [])
+                job.errors = result.get("errors", [])
+                job.status = "succeeded"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+            finally:
+                if saver is not None:
+                    saver.cancel()
+                job.finished_at = time.time()
+                self._save(job)
+                self._queue.task_done()
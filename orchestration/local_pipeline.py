@@ -0,0 +1,129 @@
+"""Pipeline setup shared by the CLI's single-session and batch modes.
+
+build_pipeline() opens the stores (verdict cache, near-duplicate index),
+the pre-filter and the agents from utils.config and the command-line
+options, and close_pipeline() closes the stores again. write_timings()
+writes the --timings report. The API builds its pipelines from its
+per-worker registry instead (orchestration.api.build_pipeline).
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from utils.config import (
+    VERDICT_CACHE_PATH,
+    VERDICT_CACHE_MAX_ENTRIES,
+    VERDICT_CACHE_MAX_AGE_DAYS,
+    DEDUP_INDEX_PATH,
+    DEDUP_THRESHOLD,
+    PREFILTER_AUDIT_PATH,
+    PREFILTER_AUDIT_RATE,
+    PREFILTER_AUDIT_MAX_MB,
+    CASCADE_MIN_CONFIDENCE,
+    CASCADE_ESCALATE_ON_FLAGS,
+    CASCADE_AUDIT_RATE,
+)
+from utils.verdict_cache import VerdictCache
+from utils.dedup import NearDuplicateIndex
+from utils.prefilter import Prefilter
+from utils.cascade import CascadePolicy
+from utils.metrics import PipelineMetrics
+from orchestration.pipeline import SegmentPipeline
+from orchestration.review import ReviewQueue
+from orchestration.scheduler import INTERACTIVE, get_scheduler
+
+if TYPE_CHECKING:
+    from agents.run import RunConfig
+
+
+def build_pipeline(
+    concurrency: int,
+    batch_chars: int,
+    assembler: str,
+    use_cache: bool,
+    use_dedup: bool,
+    prefilter_threshold: float,
+    cascade_model: str,
+    run_config: Optional["RunConfig"] = None,
+    timings: Optional[str] = None,
+    priority: int = INTERACTIVE,
+    review_queue: Optional[ReviewQueue] = None,
+) -> SegmentPipeline:
+    """
+    SegmentPipeline for a CLI run, sharing the process-wide model scheduler
+    at `priority`. Stages are timed when a `timings` report was asked for.
+    """
+    verdict_cache = None
+    if use_cache and VERDICT_CACHE_PATH:
+        verdict_cache = VerdictCache(
+            VERDICT_CACHE_PATH,
+            max_entries=VERDICT_CACHE_MAX_ENTRIES,
+            max_age_seconds=VERDICT_CACHE_MAX_AGE_DAYS * 86400,
+        )
+    dedup_index = None
+    if use_dedup and DEDUP_INDEX_PATH:
+        dedup_index = NearDuplicateIndex(DEDUP_INDEX_PATH, threshold=DEDUP_THRESHOLD)
+    prefilter = None
+    if prefilter_threshold > 0:
+        prefilter = Prefilter(
+            prefilter_threshold,
+            audit_path=PREFILTER_AUDIT_PATH,
+            audit_rate=PREFILTER_AUDIT_RATE,
+            audit_max_bytes=int(PREFILTER_AUDIT_MAX_MB * 1024 * 1024),
+        )
+    # The agents, and with them the Agents SDK, are only loaded once there is work for them
+    from project_agents.epistemic_contour_agent import EpistemicContourAgent
+    from project_agents.artifact_assembler_agent import ArtifactAssemblerAgent
+    fast_agent = cascade = None
+    if cascade_model:
+        fast_agent = EpistemicContourAgent(model=cascade_model, with_confidence=True)
+        cascade = CascadePolicy(CASCADE_MIN_CONFIDENCE, CASCADE_ESCALATE_ON_FLAGS, CASCADE_AUDIT_RATE)
+    return SegmentPipeline(
+        EpistemicContourAgent(),
+        ArtifactAssemblerAgent() if assembler == "agent" else None,
+        concurrency=concurrency,
+        batch_chars=batch_chars,
+        verdict_cache=verdict_cache,
+        dedup_index=dedup_index,
+        prefilter=prefilter,
+        run_config=run_config,
+        metrics=PipelineMetrics(keep_samples=True) if timings else None,
+        scheduler=get_scheduler(),
+        priority=priority,
+        review_queue=review_queue,
+        fast_contour_agent=fast_agent,
+        cascade=cascade,
+    )
+
+
+def close_pipeline(pipeline: SegmentPipeline):
+    """Close the stores build_pipeline() opened for `pipeline`."""
+    if pipeline.verdict_cache is not None:
+        pipeline.verdict_cache.close()
+    if pipeline.dedup_index is not None:
+        pipeline.dedup_index.close()
+
+
+def write_timings(pipeline: SegmentPipeline, timings: Optional[str], started: float, **fields: Any):
+    """
+    Write the run's timing report to `timings` ("-" for stdout): `fields`,
+    the wall time since `started` (a perf_counter() value), the pipeline's
+    settings and its metrics. Does nothing without metrics.
+    """
+    if pipeline.metrics is None or not timings:
+        return
+    report = {
+        **fields,
+        "wall_seconds": round(time.perf_counter() - started, 6),
+        "concurrency": pipeline.concurrency,
+        "batch_chars": pipeline.batch_chars,
+        **pipeline.metrics.report(),
+    }
+    data = json.dumps(report, indent=2)
+    if timings == "-":
+        print(data)
+    else:
+        Path(timings).write_text(data + "\n", encoding="utf-8")
+        print(f"[*] Timing report written to {timings}")
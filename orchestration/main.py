@@ -1,8 +1,8 @@
 """Orchestration pipeline for artifacting sessions using OpenAI Agents SDK."""
 #!/usr/bin/env python3
 import asyncio
-import json
 import sys
+import time
 import argparse
 from pathlib import Path
 # Ensure the project root is on sys.path, so project_agents can be imported when running script directly
@@ -16,66 +16,106 @@ if _dotenv_path.exists():
 else:
     print(f"Warning: .env file not found at {_dotenv_path}. Ensure OPENAI_API_KEY is set.")
 
-from agents.run import Runner
-from project_agents.segmentation_agent import segmentation_agent
-from project_agents.epistemic_contour_agent import EpistemicContourAgent
-from project_agents.artifact_assembler_agent import ArtifactAssemblerAgent
+from utils.config import (
+    PIPELINE_CONCURRENCY,
+    CONTOUR_BATCH_CHARS,
+    ASSEMBLY_MODE,
+    PREFILTER_THRESHOLD,
+    SEGMENTATION_MODE,
+    REVIEW_STORE_PATH,
+    CONTOUR_CASCADE_MODEL,
+)
+from utils.segments import segment_spans
+from utils.review_store import ReviewStore
+from orchestration.review import ReviewQueue
+from orchestration.batch import DEFAULT_SUMMARY_DIR, run_batch
+from orchestration.local_pipeline import build_pipeline, close_pipeline, write_timings
+from project_agents.segmentation import iter_paragraphs, segment_paragraphs
 
-async def run_pipeline(session_filename: str, review: bool = False):
+async def run_pipeline(
+    session_filename: str,
+    review: bool = False,
+    concurrency: int = PIPELINE_CONCURRENCY,
+    batch_chars: int = CONTOUR_BATCH_CHARS,
+    assembler: str = ASSEMBLY_MODE,
+    use_cache: bool = True,
+    use_dedup: bool = True,
+    prefilter_threshold: float = PREFILTER_THRESHOLD,
+    segmenter: str = SEGMENTATION_MODE,
+    cascade_model: str = CONTOUR_CASCADE_MODEL,
+    run_config=None,
+    timings: str = None,
+):
     """
     Execute the artifacting pipeline for a given session text file.
+
+    With `review`, a person confirms each approved segment while analysis
+    continues; decisions are saved, and running the same session with
+    `review` again resumes where the previous review stopped.
+
+    With `cascade_model`, that model judges segments first and only the
+    verdicts the cascade policy escalates are judged by the main model.
+
+    With `timings`, a JSON report of per-stage durations, outcomes, tokens
+    and retries is written to that path ("-" for stdout).
     """
     input_path = Path("data/input_sessions") / session_filename
     if not input_path.exists():
         print(f"Error: session file not found: {input_path}")
         return
-    text = input_path.read_text(encoding="utf-8")
-    print(f"Loaded session '{session_filename}' ({len(text)} chars)")
+    print(f"Loaded session '{session_filename}' ({input_path.stat().st_size} bytes)")
+
+    # 1. Segmentation, streamed from the file so analysis starts on the first segments
+    def read_segments():
+        with input_path.open(encoding="utf-8") as fh:
+            yield from segment_spans(segment_paragraphs(iter_paragraphs(fh), segmenter))
+
+    # 2. Epistemic contour filtering & assembly, each segment as its own task;
+    # approved segments queue for the reviewer while the rest keep going
+    review_store = ReviewStore(REVIEW_STORE_PATH) if review else None
+    review_queue = ReviewQueue(review_store, session_filename) if review else None
+    if review_queue is not None and review_queue.resumed:
+        print(f"[*] Resuming review: {review_queue.resumed} segments already judged.")
 
-    # 1. Segmentation
-    print("[*] Segmenting text...")
-    segments = segmentation_agent(text)
-    print(f"[+] Generated {len(segments)} segments.")
+    pipeline = build_pipeline(
+        concurrency, batch_chars, assembler, use_cache, use_dedup, prefilter_threshold, cascade_model,
+        run_config=run_config, timings=timings, review_queue=review_queue,
+    )
+    started = time.perf_counter()
+    print(f"[*] Segmenting and analyzing text ({concurrency} calls in flight)...")
+    reviewer = asyncio.ensure_future(review_queue.run()) if review_queue is not None else None
+    try:
+        outcomes = await pipeline.run(read_segments())
+    finally:
+        if reviewer is not None:
+            reviewer.cancel()
+            review_store.close()
+        if pipeline.verdict_cache is not None:
+            stats = pipeline.verdict_cache.stats()
+            print(f"[*] Verdict cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+        close_pipeline(pipeline)
 
-    # 2. Epistemic contour filtering
-    contour_agent = EpistemicContourAgent()
-    approved_segments = []
-    for seg in segments:
-        seg_id = seg["id"]
-        print(f"[*] Analyzing segment {seg_id}...")
-        result = await Runner.run(contour_agent, json.dumps(seg, ensure_ascii=False))
-        # Runner.run returns a RunResult; final_output holds the parsed output object
-        output = result.final_output
-        for seg_res in output.segments:
-            if seg_res.is_artifact:
-                print(f"[+] Segment {seg_res.id} approved for artifacting.")
-                if review:
-                    # Show snippet for human review
-                    lines = seg_res.text.splitlines()
-                    preview = "\n".join(lines[:3])
-                    print("--- Segment Preview (first 3 lines) ---")
-                    print(preview)
-                    print("--- End Preview ---")
-                    print(f"Diagnostic flags: {seg_res.diagnostic_flags}")
-                    print(f"Justification: {seg_res.justification}\n")
-                    choice = input("Accept this as an artifact? (Y/n): ").strip().lower()
-                    if choice == 'n':
-                        print(f"[-] User rejected segment {seg_res.id}.")
-                        continue
-                approved_segments.append(seg_res)
-            else:
-                print(f"[-] Segment {seg_res.id} rejected.")
+    print(f"[+] Generated {len(outcomes)} segments.")
 
-    # 3. Artifact assembly
-    assembler_agent = ArtifactAssemblerAgent()
-    for seg_res in approved_segments:
-        print(f"[*] Assembling artifact for segment {seg_res.id}...")
-        art_result = await Runner.run(assembler_agent, json.dumps(seg_res.model_dump(), ensure_ascii=False))
-        # Use final_output for the resulting ArtifactOutput
-        artifact = art_result.final_output
-        print(f"[+] Artifact '{artifact.id}' created.")
+    # 3. Report per-segment results in input order
+    for outcome in outcomes:
+        if outcome.error:
+            print(f"[!] Segment {outcome.segment_id} failed: {outcome.error}")
+        elif outcome.skip_reason:
+            linked = f" of artifact '{outcome.duplicate_of}'" if outcome.duplicate_of else ""
+            print(f"[=] Segment {outcome.segment_id} skipped: {outcome.skip_reason}{linked}.")
+        elif not outcome.verdict.is_artifact:
+            print(f"[-] Segment {outcome.segment_id} rejected.")
+        elif outcome.artifact is not None:
+            print(f"[+] Artifact '{outcome.artifact.id}' created for segment {outcome.segment_id}.")
 
     print("Pipeline completed.")
+    if review_queue is not None:
+        print(f"[*] Review: {review_queue.reviewed} segments decided in this run, {review_queue.deferred} awaiting review.")
+        if review_queue.deferred:
+            print("[*] Run the same command again to continue the review.")
+
+    write_timings(pipeline, timings, started, session=session_filename)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -83,15 +123,120 @@ def main():
     )
     parser.add_argument(
         'session_filename',
+        nargs='?',
         help='Session .txt filename in data/input_sessions/'
     )
+    parser.add_argument(
+        '--batch',
+        metavar='DIR_OR_GLOB',
+        help='Process every session in a directory (*.txt) or matching a glob, instead of one file.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Processes used to segment sessions in batch mode (default: CPU count).'
+    )
+    parser.add_argument(
+        '--summary-dir',
+        default=DEFAULT_SUMMARY_DIR,
+        help=f'Where batch mode writes per-session summaries (default: {DEFAULT_SUMMARY_DIR}).'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='In batch mode, also rerun sessions that already finished.'
+    )
+    parser.add_argument(
+        '--segmenter',
+        choices=['paragraph', 'topic'],
+        default=SEGMENTATION_MODE,
+        help='Cut segments at a minimum length (paragraph) or where the topic shifts (topic).'
+    )
     parser.add_argument(
         '--review',
         action='store_true',
-        help='Enable human-in-the-loop review of approved segments.'
+        help='Enable human-in-the-loop review of approved segments (resumes an interrupted review).'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=PIPELINE_CONCURRENCY,
+        help='Maximum number of model calls in flight (1 = sequential).'
+    )
+    parser.add_argument(
+        '--batch-chars',
+        type=int,
+        default=CONTOUR_BATCH_CHARS,
+        help='Pack segments into contour calls of up to this many characters (0 = one per call).'
+    )
+    parser.add_argument(
+        '--assembler',
+        choices=['local', 'agent'],
+        default=ASSEMBLY_MODE,
+        help='Assemble artifacts locally (default) or via the ArtifactAssemblerAgent.'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Ignore the verdict cache and send every segment to the contour agent.'
+    )
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='Do not skip segments that nearly duplicate previously seen ones.'
+    )
+    parser.add_argument(
+        '--prefilter-threshold',
+        type=float,
+        default=PREFILTER_THRESHOLD,
+        help=f'Skip segments scoring below this in the local pre-filter (0 = send all to the model; default: {PREFILTER_THRESHOLD}).'
+    )
+    parser.add_argument(
+        '--cascade-model',
+        default=CONTOUR_CASCADE_MODEL,
+        help='Judge segments with this faster model first; only uncertain, flagged or audited verdicts go to the main model (default: off).'
+    )
+    parser.add_argument(
+        '--timings',
+        metavar='PATH',
+        help='Write a JSON report of per-stage timings to PATH ("-" for stdout).'
     )
     args = parser.parse_args()
-    asyncio.run(run_pipeline(args.session_filename, review=args.review))
+    if args.batch:
+        if args.session_filename or args.review:
+            parser.error("--batch cannot be combined with a session filename or --review")
+        asyncio.run(run_batch(
+            args.batch,
+            concurrency=args.concurrency,
+            batch_chars=args.batch_chars,
+            assembler=args.assembler,
+            use_cache=not args.no_cache,
+            use_dedup=not args.no_dedup,
+            prefilter_threshold=args.prefilter_threshold,
+            segmenter=args.segmenter,
+            cascade_model=args.cascade_model,
+            workers=args.workers,
+            summary_dir=args.summary_dir,
+            force=args.force,
+            timings=args.timings,
+        ))
+        return
+    if not args.session_filename:
+        parser.error("a session filename or --batch is required")
+    asyncio.run(run_pipeline(
+        args.session_filename,
+        review=args.review,
+        concurrency=args.concurrency,
+        batch_chars=args.batch_chars,
+        assembler=args.assembler,
+        use_cache=not args.no_cache,
+        use_dedup=not args.no_dedup,
+        prefilter_threshold=args.prefilter_threshold,
+        segmenter=args.segmenter,
+        cascade_model=args.cascade_model,
+        timings=args.timings,
+    ))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
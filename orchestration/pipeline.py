@@ -0,0 +1,753 @@
+"""Segment pipeline shared by the API and the CLI.
+
+Each segment moves through the EpistemicContourAgent and, when approved,
+artifact assembly as its own task. A semaphore bounds how many model calls
+are in flight at once, and results are returned in input order. Optionally,
+several segments are packed into one contour call, and verdicts can be
+served from a persistent cache or first judged by a faster model (a
+cascade; see utils.cascade). Outcomes can also be consumed as a stream
+of per-segment events while the rest of the run is still in progress.
+
+The Agents SDK is imported when the first model call is made, not with
+this module.
+
+Segments may be {"id", "text"} dicts or SegmentSpans over a shared session
+buffer (utils.segments); with spans, segment text is only decoded for model
+calls, local scoring and assembly, and outcomes keep verdicts, not text.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter
+from typing import (
+    TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List,
+    Optional, Tuple, Union,
+)
+
+from project_agents.artifact_assembly import assemble_artifacts
+from utils.models import (
+    EpistemicContourOutput,
+    EpistemicContourResult,
+    EpistemicContourVerdict,
+    EpistemicContourVerdictOutput,
+    SegmentOutcome,
+)
+from utils.cascade import CascadePolicy
+from utils.dedup import NearDuplicateIndex
+from utils.prefilter import Prefilter, PrefilterDecision
+from utils.segments import Segment, as_dict, text_length
+from utils.metrics import PipelineMetrics
+from orchestration.scheduler import INTERACTIVE, ModelScheduler, estimate_tokens
+from orchestration.review import ReviewQueue
+from utils.verdict_cache import VerdictCache, agent_fingerprint
+
+if TYPE_CHECKING:
+    from agents.run import RunConfig
+
+# Optional gate between contour analysis and assembly (e.g. human review)
+ApproveHook = Callable[[EpistemicContourResult], Awaitable[bool]]
+# Optional progress callback, called with a stage name ("segmented", "judged",
+# "assembled", "skipped") and the number of segments that just completed it
+ProgressHook = Callable[[str, int], None]
+# Optional per-segment callback, called with an event name ("verdict",
+# "artifact", "skipped", "error") and the segment's outcome as soon as it is known
+OutcomeHook = Callable[[str, SegmentOutcome], None]
+
+
+# Batches of an asynchronous segment source started but not finished, per allowed model call
+READ_AHEAD_PER_CALL = 4
+
+# Fields the contour model decides; id and text always come from the segment itself
+VERDICT_FIELDS = {"is_artifact", "justification", "diagnostic_flags"}
+
+ContourOutput = Union[EpistemicContourOutput, EpistemicContourVerdictOutput]
+ContourVerdict = Union[EpistemicContourResult, EpistemicContourVerdict]
+
+
+def to_verdict(seg: Segment, verdict: ContourVerdict) -> EpistemicContourVerdict:
+    """
+    The model's verdict on a segment, under the segment's id and without
+    any text the model echoed back. Compact verdicts (including the
+    cascade's EpistemicContourTriage) keep their type.
+    """
+    if isinstance(verdict, EpistemicContourVerdict):
+        return verdict if verdict.id == seg["id"] else verdict.model_copy(update={"id": seg["id"]})
+    return EpistemicContourVerdict(id=seg["id"], **verdict.model_dump(include=VERDICT_FIELDS))
+
+
+def match_contour_result(seg: Segment, output: ContourOutput) -> EpistemicContourVerdict:
+    """
+    Pick the verdict belonging to a segment from the agent output.
+
+    Falls back to the only result when the model did not echo the id.
+    """
+    for res in output.segments:
+        if res.id == seg["id"]:
+            return to_verdict(seg, res)
+    if len(output.segments) == 1:
+        return to_verdict(seg, output.segments[0])
+    raise ValueError(f"No contour result returned for segment {seg['id']}")
+
+
+def pack_segments(segments: Iterable[Segment], max_chars: int) -> Iterator[List[Segment]]:
+    """
+    Greedily pack consecutive segments into batches of at most `max_chars` of text.
+
+    A segment longer than the budget gets a batch of its own. Batches are
+    yielded as soon as they are full, so `segments` can be a generator.
+    """
+    current: List[Segment] = []
+    size = 0
+    for seg in segments:
+        length = text_length(seg)
+        if current and size + length > max_chars:
+            yield current
+            current, size = [], 0
+        current.append(seg)
+        size += length
+    if current:
+        yield current
+
+
+async def apack_segments(segments: AsyncIterable[Segment], max_chars: int) -> AsyncIterator[List[Segment]]:
+    """pack_segments for an asynchronous source; with `max_chars` <= 0, one segment per batch."""
+    current: List[Segment] = []
+    size = 0
+    async for seg in segments:
+        length = text_length(seg)
+        if current and (max_chars <= 0 or size + length > max_chars):
+            yield current
+            current, size = [], 0
+        current.append(seg)
+        size += length
+    if current:
+        yield current
+
+
+def outcome_label(outcome: SegmentOutcome) -> str:
+    """Classify an outcome as "artifact", "rejected", "error" or "skipped"."""
+    if outcome.error:
+        return "error"
+    if outcome.skip_reason:
+        return "skipped"
+    return "artifact" if outcome.artifact is not None else "rejected"
+
+
+class SegmentPipeline:
+    """
+    Runs segments through contour analysis and assembly with bounded concurrency.
+
+    With `batch_chars` > 0, consecutive segments are sent to the contour agent
+    together, up to that many characters of segment text per call. Approved
+    segments are assembled locally unless `assembler_agent` is given. With a
+    `verdict_cache`, segments judged before are not sent to the model again;
+    with a `dedup_index`, neither are near-duplicates of them. With a
+    `prefilter`, segments it scores as implausible artifacts are skipped
+    before either is consulted. A `run_config`
+    is passed to every agent run, e.g. to substitute the model provider.
+    With `metrics`, stage durations, outcomes, tokens and retries are recorded.
+    With a `scheduler`, every model call goes through it at `priority`, which
+    adds rate limiting, adaptive concurrency and retries across pipelines.
+    Artifacts are tagged with `user_id` and `thread_id` when given. With a
+    `review_queue`, approved segments wait for a reviewer's decision while
+    the rest of the run continues, and verdicts recorded by an earlier run
+    of the review are reused instead of calling the model. With a
+    `fast_contour_agent` and a `cascade` policy, that agent judges segments
+    first and only those the policy escalates go to `contour_agent`.
+
+    Near-duplicates are looked up among the segments of the same `user_id`
+    only. With `defer_dedup`, the dedup entries of assembled segments are
+    only resolved when the caller reports their artifacts persisted
+    (resolve_duplicates()); until then, a caller must release_duplicates()
+    any it could not store, or the entries would hide their text from
+    later runs. Segments for which `provisional` returns True (e.g. the
+    open tail of a thread, which later turns may still change) are looked
+    up but never added to the index.
+    """
+    def __init__(
+        self,
+        contour_agent: Any,
+        assembler_agent: Any = None,
+        concurrency: int = 1,
+        approve: Optional[ApproveHook] = None,
+        batch_chars: int = 0,
+        verdict_cache: Optional[VerdictCache] = None,
+        progress: Optional[ProgressHook] = None,
+        dedup_index: Optional[NearDuplicateIndex] = None,
+        on_outcome: Optional[OutcomeHook] = None,
+        run_config: Optional["RunConfig"] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        scheduler: Optional[ModelScheduler] = None,
+        priority: int = INTERACTIVE,
+        prefilter: Optional[Prefilter] = None,
+        user_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        review_queue: Optional[ReviewQueue] = None,
+        fast_contour_agent: Any = None,
+        cascade: Optional[CascadePolicy] = None,
+        defer_dedup: bool = False,
+        provisional: Optional[Callable[[Segment], bool]] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.contour_agent = contour_agent
+        self.assembler_agent = assembler_agent
+        self.concurrency = concurrency
+        self.approve = approve
+        self.batch_chars = batch_chars
+        self.verdict_cache = verdict_cache
+        self.progress = progress
+        self.dedup_index = dedup_index
+        self.defer_dedup = defer_dedup
+        self.provisional = provisional
+        # Dedup entries reserved for segments of this pipeline and not resolved yet, by segment id
+        self._reserved: Dict[str, int] = {}
+        self.on_outcome = on_outcome
+        self.run_config = run_config
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.priority = priority
+        self.prefilter = prefilter
+        # Tagged onto every artifact, so they can be listed per user and thread
+        self.user_id = user_id
+        self.thread_id = thread_id
+        self.review_queue = review_queue
+        self.fast_contour_agent = fast_contour_agent if cascade is not None else None
+        self.cascade = cascade if fast_contour_agent is not None else None
+        self._fingerprint = None
+        if verdict_cache is not None:
+            self._fingerprint = agent_fingerprint(contour_agent)
+            if self.cascade is not None:
+                # Cascade verdicts are cached apart from the main model's own
+                combined = f"{self._fingerprint}:{agent_fingerprint(fast_contour_agent)}:{cascade.describe()}"
+                self._fingerprint = hashlib.sha256(combined.encode("utf-8")).hexdigest()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._events: Optional[asyncio.Queue] = None
+
+    def _report(self, stage: str, count: int):
+        if self.progress is not None and count:
+            self.progress(stage, count)
+
+    def _emit(self, event: str, outcome: SegmentOutcome):
+        if self.on_outcome is not None:
+            self.on_outcome(event, outcome)
+        if self._events is not None:
+            self._events.put_nowait((event, outcome))
+
+    async def _run_agent(self, agent: Any, agent_input: str, stage: str = "contour") -> Any:
+        """Run an agent while holding one of the in-flight slots."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        metrics = self.metrics
+        # Imported on first use: the Agents SDK takes seconds to load, and a
+        # pipeline that never calls a model should not wait for it
+        from agents.run import Runner
+
+        async def call() -> Any:
+            if self.scheduler is None:
+                return await Runner.run(agent, agent_input, run_config=self.run_config)
+            return await self.scheduler.run(
+                lambda: Runner.run(agent, agent_input, run_config=self.run_config),
+                tokens=estimate_tokens(agent, agent_input),
+                priority=self.priority,
+                usage=lambda result: result.context_wrapper.usage.total_tokens,
+                metrics=metrics,
+            )
+
+        if metrics is None:
+            async with self._semaphore:
+                result = await call()
+            return result.final_output
+        metrics.waiting.inc()
+        queued = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            metrics.waiting.dec()
+        metrics.stage_seconds.observe(time.perf_counter() - queued, stage="model_queue")
+        metrics.in_flight.inc()
+        try:
+            with metrics.time(stage):
+                result = await call()
+        except Exception:
+            metrics.model_calls.inc(stage=stage, status="error")
+            raise
+        finally:
+            metrics.in_flight.dec()
+            self._semaphore.release()
+        metrics.model_calls.inc(stage=stage, status="ok")
+        usage = result.context_wrapper.usage
+        metrics.observe_tokens(stage, usage.input_tokens, usage.output_tokens)
+        return result.final_output
+
+    async def judge(self, seg: Segment, agent: Any = None, stage: str = "contour") -> EpistemicContourVerdict:
+        """Run contour analysis for a single segment, by the contour agent unless `agent` is given."""
+        output = await self._run_agent(
+            agent or self.contour_agent, json.dumps(as_dict(seg), ensure_ascii=False), stage=stage
+        )
+        return match_contour_result(seg, output)
+
+    async def judge_batch(
+        self, batch: List[Segment], agent: Any = None, stage: str = "contour"
+    ) -> Dict[str, Union[EpistemicContourVerdict, Exception]]:
+        """
+        Run contour analysis for several segments in one call.
+
+        Segments whose id is missing from or duplicated in the batch output
+        (or all of them, if the batch call fails) are re-run one at a time.
+        Returns a mapping of segment id to its verdict, or to the exception
+        raised while judging it.
+        """
+        results: Dict[str, Union[EpistemicContourVerdict, Exception]] = {}
+        retry = batch
+        if len(batch) > 1:
+            try:
+                output = await self._run_agent(
+                    agent or self.contour_agent,
+                    json.dumps({"segments": [as_dict(seg) for seg in batch]}, ensure_ascii=False),
+                    stage=stage,
+                )
+                counts = Counter(res.id for res in output.segments)
+                by_id = {seg["id"]: seg for seg in batch}
+                for res in output.segments:
+                    if counts[res.id] == 1 and res.id in by_id:
+                        results[res.id] = to_verdict(by_id[res.id], res)
+                retry = [seg for seg in batch if seg["id"] not in results]
+            except Exception:
+                retry = batch
+            if retry and self.metrics is not None:
+                self.metrics.retries.inc(len(retry), reason="batch_fallback")
+
+        async def single(seg: Segment) -> None:
+            try:
+                results[seg["id"]] = await self.judge(seg, agent, stage)
+            except Exception as e:
+                results[seg["id"]] = e
+
+        await asyncio.gather(*(single(seg) for seg in retry))
+        return results
+
+    async def judge_cascade(
+        self, batch: List[Segment]
+    ) -> Dict[str, Union[EpistemicContourVerdict, Exception]]:
+        """
+        Like judge_batch, but through the cascade if there is one: the fast
+        agent judges the batch, then the segments the policy escalates are
+        judged again by the contour agent, whose verdicts replace the fast
+        ones. Routes, and whether audited verdicts agreed, go to the metrics.
+        """
+        if self.cascade is None:
+            return await self.judge_batch(batch)
+        first = await self.judge_batch(batch, self.fast_contour_agent, stage="contour_fast")
+        results: Dict[str, Union[EpistemicContourVerdict, Exception]] = {}
+        escalate: List[Segment] = []
+        routes: Dict[str, str] = {}
+        for seg in batch:
+            res = first[seg["id"]]
+            route = "error" if isinstance(res, Exception) else self.cascade.route(seg["text"], res)
+            if route == "accepted":
+                results[seg["id"]] = res
+            else:
+                escalate.append(seg)
+                routes[seg["id"]] = route
+            if self.metrics is not None:
+                self.metrics.cascade.inc(route=route)
+        if escalate:
+            second = await self.judge_batch(escalate)
+            for seg in escalate:
+                res = second[seg["id"]]
+                if routes[seg["id"]] == "audit" and self.metrics is not None and not isinstance(res, Exception):
+                    agreed = res.is_artifact == first[seg["id"]].is_artifact
+                    self.metrics.cascade_audits.inc(result="agreed" if agreed else "disagreed")
+                results[seg["id"]] = res
+        return results
+
+    async def judge_cached(
+        self, batch: List[Segment]
+    ) -> Dict[str, Union[EpistemicContourVerdict, Exception]]:
+        """
+        Like judge_batch, but answer from the review queue's recorded
+        verdicts or the verdict cache where possible, and store fresh
+        verdicts in the cache.
+        """
+        results: Dict[str, Union[EpistemicContourVerdict, Exception]] = {}
+        if self.review_queue is not None:
+            for seg in batch:
+                known = self.review_queue.known_verdict(seg)
+                if known is not None:
+                    results[seg["id"]] = known
+            batch = [seg for seg in batch if seg["id"] not in results]
+            if not batch:
+                return results
+        if self.verdict_cache is None:
+            results.update(await self.judge_cascade(batch))
+            return results
+        keys = {seg["id"]: VerdictCache.make_key(seg["text"], self._fingerprint) for seg in batch}
+        # SQLite calls block, so the cache is read and written off the event loop, once per batch
+        cached = await asyncio.to_thread(self.verdict_cache.get_many, list(keys.values()))
+        pending = []
+        for seg in batch:
+            verdict = cached.get(keys[seg["id"]])
+            if verdict is None:
+                pending.append(seg)
+            else:
+                results[seg["id"]] = EpistemicContourVerdict(id=seg["id"], **verdict)
+        if pending:
+            judged = await self.judge_cascade(pending)
+            await asyncio.to_thread(self.verdict_cache.put_many, {
+                keys[seg_id]: res.model_dump(include=VERDICT_FIELDS)
+                for seg_id, res in judged.items()
+                if isinstance(res, EpistemicContourVerdict)
+            })
+            results.update(judged)
+        return results
+
+    async def review(
+        self, seg: Segment, seg_out: Union[EpistemicContourVerdict, Exception]
+    ) -> Tuple[SegmentOutcome, bool]:
+        """
+        Record a segment's contour result and decide whether to assemble it.
+
+        Returns the outcome and whether the segment is approved for assembly.
+        """
+        outcome = SegmentOutcome(segment_id=seg["id"], segment=seg)
+        try:
+            if isinstance(seg_out, Exception):
+                raise seg_out
+            outcome.verdict = seg_out
+            if self.review_queue is not None:
+                self.review_queue.record(seg, seg_out)
+            if not seg_out.is_artifact:
+                return outcome, False
+            if self.review_queue is not None:
+                decision = await self.review_queue.decide(outcome.result)
+                if decision is None:
+                    outcome.skip_reason = "awaiting review"
+                if not decision:
+                    return outcome, False
+            if self.approve is not None and not await self.approve(outcome.result):
+                return outcome, False
+            return outcome, True
+        except Exception as e:
+            outcome.error = f"{type(e).__name__}: {e}"
+            return outcome, False
+
+    async def assemble(self, outcomes: List[SegmentOutcome]) -> None:
+        """
+        Attach artifacts to approved outcomes.
+
+        Assembly runs locally in one batch, in a worker thread, unless an
+        assembler agent was given, in which case each outcome gets its own
+        agent call. Failures are recorded on the affected outcomes.
+        """
+        if not outcomes:
+            return
+        if self.assembler_agent is None:
+            # Assembly writes to the artifact store, so it runs in a worker thread, off the event loop
+            assemble = asyncio.to_thread(
+                assemble_artifacts, [o.result for o in outcomes], user_id=self.user_id, thread_id=self.thread_id
+            )
+            try:
+                if self.metrics is not None:
+                    with self.metrics.time("assembly"):
+                        artifacts = await assemble
+                else:
+                    artifacts = await assemble
+            except Exception as e:
+                for outcome in outcomes:
+                    outcome.error = f"{type(e).__name__}: {e}"
+                return
+            for outcome, artifact in zip(outcomes, artifacts):
+                outcome.artifact = artifact
+            return
+
+        async def via_agent(outcome: SegmentOutcome) -> None:
+            try:
+                outcome.artifact = await self._run_agent(
+                    self.assembler_agent,
+                    json.dumps(
+                        {**outcome.result.model_dump(), "user_id": self.user_id, "thread_id": self.thread_id},
+                        ensure_ascii=False,
+                    ),
+                    stage="assembly",
+                )
+            except Exception as e:
+                outcome.error = f"{type(e).__name__}: {e}"
+
+        await asyncio.gather(*(via_agent(o) for o in outcomes))
+
+    def skip_reviewed(self, batch: List[Segment]) -> Tuple[List[Segment], Dict[str, SegmentOutcome]]:
+        """
+        Split off segments whose artifact an earlier run of the review
+        already assembled, linking each to that artifact.
+        """
+        if self.review_queue is None:
+            return batch, {}
+        remaining = []
+        done: Dict[str, SegmentOutcome] = {}
+        for seg in batch:
+            knowledge_id = self.review_queue.assembled_before(seg)
+            if knowledge_id is None:
+                remaining.append(seg)
+            else:
+                done[seg["id"]] = SegmentOutcome(
+                    segment_id=seg["id"], duplicate_of=knowledge_id, skip_reason="reviewed in an earlier run"
+                )
+        return remaining, done
+
+    def skip_implausible(
+        self, batch: List[Segment]
+    ) -> Tuple[List[Segment], Dict[str, SegmentOutcome], Dict[str, PrefilterDecision]]:
+        """
+        Split off segments the prefilter rules out, logging each one.
+
+        Returns the segments still to judge, outcomes for the skipped ones,
+        and the decisions for segments the prefilter would have skipped but
+        that were sampled for judging anyway, to be logged with their verdict.
+        """
+        if self.prefilter is None:
+            return batch, {}, {}
+        plausible = []
+        skipped: Dict[str, SegmentOutcome] = {}
+        audited: Dict[str, PrefilterDecision] = {}
+        for seg in batch:
+            text = seg["text"]
+            decision = self.prefilter.check(text)
+            if not self.prefilter.skips(decision):
+                plausible.append(seg)
+            elif self.prefilter.sampled(text):
+                plausible.append(seg)
+                audited[seg["id"]] = decision
+            else:
+                self.prefilter.log(seg, decision)
+                skipped[seg["id"]] = SegmentOutcome(
+                    segment_id=seg["id"],
+                    skip_reason=f"prefilter: mostly {decision.reason} (score {decision.score:.2f})",
+                )
+        if self.metrics is not None:
+            if skipped:
+                self.metrics.prefiltered.inc(len(skipped), action="skipped")
+            if audited:
+                self.metrics.prefiltered.inc(len(audited), action="audited")
+        return plausible, skipped, audited
+
+    def skip_duplicates(
+        self, batch: List[Segment]
+    ) -> Tuple[List[Segment], Dict[str, SegmentOutcome], Dict[str, int]]:
+        """
+        Split off segments that nearly duplicate ones seen before.
+
+        Returns the segments still to judge, outcomes for the duplicates
+        (linked to the existing knowledge_id when there is one), and the
+        dedup index entry reserved for each remaining segment. Entries are
+        reserved up front so repeats within the same run are caught too.
+        """
+        if self.dedup_index is None:
+            return batch, {}, {}
+        checks = []
+        for seg in batch:
+            checks.append((
+                self.dedup_index.signature(seg["text"]),
+                # A segment of a resumed review is not a duplicate of its own entry from the earlier run
+                not (self.review_queue is not None and self.review_queue.resumes(seg)),
+                self.provisional is None or not self.provisional(seg),
+            ))
+        fresh = []
+        duplicates: Dict[str, SegmentOutcome] = {}
+        entries: Dict[str, int] = {}
+        for seg, (match, entry_id) in zip(batch, self.dedup_index.check_many(checks, owner=self.user_id)):
+            if match is None:
+                fresh.append(seg)
+                if entry_id is not None:
+                    entries[seg["id"]] = self._reserved[seg["id"]] = entry_id
+                continue
+            duplicates[seg["id"]] = SegmentOutcome(
+                segment_id=seg["id"],
+                duplicate_of=match.knowledge_id,
+                skip_reason=f"near-duplicate (similarity {match.similarity:.2f})",
+            )
+        return fresh, duplicates, entries
+
+    def record_duplicates(self, outcomes: List[SegmentOutcome]):
+        """
+        Store the final verdicts of newly judged segments in the dedup index.
+
+        Segments that failed (or still await review) are removed again so a
+        later run re-judges them. With `defer_dedup`, assembled segments
+        stay reserved until resolve_duplicates().
+        """
+        failed, resolved = [], []
+        for outcome in outcomes:
+            if outcome.segment_id not in self._reserved:
+                continue
+            if outcome.error or outcome.verdict is None or outcome.skip_reason:
+                failed.append(outcome.segment_id)
+            elif outcome.artifact is None or not self.defer_dedup:
+                resolved.append(outcome)
+        self.release_duplicates(failed)
+        self.resolve_duplicates(resolved)
+
+    def resolve_duplicates(self, outcomes: Iterable[SegmentOutcome]):
+        """Resolve the dedup entries of segments whose artifacts (if any) are now persisted."""
+        verdicts = []
+        for outcome in outcomes:
+            entry_id = self._reserved.pop(outcome.segment_id, None)
+            if entry_id is None:
+                continue
+            artifact_id = outcome.artifact.id if outcome.artifact is not None else None
+            verdicts.append((entry_id, artifact_id is not None, artifact_id))
+        if verdicts:
+            self.dedup_index.resolve_many(verdicts)
+
+    def release_duplicates(self, segment_ids: Optional[Iterable[str]] = None):
+        """
+        Remove reserved dedup entries that were not resolved: those of
+        `segment_ids`, or all of them. For segments whose artifacts could
+        not be stored, or whose processing was abandoned.
+        """
+        ids = list(self._reserved) if segment_ids is None else segment_ids
+        entry_ids = [self._reserved.pop(segment_id) for segment_id in ids if segment_id in self._reserved]
+        if entry_ids:
+            self.dedup_index.remove_many(entry_ids)
+
+    async def process_batch(self, batch: List[Segment]) -> List[SegmentOutcome]:
+        """
+        Judge a batch of segments, then assemble the approved ones.
+
+        Segments ruled out by the prefilter, near-duplicates of earlier
+        segments and segments already artifacted in an earlier run of the
+        review are skipped without a model call. Any exception is recorded
+        on the affected outcomes instead of propagating, so one failing
+        segment does not abort the others.
+        """
+        unreviewed, reviewed_before = self.skip_reviewed(batch)
+        plausible, implausible, audited = self.skip_implausible(unreviewed)
+        fresh, duplicates, _ = self.skip_duplicates(plausible)
+        duplicates.update(implausible)
+        duplicates.update(reviewed_before)
+        outcomes: Dict[str, SegmentOutcome] = dict(duplicates)
+        if fresh:
+            try:
+                judged = await self._judge_and_assemble(fresh)
+            except BaseException:
+                # Cancelled (or failed) before the verdicts were recorded
+                self.release_duplicates(seg["id"] for seg in fresh)
+                raise
+            self.record_duplicates(judged)
+            for seg, outcome in zip(fresh, judged):
+                if seg["id"] in audited and outcome.verdict is not None:
+                    self.prefilter.log(seg, audited[seg["id"]], verdict=outcome.verdict.is_artifact)
+            outcomes.update((o.segment_id, o) for o in judged)
+        self._report("skipped", len(duplicates))
+        for outcome in duplicates.values():
+            self._emit("skipped", outcome)
+        ordered = [outcomes[seg["id"]] for seg in batch]
+        if self.metrics is not None:
+            for outcome in ordered:
+                self.metrics.segments.inc(outcome=outcome_label(outcome))
+        return ordered
+
+    async def _judge_and_assemble(self, fresh: List[Segment]) -> List[SegmentOutcome]:
+        """Judge and review the segments, assemble the approved ones; one outcome per segment."""
+        results = await self.judge_cached(fresh)
+        self._report("judged", sum(1 for res in results.values() if not isinstance(res, Exception)))
+        reviewed = await asyncio.gather(*(self.review(seg, results[seg["id"]]) for seg in fresh))
+        for outcome, _ in reviewed:
+            self._emit("error" if outcome.error else "verdict", outcome)
+        approved = [outcome for outcome, ok in reviewed if ok]
+        await self.assemble(approved)
+        for outcome in approved:
+            if self.review_queue is not None and outcome.artifact is not None:
+                self.review_queue.assembled(outcome)
+            self._emit("error" if outcome.error else "artifact", outcome)
+        self._report("assembled", sum(1 for outcome in approved if outcome.artifact is not None))
+        return [outcome for outcome, _ in reviewed]
+
+    async def _batches(self, segments: Union[Iterable[Segment], AsyncIterable[Segment]]) -> AsyncIterator[List[Segment]]:
+        if hasattr(segments, "__aiter__"):
+            async for batch in apack_segments(segments, self.batch_chars):
+                yield batch
+            return
+        if self.batch_chars > 0:
+            batches = pack_segments(segments, self.batch_chars)
+        else:
+            batches = ([seg] for seg in segments)
+        for batch in batches:
+            yield batch
+
+    async def run(self, segments: Union[Iterable[Segment], AsyncIterable[Segment]]) -> List[SegmentOutcome]:
+        """
+        Process all segments, with at most `concurrency` model calls in flight.
+
+        `segments` may be a generator such as iter_segments(); each batch is
+        started as soon as it is packed, so early segments are analyzed while
+        later ones are still being read. It may also be an async iterable
+        (e.g. segments parsed from a request body as it arrives); such a
+        source is only read READ_AHEAD_PER_CALL * `concurrency` batches ahead
+        of the ones finished, so a slow model pushes back on the sender
+        instead of the input piling up in memory. Returns one SegmentOutcome
+        per segment, in input order.
+        """
+        read_ahead = None
+        if hasattr(segments, "__aiter__"):
+            read_ahead = asyncio.Semaphore(READ_AHEAD_PER_CALL * self.concurrency)
+        tasks = []
+        try:
+            started = time.perf_counter()
+            async for batch in self._batches(segments):
+                if self.metrics is not None:
+                    self.metrics.stage_seconds.observe(time.perf_counter() - started, stage="segmentation")
+                self._report("segmented", len(batch))
+                if read_ahead is not None:
+                    await read_ahead.acquire()
+                task = asyncio.ensure_future(self.process_batch(batch))
+                tasks.append(task)
+                if read_ahead is not None:
+                    task.add_done_callback(lambda _: read_ahead.release())
+                # Let started batches issue their model calls before reading on
+                await asyncio.sleep(0)
+                started = time.perf_counter()
+            per_batch = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [outcome for outcomes in per_batch for outcome in outcomes]
+
+    async def stream(
+        self, segments: Union[Iterable[Segment], AsyncIterable[Segment]]
+    ) -> AsyncIterator[Tuple[str, SegmentOutcome]]:
+        """
+        Run the pipeline and yield (event, outcome) pairs as segments complete.
+
+        A segment yields "verdict" once judged and, if assembled, "artifact"
+        afterwards; near-duplicates yield "skipped" and failures "error".
+        Events arrive in completion order, not input order. Closing the
+        generator early (e.g. because the client went away) cancels the
+        remaining work.
+        """
+        self._events = events = asyncio.Queue()
+        done = object()
+
+        async def drive() -> List[SegmentOutcome]:
+            try:
+                return await self.run(segments)
+            finally:
+                events.put_nowait(done)
+
+        task = asyncio.ensure_future(drive())
+        try:
+            while True:
+                item = await events.get()
+                if item is done:
+                    break
+                yield item
+            # Re-raise anything that aborted the run
+            await task
+        finally:
+            self._events = None
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,170 @@
+"""Per-process registry of the API's agents and clients.
+
+Agents, the cascade policy and the SQLite-backed stores are built once per
+worker process on first use, instead of on every request. warm_up() builds
+all of them up front; the API calls it at startup, so the first request of
+a worker does not pay for importing the Agents SDK or opening the stores.
+
+Everything here belongs to the process that built it. If the process forks
+(e.g. a server preloading the app before starting its workers), the child
+starts with an empty registry and builds its own, so no SQLite connection
+or other handle is ever shared between processes.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.config import (
+    ASSEMBLY_MODE,
+    VERDICT_CACHE_PATH,
+    VERDICT_CACHE_MAX_ENTRIES,
+    VERDICT_CACHE_MAX_AGE_DAYS,
+    DEDUP_INDEX_PATH,
+    DEDUP_THRESHOLD,
+    PREFILTER_THRESHOLD,
+    PREFILTER_AUDIT_PATH,
+    PREFILTER_AUDIT_RATE,
+    PREFILTER_AUDIT_MAX_MB,
+    THREAD_STATE_PATH,
+    JOB_STATE_PATH,
+    ARTIFACT_QUERY_BACKEND,
+    CONTOUR_CASCADE_MODEL,
+    CASCADE_MIN_CONFIDENCE,
+    CASCADE_ESCALATE_ON_FLAGS,
+    CASCADE_AUDIT_RATE,
+)
+from utils.cascade import CascadePolicy
+from utils.verdict_cache import VerdictCache
+from utils.dedup import NearDuplicateIndex
+from utils.prefilter import Prefilter
+from utils.thread_state import ThreadStateStore
+from utils.job_store import JobStore
+from utils.artifact_query import PostgresArtifactQuery
+from project_agents.artifact_assembly import get_artifact_store
+
+_objects: Dict[str, Any] = {}
+# Process that built _objects
+_pid: Optional[int] = None
+
+
+def _get(name: str, build: Callable[[], Any]) -> Any:
+    """The registered object `name`, built on first use in this process."""
+    global _pid
+    if _pid != os.getpid():
+        # Objects inherited across a fork are dropped, not closed: the parent still uses them
+        _objects.clear()
+        _pid = os.getpid()
+    if name not in _objects:
+        _objects[name] = build()
+    return _objects[name]
+
+
+def get_contour_agent():
+    """The main EpistemicContourAgent."""
+    def build():
+        from project_agents.epistemic_contour_agent import EpistemicContourAgent
+        return EpistemicContourAgent()
+    return _get("contour_agent", build)
+
+
+def get_assembler_agent():
+    """ArtifactAssemblerAgent if ASSEMBLY_MODE is "agent", else None (local assembly)."""
+    def build():
+        if ASSEMBLY_MODE != "agent":
+            return None
+        from project_agents.artifact_assembler_agent import ArtifactAssemblerAgent
+        return ArtifactAssemblerAgent()
+    return _get("assembler_agent", build)
+
+
+def get_cascade() -> Tuple[Any, Optional[CascadePolicy]]:
+    """The fast contour agent and routing policy of the model cascade, or (None, None) if disabled."""
+    def build():
+        if not CONTOUR_CASCADE_MODEL:
+            return None, None
+        from project_agents.epistemic_contour_agent import EpistemicContourAgent
+        return (
+            EpistemicContourAgent(model=CONTOUR_CASCADE_MODEL, with_confidence=True),
+            CascadePolicy(CASCADE_MIN_CONFIDENCE, CASCADE_ESCALATE_ON_FLAGS, CASCADE_AUDIT_RATE),
+        )
+    return _get("cascade", build)
+
+
+def get_verdict_cache():
+    """Process-wide verdict cache, opened on first use (None if disabled)."""
+    def build():
+        if not VERDICT_CACHE_PATH:
+            return None
+        return VerdictCache(
+            VERDICT_CACHE_PATH,
+            max_entries=VERDICT_CACHE_MAX_ENTRIES,
+            max_age_seconds=VERDICT_CACHE_MAX_AGE_DAYS * 86400,
+        )
+    return _get("verdict_cache", build)
+
+
+def get_dedup_index():
+    """Process-wide near-duplicate index, opened on first use (None if disabled)."""
+    def build():
+        return NearDuplicateIndex(DEDUP_INDEX_PATH, threshold=DEDUP_THRESHOLD) if DEDUP_INDEX_PATH else None
+    return _get("dedup_index", build)
+
+
+def get_prefilter():
+    """Process-wide segment pre-filter (None if disabled)."""
+    def build():
+        if PREFILTER_THRESHOLD <= 0:
+            return None
+        return Prefilter(
+            PREFILTER_THRESHOLD,
+            audit_path=PREFILTER_AUDIT_PATH,
+            audit_rate=PREFILTER_AUDIT_RATE,
+            audit_max_bytes=int(PREFILTER_AUDIT_MAX_MB * 1024 * 1024),
+        )
+    return _get("prefilter", build)
+
+
+def get_thread_store():
+    """Process-wide per-thread ingestion state, opened on first use (None if disabled)."""
+    return _get("thread_store", lambda: ThreadStateStore(THREAD_STATE_PATH) if THREAD_STATE_PATH else None)
+
+
+def get_job_store():
+    """Job status shared between worker processes, opened on first use (None if disabled)."""
+    return _get("job_store", lambda: JobStore(JOB_STATE_PATH) if JOB_STATE_PATH else None)
+
+
+def get_artifact_query():
+    """Backend for GET /artifacts, chosen by ARTIFACT_QUERY_BACKEND."""
+    def build():
+        if ARTIFACT_QUERY_BACKEND == "postgres":
+            return PostgresArtifactQuery()
+        return get_artifact_store()
+    return _get("artifact_query", build)
+
+
+# Everything warm_up() builds, in order
+WARM_UP = (
+    ("contour_agent", get_contour_agent),
+    ("assembler_agent", get_assembler_agent),
+    ("cascade", get_cascade),
+    ("verdict_cache", get_verdict_cache),
+    ("dedup_index", get_dedup_index),
+    ("prefilter", get_prefilter),
+    ("thread_store", get_thread_store),
+    ("job_store", get_job_store),
+    ("artifact_query", get_artifact_query),
+)
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Build every agent and client this process will need, and return the
+    seconds each took. The first one built pays for importing the Agents SDK.
+    """
+    timings = {}
+    for name, get in WARM_UP:
+        start = time.perf_counter()
+        get()
+        timings[name] = time.perf_counter() - start
+    return timings
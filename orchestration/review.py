@@ -0,0 +1,148 @@
+"""Human review of approved segments for the CLI's --review mode.
+
+The pipeline hands every segment the contour agent approves to
+ReviewQueue.decide() and moves on: the segment waits in a queue while
+other segments are judged and accepted ones are assembled, and a single
+reviewer task works through the queue in arrival order. Verdicts and
+decisions are written to a ReviewStore as they are made. Running the same
+session again resumes the review: recorded verdicts are reused instead of
+calling the model, decided segments are not asked about again, and
+segments whose artifact was already assembled are skipped.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from utils.models import EpistemicContourResult, EpistemicContourVerdict, SegmentOutcome
+from utils.review_store import ReviewStore
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ReviewQueue:
+    """
+    Review state of one session, plus the queue of segments awaiting a decision.
+
+    `ask` prompts the reviewer and returns the answer; it runs in a worker
+    thread, so the pipeline keeps going while the reviewer reads.
+    """
+    def __init__(self, store: ReviewStore, session: str, ask: Optional[Callable[[str], str]] = None):
+        self.store = store
+        self.session = session
+        self.ask = ask or input
+        self._rows = store.load(session)
+        self._seq = max((row["seq"] for row in self._rows.values()), default=0)
+        self._hashes: Dict[str, str] = {}
+        # Recorded segments met again in this run
+        self._resumed: Set[str] = set()
+        self._queue: "asyncio.Queue[Tuple[EpistemicContourResult, str, asyncio.Future]]" = asyncio.Queue()
+        self._closed = False
+        self.reviewed = 0
+        self.deferred = 0
+
+    def _hash(self, seg: Any) -> str:
+        digest = self._hashes.get(seg["id"])
+        if digest is None:
+            digest = self._hashes[seg["id"]] = text_hash(seg["text"])
+        return digest
+
+    @property
+    def resumed(self) -> int:
+        """Segments recorded by earlier runs of this session."""
+        return len(self._rows)
+
+    def assembled_before(self, seg: Any) -> Optional[str]:
+        """knowledge_id of the artifact an earlier run assembled from this segment, if any."""
+        row = self._rows.get(self._hash(seg))
+        return row["knowledge_id"] if row is not None else None
+
+    def resumes(self, seg: Any) -> bool:
+        """
+        Whether this is the first segment of this run with the text of a
+        recorded segment. Later copies are left to near-duplicate detection.
+        """
+        digest = self._hash(seg)
+        if digest not in self._rows or digest in self._resumed:
+            return False
+        self._resumed.add(digest)
+        return True
+
+    def known_verdict(self, seg: Any) -> Optional[EpistemicContourVerdict]:
+        """The verdict recorded for this segment by an earlier run, if any."""
+        row = self._rows.get(self._hash(seg))
+        if row is None:
+            return None
+        return EpistemicContourVerdict(id=seg["id"], **row["verdict"])
+
+    def record(self, seg: Any, verdict: EpistemicContourVerdict):
+        """Persist a segment's verdict in arrival order, so it is never judged again."""
+        digest = self._hash(seg)
+        if digest in self._rows:
+            return
+        self._seq += 1
+        data = verdict.model_dump(exclude={"id"})
+        self.store.record(self.session, digest, self._seq, data)
+        self._rows[digest] = {"seq": self._seq, "verdict": data, "decision": None, "knowledge_id": None}
+
+    def assembled(self, outcome: SegmentOutcome):
+        """Persist the knowledge_id of an accepted segment's artifact."""
+        digest = self._hash(outcome.segment)
+        self.store.assembled(self.session, digest, outcome.artifact.id)
+        self._rows[digest]["knowledge_id"] = outcome.artifact.id
+
+    async def decide(self, result: EpistemicContourResult) -> Optional[bool]:
+        """
+        Whether the reviewer accepts an approved segment. Decisions from
+        earlier runs are returned at once; otherwise the segment is queued
+        until the reviewer gets to it. None if the review was paused first.
+        """
+        digest = self._hashes.get(result.id) or text_hash(result.text)
+        decision = self._rows[digest]["decision"]
+        if decision is not None:
+            return decision
+        if self._closed:
+            self.deferred += 1
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((result, digest, future))
+        return await future
+
+    async def run(self):
+        """Present queued segments to the reviewer one at a time, until cancelled or paused."""
+        while True:
+            result, digest, future = await self._queue.get()
+            if future.done():
+                continue
+            print(f"[?] Segment {result.id} approved for artifacting ({self._queue.qsize()} more waiting).")
+            print("--- Segment Preview (first 3 lines) ---")
+            print("\n".join(result.text.splitlines()[:3]))
+            print("--- End Preview ---")
+            print(f"Diagnostic flags: {result.diagnostic_flags}")
+            print(f"Justification: {result.justification}\n")
+            try:
+                choice = await asyncio.to_thread(self.ask, "Accept this as an artifact? (Y/n): ")
+            except EOFError:
+                print("\n[*] Review paused; the remaining segments stay queued for the next run.")
+                future.set_result(None)
+                self.deferred += 1
+                self.close()
+                return
+            accepted = choice.strip().lower() != "n"
+            if not accepted:
+                print(f"[-] User rejected segment {result.id}.")
+            self.store.decide(self.session, digest, accepted)
+            self._rows[digest]["decision"] = accepted
+            self.reviewed += 1
+            future.set_result(accepted)
+
+    def close(self):
+        """Stop asking: segments still queued, and any approved later, are deferred to the next run."""
+        self._closed = True
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result(None)
+                self.deferred += 1
@@ -0,0 +1,320 @@
+"""Process-wide scheduler for model calls.
+
+Every agent run of the pipeline goes through one ModelScheduler, which
+  - hands out call slots in priority order (interactive before batch),
+  - limits requests and estimated tokens per minute with token buckets,
+  - adapts the number of slots with AIMD: it grows by about one slot per
+    round of successful calls and halves on a 429 (or shrinks by 10% when
+    latency exceeds a target), and
+  - retries rate-limited and transient failures with jittered exponential
+    backoff, waiting at least as long as the server's Retry-After.
+A 429 carrying Retry-After pauses all calls for that long, not just the
+one that failed.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from utils.config import (
+    MODEL_RPM,
+    MODEL_TPM,
+    MODEL_MAX_CONCURRENCY,
+    MODEL_MIN_CONCURRENCY,
+    MODEL_MAX_RETRIES,
+    MODEL_RETRY_BASE_SECONDS,
+    MODEL_RETRY_MAX_SECONDS,
+    MODEL_LATENCY_TARGET_SECONDS,
+)
+from utils.metrics import PipelineMetrics
+
+T = TypeVar("T")
+
+# Priorities: lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+# Rough token estimate for a call before the model reports real usage
+CHARS_PER_TOKEN = 4
+OUTPUT_TOKEN_ALLOWANCE = 256
+
+TRANSIENT_STATUS = {408, 500, 502, 503, 504}
+
+
+def estimate_tokens(agent: Any, agent_input: str) -> int:
+    """Estimated total tokens of one run of `agent` on `agent_input`."""
+    instructions = agent.instructions if isinstance(agent.instructions, str) else ""
+    return (len(instructions) + len(agent_input)) // CHARS_PER_TOKEN + OUTPUT_TOKEN_ALLOWANCE
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    return getattr(exc, "status_code", None)
+
+
+def _openai_error(exc: BaseException, name: str) -> bool:
+    # An openai exception means openai is loaded; never import it (about a second) just to check
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exc, getattr(openai, name))
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """Whether the error is a rate-limit response (HTTP 429)."""
+    return _openai_error(exc, "RateLimitError") or _status(exc) == 429
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether the error is worth retrying: connection problems, timeouts and 5xx responses."""
+    return _openai_error(exc, "APIConnectionError") or _status(exc) in TRANSIENT_STATUS
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or Retry-After."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units per minute, holding at most `capacity`
+    (default: ten seconds' worth). A rate of 0 means unlimited.
+    """
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else max(1.0, per_minute / 6)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        # A request larger than the bucket only has to wait for a full bucket
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        """Consume `amount` units; the balance may go negative when correcting an estimate."""
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= amount
+
+    def give(self, amount: float):
+        """Return units taken for an overestimate."""
+        if self.rate > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelScheduler:
+    """
+    Priority-ordered, rate-limited, adaptively concurrent runner for model calls.
+    """
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        retry_base: float = 0.5,
+        retry_max: float = 30.0,
+        latency_target: float = 0.0,
+    ):
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError("need 1 <= min_concurrency <= max_concurrency")
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.latency_target = latency_target
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.throttled = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        # Smoothed call latency; one decrease is allowed per such interval
+        self._latency = 1.0
+
+    @property
+    def waiting(self) -> int:
+        """Calls queued for a slot."""
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def _wake(self):
+        while self._waiters and self.active < int(self.limit):
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.active += 1
+            fut.set_result(None)
+
+    async def _acquire_slot(self, priority: int):
+        if self.active < int(self.limit) and not self.waiting:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was granted just as we were cancelled; hand it on
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        self.active -= 1
+        self._wake()
+
+    async def _acquire_rate(self, tokens: int):
+        while True:
+            wait = max(
+                self._paused_until - time.monotonic(),
+                self.requests.delay(1),
+                self.tokens.delay(tokens),
+            )
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                return
+            await asyncio.sleep(wait)
+
+    def _decrease(self, factor: float):
+        # At most one decrease per round trip, so a burst of 429s from calls
+        # that were already in flight counts as one congestion signal
+        now = time.monotonic()
+        if now - self._last_decrease < self._latency:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+
+    def _on_success(self, latency: float):
+        self._latency = 0.8 * self._latency + 0.2 * latency
+        if self.latency_target and latency > self.latency_target:
+            self._decrease(0.9)
+            return
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        self._wake()
+
+    def _backoff(self, attempt: int, server_delay: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        if server_delay is not None:
+            delay = max(delay, server_delay + random.uniform(0, self.retry_base))
+        return delay
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        priority: int = INTERACTIVE,
+        usage: Optional[Callable[[T], int]] = None,
+        metrics: Optional[PipelineMetrics] = None,
+    ) -> T:
+        """
+        Run `call` once a slot and rate budget are free, retrying rate-limit
+        and transient errors up to max_retries times.
+
+        `tokens` is the estimated token cost; if `usage` is given it reads the
+        actual total from the result, and the difference is settled with the
+        token bucket. Errors that are not retryable, or that persist after
+        the last retry, are raised.
+        """
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            await self._acquire_slot(priority)
+            try:
+                await self._acquire_rate(tokens)
+                if metrics is not None:
+                    metrics.stage_seconds.observe(time.perf_counter() - queued, stage="scheduler_wait")
+                start = time.perf_counter()
+                try:
+                    result = await call()
+                except Exception as e:
+                    throttled = is_throttled(e)
+                    server_delay = retry_after(e)
+                    if throttled:
+                        self.throttled += 1
+                        self._decrease(0.5)
+                        if server_delay:
+                            self._paused_until = max(self._paused_until, time.monotonic() + server_delay)
+                    if attempt >= self.max_retries or not (throttled or is_transient(e)):
+                        raise
+                    delay = self._backoff(attempt, server_delay)
+                else:
+                    self._on_success(time.perf_counter() - start)
+                    if usage is not None:
+                        actual = usage(result)
+                        if actual > tokens:
+                            self.tokens.take(actual - tokens)
+                        elif actual:
+                            self.tokens.give(tokens - actual)
+                    return result
+            finally:
+                self._release_slot()
+            attempt += 1
+            if metrics is not None:
+                metrics.retries.inc(reason="rate_limit" if throttled else "transient")
+            await asyncio.sleep(delay)
+
+
+_scheduler: Optional[ModelScheduler] = None
+_scheduler_pid: Optional[int] = None
+
+
+def get_scheduler() -> ModelScheduler:
+    """
+    Process-wide scheduler configured from utils.config, created on first
+    use. Each worker process gets its own, so MODEL_RPM and the other
+    limits apply per process.
+    """
+    global _scheduler, _scheduler_pid
+    if _scheduler is None or _scheduler_pid != os.getpid():
+        _scheduler_pid = os.getpid()
+        _scheduler = ModelScheduler(
+            rpm=MODEL_RPM,
+            tpm=MODEL_TPM,
+            max_concurrency=MODEL_MAX_CONCURRENCY,
+            min_concurrency=MODEL_MIN_CONCURRENCY,
+            max_retries=MODEL_MAX_RETRIES,
+            retry_base=MODEL_RETRY_BASE_SECONDS,
+            retry_max=MODEL_RETRY_MAX_SECONDS,
+            latency_target=MODEL_LATENCY_TARGET_SECONDS,
+        )
+    return _scheduler
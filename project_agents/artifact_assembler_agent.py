@@ -1,58 +1,42 @@
 """Artifact Assembler Agent.
 
-This OpenAI Agent assembles validated segments into structured artifacts and saves them locally.
+This OpenAI Agent assembles validated segments into structured artifacts and saves them to the
+local artifact store. The same assembly is available without a model round-trip via
+assemble_artifact(s) in project_agents.artifact_assembly, re-exported here.
 """
 
 import json
-from datetime import datetime
-from pathlib import Path
-from uuid import uuid4
 
 from agents.tool import function_tool
 from agents.agent import Agent
 from agents.model_settings import ModelSettings
-from utils.models import EpistemicContourResult, EpistemicTrace, ArtifactOutput
+from utils.config import require_openai_api_key
+from utils.models import EpistemicContourResult, ArtifactOutput
+from project_agents.artifact_assembly import (  # noqa: F401
+    assemble_artifact,
+    assemble_artifacts,
+    build_artifact,
+    get_artifact_store,
+)
 
 @function_tool
 def artifact_assembler_tool(segment_json: str) -> ArtifactOutput:
     """
     Convert a validated segment JSON into a final artifact.
 
-    Generates a UUID-based artifact ID, timestamp, wraps content, and writes JSON file.
+    Generates a UUID-based artifact ID, timestamp, wraps content, and appends it to the artifact store.
     """
-    # Parse the input segment
+    # Parse the input segment; user_id and thread_id, if present, tag the artifact
     data = json.loads(segment_json)
     seg = EpistemicContourResult.parse_obj(data)
-    if not seg.is_artifact:
-        raise ValueError(f"Segment {seg.id} is not approved for artifacting.")
-
-    # Build artifact
-    art_id = f"know_{uuid4().hex}"
-    created_at = datetime.utcnow().isoformat() + "Z"
-    trace = EpistemicTrace(
-        justification=seg.justification,
-        diagnostic_flags=seg.diagnostic_flags,
-        detected_by="EpistemicContourAgent"
-    )
-    artifact = ArtifactOutput(
-        id=art_id,
-        created_at=created_at,
-        content=seg.text,
-        epistemic_trace=trace
-    )
-
-    # Save to local file
-    output_dir = Path("data/artifacts")
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / f"{art_id}.json"
-    output_path.write_text(artifact.json(indent=2), encoding="utf-8")
-    return artifact
+    return assemble_artifact(seg, user_id=data.get("user_id"), thread_id=data.get("thread_id"))
 
 class ArtifactAssemblerAgent(Agent):
     """
     Agent that wraps approved segments into final artifacts using a function tool.
     """
     def __init__(self):
+        require_openai_api_key()
         super().__init__(
             name="ArtifactAssemblerAgent",
             instructions=(
@@ -0,0 +1,85 @@
+"""Local artifact assembly.
+
+Builds artifacts from approved segments and saves them to the local
+artifact store, without a model round-trip. The ArtifactAssemblerAgent in
+project_agents.artifact_assembler_agent does the same through a function
+tool; this module does not need the Agents SDK.
+"""
+
+import os
+from datetime import datetime
+from typing import List, Optional
+from uuid import uuid4
+
+from utils.artifact_store import ArtifactStore
+from utils.config import ARTIFACT_STORE_DIR, ARTIFACT_SHARD_MAX_MB
+from utils.models import EpistemicContourResult, EpistemicTrace, ArtifactOutput
+
+_store: Optional[ArtifactStore] = None
+_store_pid: Optional[int] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide artifact store, opened on first use (again in a forked child)."""
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        _store_pid = os.getpid()
+        _store = ArtifactStore(ARTIFACT_STORE_DIR, max_shard_bytes=ARTIFACT_SHARD_MAX_MB * 1024 * 1024)
+    return _store
+
+def build_artifact(
+    seg: EpistemicContourResult, user_id: Optional[str] = None, thread_id: Optional[str] = None
+) -> ArtifactOutput:
+    """
+    Build the final artifact for an approved segment.
+
+    Generates a UUID-based artifact ID, timestamp, and wraps content,
+    tagged with the user and thread it came from, if known.
+    """
+    if not seg.is_artifact:
+        raise ValueError(f"Segment {seg.id} is not approved for artifacting.")
+
+    art_id = f"know_{uuid4().hex}"
+    created_at = datetime.utcnow().isoformat() + "Z"
+    trace = EpistemicTrace(
+        justification=seg.justification,
+        diagnostic_flags=seg.diagnostic_flags,
+        detected_by="EpistemicContourAgent"
+    )
+    return ArtifactOutput(
+        id=art_id,
+        created_at=created_at,
+        content=seg.text,
+        epistemic_trace=trace,
+        user_id=user_id,
+        thread_id=thread_id,
+    )
+
+def assemble_artifact(
+    seg: EpistemicContourResult,
+    store: Optional[ArtifactStore] = None,
+    user_id: Optional[str] = None,
+    thread_id: Optional[str] = None,
+) -> ArtifactOutput:
+    """
+    Build the final artifact for an approved segment and save it to the local store.
+    """
+    artifact = build_artifact(seg, user_id, thread_id)
+    (store or get_artifact_store()).put(artifact)
+    return artifact
+
+def assemble_artifacts(
+    segs: List[EpistemicContourResult],
+    store: Optional[ArtifactStore] = None,
+    user_id: Optional[str] = None,
+    thread_id: Optional[str] = None,
+) -> List[ArtifactOutput]:
+    """
+    Assemble artifacts for many approved segments in one pass, without a model call.
+
+    All artifacts are appended to the store in a single write. Returns the
+    artifacts in the same order as `segs`.
+    """
+    artifacts = [build_artifact(seg, user_id, thread_id) for seg in segs]
+    (store or get_artifact_store()).put_many(artifacts)
+    return artifacts
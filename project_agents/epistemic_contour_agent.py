@@ -6,7 +6,8 @@ This OpenAI Agent analyzes whether text segments are epistemically whole knowled
 from agents.agent import Agent
 from agents.agent_output import AgentOutputSchema
 from agents.model_settings import ModelSettings
-from utils.models import EpistemicContourOutput
+from utils.config import require_openai_api_key
+from utils.models import EpistemicContourOutput, EpistemicContourTriageOutput, EpistemicContourVerdictOutput
 
 class EpistemicContourAgent(Agent):
     """
@@ -17,21 +18,46 @@ class EpistemicContourAgent(Agent):
     - Independently meaningful: can stand alone as a referable thought.
     - Contains a conceptual decision, turn, or model.
     - Avoid overfitting: focus on epistemic integrity.
+
+    With `with_confidence`, each verdict also rates the model's confidence
+    in it, for use as the fast first pass of a model cascade.
     """
-    def __init__(self):
+    def __init__(self, verdict_only: bool = True, model: str = "gpt-4o", with_confidence: bool = False):
+        require_openai_api_key()
+        if with_confidence:
+            output_model = EpistemicContourTriageOutput
+            output_hint = (
+                "Return valid JSON matching the EpistemicContourTriageOutput schema, with exactly one result per "
+                "input segment, using the segment's 'id' unchanged. Do not repeat the segment text. Rate your "
+                "confidence in each decision from 0 to 1 in 'confidence'; use a low value for borderline segments."
+            )
+        elif verdict_only:
+            # Compact schema: the model returns only its decision, not the segment text
+            output_model = EpistemicContourVerdictOutput
+            output_hint = (
+                "Return valid JSON matching the EpistemicContourVerdictOutput schema, with exactly one result per "
+                "input segment, using the segment's 'id' unchanged. Do not repeat the segment text."
+            )
+        else:
+            output_model = EpistemicContourOutput
+            output_hint = (
+                "Return valid JSON matching the EpistemicContourOutput schema, with exactly one result per "
+                "input segment, using the segment's 'id' unchanged."
+            )
         super().__init__(
             name="EpistemicContourAgent",
             instructions=(
-                "You are an Epistemic Contour Agent. You receive a single segment as a JSON object "
-                "with 'id' and 'text'. Assess if it is a self-contained knowledge artifact. "
+                "You are an Epistemic Contour Agent. You receive either a single segment as a JSON object "
+                "with 'id' and 'text', or a JSON object whose 'segments' list holds several such segments. "
+                "Assess each segment independently: is it a self-contained knowledge artifact? "
                 "Use these criteria: coherence, independent meaningfulness, reusability, and presence of a conceptual decision or model. "
-                "Return valid JSON matching the EpistemicContourOutput schema."
+                + output_hint
             ),
             # Use a model that supports JSON schema directives
-            model="gpt-4o",
+            model=model,
             model_settings=ModelSettings(temperature=0),
             # Enable strict JSON schema enforcement
-            output_type=AgentOutputSchema(EpistemicContourOutput),
+            output_type=AgentOutputSchema(output_model),
         )
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""Paragraph segmentation.
+
+The segmenter is a chain of generators, so it can consume a file handle or
+a stream of turns and hand out segments as soon as they close.
+SEGMENTATION_MODE selects between this paragraph segmenter and the
+topic-shift segmenter in project_agents.topic_segmentation, which is only
+imported (along with numpy) when it is used. This module needs neither the
+Agents SDK nor an API key; the SegmentationAgent wrapping it lives in
+project_agents.segmentation_agent.
+"""
+
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from utils.config import SEGMENTATION_MODE
+
+# Minimum length of a segment, in characters
+MIN_SEGMENT_LEN = 250
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """
+    Yield the lines of `text`, split on "\n" only and keeping the line endings.
+
+    Unlike str.splitlines, this matches how a file handle opened with
+    newline="\n" iterates, and it does not build the whole list up front.
+    """
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end + 1]
+        start = end + 1
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yield stripped, non-empty paragraphs from an iterable of lines.
+
+    A whitespace-only line ends a paragraph, which is the same rule as
+    splitting on r"\r?\n\s*\r?\n". `lines` can be a file handle, so the
+    input never has to be held in memory as a whole.
+    """
+    buf: List[str] = []
+    for line in lines:
+        if line.strip():
+            buf.append(line)
+            continue
+        if buf:
+            para = "".join(buf).strip()
+            buf = []
+            if para:
+                yield para
+    if buf:
+        para = "".join(buf).strip()
+        if para:
+            yield para
+
+
+def iter_turn_paragraphs(turns: Iterable[str]) -> Iterator[str]:
+    """
+    Yield paragraphs from a sequence of conversation turns.
+
+    Equivalent to iter_paragraphs over the turns joined with blank lines,
+    without building the joined string.
+    """
+    for turn in turns:
+        yield from iter_paragraphs(iter_lines(turn))
+
+
+class SegmentBuilder:
+    """
+    Resumable form of iter_segments.
+
+    feed() yields segments as they close; tail() is what the input would end
+    with if it ended now. The open state (the held-back last segment and the
+    paragraphs of the segment being built) can be saved with state() and
+    restored through the constructor, so a growing input can be segmented
+    one piece at a time with the same result as segmenting it in one go.
+    """
+    def __init__(self, held: Optional[Dict[str, str]] = None, current: Optional[List[str]] = None):
+        self.held = dict(held) if held is not None else None
+        self.current: List[str] = list(current or [])
+        # Length of the current paragraphs joined with "\n\n"
+        self.current_len = sum(len(p) for p in self.current) + 2 * max(0, len(self.current) - 1)
+
+    def feed(self, paragraphs: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """Consume paragraphs, yielding each segment once the next one has closed."""
+        for text in paragraphs:
+            if not self.current:
+                # start new segment or emit long paragraph
+                if len(text) >= MIN_SEGMENT_LEN:
+                    if self.held is not None:
+                        yield self.held
+                    self.held = {"id": f"seg_{uuid.uuid4().hex}", "text": text}
+                    continue
+                self.current.append(text)
+                self.current_len = len(text)
+                continue
+            # accumulate into current segment; the joined length includes the "\n\n" separator
+            self.current.append(text)
+            self.current_len += 2 + len(text)
+            if self.current_len >= MIN_SEGMENT_LEN:
+                if self.held is not None:
+                    yield self.held
+                self.held = {"id": f"seg_{uuid.uuid4().hex}", "text": "\n\n".join(self.current)}
+                self.current = []
+                self.current_len = 0
+
+    def tail(self) -> List[Dict[str, str]]:
+        """
+        The open segments if the input ended now, without consuming them: at
+        most one, the held segment with any short trailing paragraphs merged
+        in (or those paragraphs alone if there is none).
+        """
+        if not self.current:
+            return [dict(self.held)] if self.held is not None else []
+        # feed() closes any segment that reaches the minimum, so the leftover is short
+        leftover = "\n\n".join(self.current)
+        if self.held is None:
+            return [{"id": f"seg_{uuid.uuid4().hex}", "text": leftover}]
+        return [{"id": self.held["id"], "text": self.held["text"] + "\n\n" + leftover}]
+
+    def finish(self) -> Iterator[Dict[str, str]]:
+        """Yield the remaining segments at the end of the input."""
+        # handle leftover paragraphs
+        if self.current:
+            leftover = "\n\n".join(self.current)
+            if self.current_len >= MIN_SEGMENT_LEN or self.held is None:
+                if self.held is not None:
+                    yield self.held
+                self.held = {"id": f"seg_{uuid.uuid4().hex}", "text": leftover}
+            else:
+                self.held["text"] += "\n\n" + leftover
+            self.current = []
+            self.current_len = 0
+        if self.held is not None:
+            yield self.held
+            self.held = None
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable open state, for segment_builder(state)."""
+        return {"mode": "paragraph", "held": self.held, "current": list(self.current)}
+
+
+def iter_segments(paragraphs: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    Group paragraphs into segments of at least MIN_SEGMENT_LEN characters.
+
+    Short trailing paragraphs are merged into the last segment, so each
+    segment is yielded once the next one has closed (or the input ends).
+    Runs in linear time by tracking the length of the open segment rather
+    than re-joining its paragraphs.
+    """
+    builder = SegmentBuilder()
+    yield from builder.feed(paragraphs)
+    yield from builder.finish()
+
+
+def segment_paragraphs(paragraphs: Iterable[str], mode: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """
+    Group paragraphs into segments with the segmenter for `mode`
+    ("paragraph" or "topic"; default: SEGMENTATION_MODE).
+    """
+    mode = mode or SEGMENTATION_MODE
+    if mode == "topic":
+        from project_agents.topic_segmentation import iter_topic_segments
+        return iter_topic_segments(paragraphs)
+    if mode == "paragraph":
+        return iter_segments(paragraphs)
+    raise ValueError(f"Unknown segmentation mode: {mode}")
+
+
+def segment_builder(state: Optional[Dict[str, Any]] = None):
+    """
+    Resumable segmenter: a new one for SEGMENTATION_MODE, or one restored
+    from a saved state() in the mode it was created with.
+    """
+    if state is None:
+        state = {"mode": SEGMENTATION_MODE}
+    options = dict(state)
+    mode = options.pop("mode", "paragraph")
+    if mode == "topic":
+        from project_agents.topic_segmentation import TopicSegmentBuilder
+        return TopicSegmentBuilder(**options)
+    if mode == "paragraph":
+        return SegmentBuilder(**options)
+    raise ValueError(f"Unknown segmentation mode: {mode}")
@@ -1,16 +1,27 @@
 """Segmentation Agent.
 
-This module segments input text into logical pieces.
+This module wraps the segmenter in project_agents.segmentation as an OpenAI
+Agent with a function tool. The segmentation functions are re-exported here
+for existing imports; code that only segments should import them from
+project_agents.segmentation, which loads without the Agents SDK.
 """
 
-import re
-import uuid
-from typing import List, Dict
-from utils.config import OPENAI_API_KEY
+from typing import Dict, List
 from agents.tool import function_tool
 from agents.agent import Agent
 from agents.model_settings import ModelSettings
 from utils.models import Segment, SegmentationOutput
+from project_agents.segmentation import (  # noqa: F401
+    MIN_SEGMENT_LEN,
+    SegmentBuilder,
+    iter_lines,
+    iter_paragraphs,
+    iter_segments,
+    iter_turn_paragraphs,
+    segment_builder,
+    segment_paragraphs,
+)
+
 
 def segmentation_agent(input_text: str) -> List[Dict[str, str]]:
     """
@@ -22,45 +33,12 @@ def segmentation_agent(input_text: str) -> List[Dict[str, str]]:
     Returns:
         List of segments with 'id' and 'text'.
     """
-    MIN_LEN = 250
-    segments: List[Dict[str, str]] = []
-    # split on empty lines (paragraphs)
-    paras = re.split(r"\r?\n\s*\r?\n", input_text.strip())
-    current: List[str] = []
-    for para in paras:
-        text = para.strip()
-        if not text:
-            continue
-        if not current:
-            # start new segment or emit long paragraph
-            if len(text) >= MIN_LEN:
-                seg_id = f"seg_{uuid.uuid4().hex}"
-                segments.append({"id": seg_id, "text": text})
-                continue
-            current.append(text)
-            continue
-        # accumulate into current segment
-        combined = "\n\n".join(current + [text])
-        if len(combined) >= MIN_LEN:
-            seg_id = f"seg_{uuid.uuid4().hex}"
-            segments.append({"id": seg_id, "text": combined})
-            current = []
-        else:
-            current.append(text)
-    # handle leftover paragraphs
-    if current:
-        leftover = "\n\n".join(current)
-        if len(leftover) >= MIN_LEN or not segments:
-            seg_id = f"seg_{uuid.uuid4().hex}"
-            segments.append({"id": seg_id, "text": leftover})
-        else:
-            segments[-1]["text"] += "\n\n" + leftover
-    return segments
+    return list(segment_paragraphs(iter_paragraphs(iter_lines(input_text))))
 
 @function_tool
 def segmentation_tool(text: str) -> SegmentationOutput:
     """
-    Split the input text into segments of at least 250 characters, using paragraph logic.
+    Split the input text into segments of at least 250 characters, at paragraph boundaries.
 
     Returns a SegmentationOutput model.
     """
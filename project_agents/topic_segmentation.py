@@ -0,0 +1,220 @@
+"""Topic-shift segmentation.
+
+A TextTiling-style alternative to the fixed-length paragraph segmenter: a
+boundary goes where the vocabulary of the paragraphs before a gap differs
+most from the vocabulary after it. Each paragraph becomes a term-count
+vector (words hashed into a fixed number of buckets, stopwords dropped);
+for every gap between paragraphs, the cosine similarity of the summed
+vectors of the `window` paragraphs on either side is computed in one
+vectorized pass over cumulative sums. Gaps whose similarity dips well below
+the surrounding peaks (the depth score) are candidate boundaries, and
+segments are then cut at them subject to minimum and maximum sizes.
+"""
+
+import re
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.config import TOPIC_MIN_SEGMENT_CHARS, TOPIC_MAX_SEGMENT_CHARS, TOPIC_WINDOW
+
+# Number of hash buckets per term vector
+HASH_DIM = 1024
+
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = frozenset("""
+about above after again against all also and any are because been before being below between both but
+can could did does doing down during each few for from further had has have having her here hers herself
+him himself his how into its itself just let like more most much must myself nor not now off once only
+other our ours ourselves out over own same she should some such than that the their theirs them
+themselves then there these they this those through too under until very was were what when where which
+while who whom why will with would you your yours yourself yourselves yes yeah okay thanks please
+""".split())
+
+Span = Tuple[int, int]
+
+
+def term_matrix(paragraphs: Sequence[str]) -> np.ndarray:
+    """Paragraph-by-bucket matrix of hashed content-word counts."""
+    buckets: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, para in enumerate(paragraphs):
+        for word in _WORD_RE.findall(para.lower()):
+            if word in STOPWORDS:
+                continue
+            bucket = buckets.get(word)
+            if bucket is None:
+                # crc32 rather than hash(), so segmentation is the same in every process
+                bucket = buckets[word] = zlib.crc32(word.encode("utf-8")) % HASH_DIM
+            rows.append(i)
+            cols.append(bucket)
+    matrix = np.zeros((len(paragraphs), HASH_DIM), dtype=np.float32)
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    return matrix
+
+
+def gap_similarities(matrix: np.ndarray, window: int) -> np.ndarray:
+    """
+    Cosine similarity across each gap between consecutive paragraphs.
+
+    Element g - 1 compares paragraphs [g - window, g) with [g, g + window),
+    clipped at the ends. A window without any content words counts as
+    similar, so it never forces a boundary on its own.
+    """
+    n = matrix.shape[0]
+    if n < 2:
+        return np.zeros(0, dtype=np.float32)
+    cumulative = np.zeros((n + 1, matrix.shape[1]), dtype=np.float32)
+    np.cumsum(matrix, axis=0, out=cumulative[1:])
+    gaps = np.arange(1, n)
+    left = cumulative[gaps] - cumulative[np.maximum(gaps - window, 0)]
+    right = cumulative[np.minimum(gaps + window, n)] - cumulative[gaps]
+    norms = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+    dots = np.einsum("ij,ij->i", left, right)
+    return np.where(norms > 0, dots / np.where(norms > 0, norms, 1.0), 1.0)
+
+
+def depth_scores(similarities: np.ndarray, window: int) -> np.ndarray:
+    """
+    How far each gap's (smoothed) similarity lies below the highest
+    similarity within `window` gaps on its left plus that on its right.
+    """
+    if similarities.size == 0:
+        return similarities
+    padded = np.pad(similarities, 1, mode="edge")
+    smoothed = (padded[:-2] + padded[1:-1] + padded[2:]) / 3
+    edges = np.pad(smoothed, window, mode="edge")
+    peaks = sliding_window_view(edges, window + 1)
+    left_peak = peaks[: smoothed.size].max(axis=1)
+    right_peak = peaks[window: window + smoothed.size].max(axis=1)
+    return (left_peak - smoothed) + (right_peak - smoothed)
+
+
+def topic_spans(
+    paragraphs: Sequence[str],
+    min_chars: int = TOPIC_MIN_SEGMENT_CHARS,
+    max_chars: int = TOPIC_MAX_SEGMENT_CHARS,
+    window: int = TOPIC_WINDOW,
+) -> List[Span]:
+    """
+    Paragraph index ranges [start, end) of the topic segments.
+
+    A segment ends at a boundary gap once it has at least `min_chars`
+    characters (paragraphs joined with blank lines). When it would grow past
+    `max_chars`, it is cut at its deepest gap that still leaves `min_chars`
+    before it; a paragraph longer than `max_chars` is kept whole, together
+    with any shorter lead-in. A final segment shorter than `min_chars` joins
+    the one before it.
+    """
+    n = len(paragraphs)
+    if n == 0:
+        return []
+    depths = depth_scores(gap_similarities(term_matrix(paragraphs), window), window)
+    # depth[g] and boundary[g] describe the gap before paragraph g
+    depth = np.concatenate(([0.0], depths, [0.0]))
+    boundary = np.zeros(n + 1, dtype=bool)
+    if depths.size:
+        cutoff = depths.mean() - depths.std() / 2
+        local_max = (depth[1:-1] >= depth[:-2]) & (depth[1:-1] >= depth[2:])
+        boundary[1:n] = (depths > cutoff) & local_max & (depths > 0)
+    # ends[k] is the joined length of paragraphs [0, k), plus the separator after them
+    ends = np.concatenate(([0], np.cumsum([len(p) + 2 for p in paragraphs])))
+
+    def size(start: int, end: int) -> int:
+        return int(ends[end] - ends[start]) - 2
+
+    spans: List[Span] = []
+    start = 0
+    while start < n:
+        end = start + 1
+        while end < n:
+            if size(start, end + 1) > max_chars:
+                # Cut at the deepest gap that keeps the segment at least min_chars long
+                first = int(np.searchsorted(ends, ends[start] + min_chars + 2))
+                if first <= end:
+                    end = first + int(np.argmax(depth[first:end + 1]))
+                else:
+                    # The next paragraph is long on its own; keep the short lead-in with it
+                    end += 1
+                break
+            if boundary[end] and size(start, end) >= min_chars:
+                break
+            end += 1
+        spans.append((start, end))
+        start = end
+    if len(spans) > 1 and size(*spans[-1]) < min_chars:
+        spans[-2:] = [(spans[-2][0], n)]
+    return spans
+
+
+def _segment(paragraphs: Sequence[str], span: Span) -> Dict[str, str]:
+    return {"id": f"seg_{uuid.uuid4().hex}", "text": "\n\n".join(paragraphs[span[0]:span[1]])}
+
+
+def iter_topic_segments(
+    paragraphs: Iterable[str],
+    min_chars: int = TOPIC_MIN_SEGMENT_CHARS,
+    max_chars: int = TOPIC_MAX_SEGMENT_CHARS,
+    window: int = TOPIC_WINDOW,
+) -> Iterator[Dict[str, str]]:
+    """
+    Group paragraphs into topic segments. Needs all paragraphs before the
+    first segment can be yielded, unlike iter_segments.
+    """
+    paras = list(paragraphs)
+    for span in topic_spans(paras, min_chars, max_chars, window):
+        yield _segment(paras, span)
+
+
+class TopicSegmentBuilder:
+    """
+    Resumable form of iter_topic_segments, with the interface of SegmentBuilder.
+
+    Paragraphs after the last closed segment are kept as pending and tiled
+    again when more arrive. A segment is closed once it is not the last one
+    and at least `window` paragraphs follow it, so that the similarity
+    windows around its end boundary are complete.
+    """
+    def __init__(
+        self,
+        pending: Optional[List[str]] = None,
+        min_chars: int = TOPIC_MIN_SEGMENT_CHARS,
+        max_chars: int = TOPIC_MAX_SEGMENT_CHARS,
+        window: int = TOPIC_WINDOW,
+    ):
+        self.pending: List[str] = list(pending or [])
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.window = window
+
+    def _spans(self) -> List[Span]:
+        return topic_spans(self.pending, self.min_chars, self.max_chars, self.window)
+
+    def feed(self, paragraphs: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """Consume paragraphs, then yield the segments that can no longer change."""
+        self.pending.extend(paragraphs)
+        spans = self._spans()
+        closed = [span for span in spans[:-1] if span[1] <= len(self.pending) - self.window]
+        if not closed:
+            return
+        segments = [_segment(self.pending, span) for span in closed]
+        self.pending = self.pending[closed[-1][1]:]
+        yield from segments
+
+    def tail(self) -> List[Dict[str, str]]:
+        """The open segments if the input ended now, without consuming them."""
+        return [_segment(self.pending, span) for span in self._spans()]
+
+    def finish(self) -> Iterator[Dict[str, str]]:
+        """Yield the remaining segments at the end of the input."""
+        segments = self.tail()
+        self.pending = []
+        yield from segments
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable open state."""
+        return {"mode": "topic", "pending": list(self.pending)}
@@ -4,29 +4,53 @@ Utility script to submit artifact JSON files into the artifact-db Postgres insta
 
 Usage:
   submit_to_db.py <file_or_dir> [<file_or_dir> ...]
+  submit_to_db.py --migrate
 
-Each argument may be a path to a JSON file or a directory containing JSON files.
+Each argument may be a path to a JSON file, a JSONL file with one artifact per line
+(e.g. an artifact store export), or a directory containing such files. Artifact
+store directories found among them are read through their index, so artifacts
+deleted from a store are not loaded; their shard files are never read as plain
+JSONL.
 The script will load and validate each artifact JSON for required fields:
   - id
   - created_at
   - content
   - epistemic_trace { justification, diagnostic_flags, detected_by }
 
-Valid artifacts are inserted into the 'artifacts' table using DB credentials from .env.
+Valid artifacts are inserted into the 'artifacts' table using DB credentials from .env,
+with the user_id and thread_id they were ingested for, if any (see --migrate).
 At the end, a summary report is printed.
+
+With --bulk, files are parsed and validated in a pool of worker processes and
+loaded in large multi-row INSERT batches; workers run at most two chunks
+ahead of the inserts each, so memory stays bounded. Rows whose knowledge_id
+already exists are skipped (ON CONFLICT DO NOTHING), and every committed file
+is appended to a checkpoint file, so an interrupted run can simply be
+restarted.
+
+With --migrate, the artifacts table is first brought up to date with the
+columns and indexes the API needs (utils.db_client.ensure_schema); run it
+once after upgrading, before starting the API or the first --bulk load:
+both insert with ON CONFLICT (knowledge_id), which needs its unique index.
+Without input paths, the script only migrates.
+
+psycopg2 is imported when the first connection is opened, so parse workers
+and --help start without it.
 """
 import os
 import sys
 import json
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import psycopg2
-from psycopg2.extras import Json
 from dotenv import load_dotenv
 
 REQUIRED_FIELDS = {'id', 'created_at', 'content', 'epistemic_trace'}
 TRACE_FIELDS = {'justification', 'diagnostic_flags', 'detected_by'}
+# Input bytes parsed per worker task in bulk mode; at most workers * 2 tasks are in flight
+PARSE_CHUNK_BYTES = 8 * 1024 * 1024
 
 def validate_artifact(data):
     missing = REQUIRED_FIELDS - data.keys()
@@ -42,18 +66,130 @@ def validate_artifact(data):
 
 
 def gather_files(paths):
+    """
+    Return the (path, ranges) inputs for `paths`; ranges is None for a JSON
+    or JSONL file. An artifact store directory (one with an index) gives
+    one input per shard, with the byte ranges of the artifacts its index
+    still lists: shard files also hold deleted artifacts, so they are never
+    loaded as plain JSONL.
+    """
+    from utils.artifact_store import INDEX_NAME, SHARD_GLOB
     files = []
     for p in paths:
         p = Path(p)
         if p.is_dir():
-            files.extend([f for f in p.rglob('*.json') if f.is_file()])
-        elif p.is_file() and p.suffix.lower() == '.json':
-            files.append(p)
+            for index in p.rglob(INDEX_NAME):
+                files.extend(store_inputs(index.parent))
+            files.extend([(f, None) for f in p.rglob('*.json') if f.is_file()])
+            files.extend([(f, None) for f in p.rglob('*.jsonl') if f.is_file() and not f.match(SHARD_GLOB)])
+        elif p.is_file() and p.match(SHARD_GLOB):
+            print(f"Warning: skipping artifact store shard {p}; pass its store directory instead")
+        elif p.is_file() and p.suffix.lower() in ('.json', '.jsonl'):
+            files.append((p, None))
         else:
             print(f"Warning: skipping non-JSON path {p}")
     return files
 
 
+def store_inputs(root):
+    """(shard, ranges) inputs for the artifacts an artifact store's index lists, one per shard."""
+    from utils.artifact_store import ArtifactStore
+    store = ArtifactStore(root)
+    try:
+        ranges = {}
+        for shard, start, end in store.live_ranges():
+            ranges.setdefault(shard, []).append((start, end))
+    finally:
+        store.close()
+    return [(root / shard, tuple(shard_ranges)) for shard, shard_ranges in ranges.items()]
+
+
+def iter_artifacts(path, raw):
+    """
+    Yield (source, data, error) for each artifact in a file's contents.
+
+    A .json file holds one artifact; a .jsonl file (e.g. an artifact store
+    export) holds one artifact per line.
+    """
+    if Path(path).suffix.lower() != '.jsonl':
+        try:
+            yield str(path), json.loads(raw), None
+        except Exception as e:
+            yield str(path), None, f"JSON parse error: {e}"
+        return
+    for lineno, line in enumerate(raw.splitlines(), 1):
+        if not line.strip():
+            continue
+        source = f"{path}:{lineno}"
+        try:
+            yield source, json.loads(line), None
+        except Exception as e:
+            yield source, None, f"JSON parse error: {e}"
+
+
+def read_ranges(path, ranges):
+    """The (start, bytes) chunks of a store shard in the given (start, end) byte ranges."""
+    chunks = []
+    with Path(path).open('rb') as fh:
+        for start, end in ranges:
+            fh.seek(start)
+            chunks.append((start, fh.read(end - start)))
+    return chunks
+
+
+def iter_shard(path, chunks):
+    """
+    Yield (source, data, error) for each artifact in chunks returned by
+    read_ranges(); sources give the byte offset of the artifact's record.
+    """
+    for start, chunk in chunks:
+        offset = start
+        for line in chunk.splitlines(keepends=True):
+            source = f"{path}@{offset}"
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield source, json.loads(line), None
+            except Exception as e:
+                yield source, None, f"JSON parse error: {e}"
+
+
+def read_input(path, ranges):
+    """
+    Read an input returned by gather_files(): a whole file's bytes, or the
+    chunks of a store shard. Returns (raw, size), size being the number of
+    bytes read.
+    """
+    if ranges is None:
+        raw = Path(path).read_bytes()
+        return raw, len(raw)
+    chunks = read_ranges(path, ranges)
+    return chunks, sum(len(chunk) for _, chunk in chunks)
+
+
+def iter_input(path, ranges, raw):
+    """Yield (source, data, error) for each artifact in an input read by read_input()."""
+    if ranges is None:
+        return iter_artifacts(path, raw)
+    return iter_shard(path, raw)
+
+
+def read_artifacts(files):
+    """
+    Yield (source, data, error) for every artifact in the `files` inputs
+    returned by gather_files(), one input in memory at a time. An input that
+    cannot be read yields a single error.
+    """
+    for f, ranges in files:
+        try:
+            raw, _ = read_input(f, ranges)
+        except Exception as e:
+            yield str(f), None, f"Read error: {e}"
+            continue
+        yield from iter_input(f, ranges, raw)
+
+
 def load_db_config():
     load_dotenv()
     cfg = {
@@ -70,10 +206,244 @@ def load_db_config():
     return cfg
 
 
+BULK_INSERT_SQL = """
+    INSERT INTO artifacts (knowledge_id, created_at, content, epistemic_trace, user_id, thread_id)
+    VALUES %s
+    ON CONFLICT (knowledge_id) DO NOTHING
+    RETURNING knowledge_id
+"""
+
+
+def artifact_row(data):
+    """
+    Column values of an artifact, in INSERT order; user_id and thread_id are
+    None for artifacts that were not ingested through the API.
+    """
+    return (
+        data['id'], data['created_at'], data['content'], data['epistemic_trace'],
+        data.get('user_id'), data.get('thread_id'),
+    )
+
+
+def parse_artifact_file(path, ranges=None):
+    """
+    Load and validate one input (see gather_files()); runs in a worker process in bulk mode.
+
+    Returns (path, checkpoint_key, rows, errors): the rows to insert and the
+    (source, reason) pairs for invalid artifacts. The key is None if any
+    artifact in the input was invalid, so it is retried on the next run.
+    """
+    try:
+        raw, size = read_input(path, ranges)
+    except Exception as e:
+        return path, None, [], [(path, f"Read error: {e}")]
+    rows = []
+    errors = []
+    for source, data, err in iter_input(path, ranges, raw):
+        if err is None:
+            valid, err = validate_artifact(data) if isinstance(data, dict) else (False, "Artifact must be an object")
+        if err is not None:
+            errors.append((source, err))
+            continue
+        rows.append(artifact_row(data))
+    key = checkpoint_key(path, size, ranges) if not errors else None
+    return path, key, rows, errors
+
+
+def checkpoint_key(path, size, ranges=None):
+    """
+    Checkpoint entry for a file of a given size; an append-only file that
+    has grown since it was loaded gets a new key and is loaded again. A
+    store shard's entry lists the byte ranges loaded instead, which change
+    when one of its artifacts is appended or deleted.
+    """
+    if ranges is not None:
+        return f"{path}\t" + ",".join(f"{start}-{end}" for start, end in ranges)
+    return f"{path}\t{size}"
+
+
+def load_checkpoint(path):
+    """Return the set of file entries already loaded by a previous bulk run."""
+    if not path.exists():
+        return set()
+    with path.open(encoding='utf-8') as fh:
+        return {line.rstrip('\n') for line in fh if line.strip()}
+
+
+def flush_batch(conn, batch, checkpoint_fh):
+    """
+    Insert one batch of (path, checkpoint_key, rows) entries in a single transaction.
+
+    If the batch fails as a whole, its rows are retried one at a time so a
+    single bad row does not sink the rest. Files whose rows all committed are
+    appended to the checkpoint. Returns (inserted, skipped, failures).
+    """
+    inserted = 0
+    attempted = 0
+    failures = []
+    done = []
+    from psycopg2.extras import Json, execute_values
+    cur = conn.cursor()
+    try:
+        rows = [(*r[:3], Json(r[3]), *r[4:]) for _, _, file_rows in batch for r in file_rows]
+        returned = execute_values(cur, BULK_INSERT_SQL, rows, page_size=1000, fetch=True)
+        conn.commit()
+        inserted = len(returned)
+        attempted = len(rows)
+        done = [key for _, key, _ in batch if key is not None]
+    except Exception:
+        conn.rollback()
+        for path, key, file_rows in batch:
+            ok = True
+            for r in file_rows:
+                try:
+                    returned = execute_values(cur, BULK_INSERT_SQL, [(*r[:3], Json(r[3]), *r[4:])], fetch=True)
+                    conn.commit()
+                    inserted += len(returned)
+                    attempted += 1
+                except Exception as e:
+                    conn.rollback()
+                    failures.append((f"{path} ({r[0]})", str(e)))
+                    ok = False
+            if ok and key is not None:
+                done.append(key)
+    finally:
+        cur.close()
+    if done:
+        checkpoint_fh.write(''.join(f"{key}\n" for key in done))
+        checkpoint_fh.flush()
+        os.fsync(checkpoint_fh.fileno())
+    return inserted, attempted - inserted, failures
+
+
+def parse_chunk(chunk):
+    """parse_artifact_file() for each (path, ranges) input of a chunk; one worker task in bulk mode."""
+    return [parse_artifact_file(path, ranges) for path, ranges in chunk]
+
+
+def chunk_inputs(todo, max_bytes=PARSE_CHUNK_BYTES):
+    """
+    Group (path, ranges, size) inputs into chunks of (path, ranges) pairs
+    holding at most `max_bytes` of input each; a larger input gets a chunk
+    of its own.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for path, ranges, size in todo:
+        if chunk and chunk_bytes + size > max_bytes:
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append((path, ranges))
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def parse_results(todo, workers):
+    """
+    Yield parse_artifact_file() results for the `todo` inputs, in order.
+
+    With several workers, chunks are parsed in a process pool, at most
+    `workers * 2` at a time. The next chunk is only submitted once the
+    oldest one's results have been taken, so parsed rows never pile up
+    ahead of the inserts.
+    """
+    if workers <= 1:
+        for chunk in chunk_inputs(todo):
+            yield from parse_chunk(chunk)
+        return
+    executor = ProcessPoolExecutor(max_workers=workers)
+    in_flight = deque()
+    try:
+        for chunk in chunk_inputs(todo):
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+            in_flight.append(executor.submit(parse_chunk, chunk))
+        while in_flight:
+            yield from in_flight.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def bulk_load(files, db_cfg, workers, batch_size, checkpoint_path):
+    """
+    Parse files in parallel and load them in batches, resuming from the checkpoint.
+
+    Returns (inserted, skipped, failures).
+    """
+    completed = load_checkpoint(checkpoint_path)
+    todo = []
+    for f, ranges in files:
+        size = f.stat().st_size if ranges is None else sum(end - start for start, end in ranges)
+        if checkpoint_key(f, size, ranges) not in completed:
+            todo.append((str(f), ranges, size))
+    todo.sort(key=lambda item: item[0])
+    if completed:
+        print(f"Resuming: {len(files) - len(todo)} files already loaded, {len(todo)} remaining.")
+
+    inserted = 0
+    skipped = 0
+    failures = []
+    batch = []
+    batch_rows = 0
+    import psycopg2
+    conn = psycopg2.connect(**db_cfg)
+    results = parse_results(todo, workers)
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    with checkpoint_path.open('a', encoding='utf-8') as checkpoint_fh:
+        try:
+            for path, key, rows, errors in results:
+                failures.extend(errors)
+                batch.append((path, key, rows))
+                batch_rows += len(rows)
+                if batch_rows >= batch_size:
+                    n_ins, n_skip, fails = flush_batch(conn, batch, checkpoint_fh)
+                    inserted += n_ins
+                    skipped += n_skip
+                    failures.extend(fails)
+                    batch = []
+                    batch_rows = 0
+                    print(f"  ... {inserted} inserted, {skipped} already present")
+            if batch:
+                n_ins, n_skip, fails = flush_batch(conn, batch, checkpoint_fh)
+                inserted += n_ins
+                skipped += n_skip
+                failures.extend(fails)
+        finally:
+            results.close()
+            conn.close()
+    return inserted, skipped, failures
+
+
 def main():
     parser = argparse.ArgumentParser(description="Submit artifact JSON files to Postgres DB.")
-    parser.add_argument('inputs', nargs='+', help='Paths to JSON files or directories')
+    parser.add_argument('inputs', nargs='*', help='Paths to JSON files or directories')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Parse in parallel and load in large, idempotent, resumable batches')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for parsing in bulk mode')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Rows per INSERT transaction in bulk mode')
+    parser.add_argument('--checkpoint', default='data/submit_to_db.checkpoint',
+                        help='File recording which inputs a bulk run has already loaded')
+    parser.add_argument('--migrate', action='store_true',
+                        help='Add the columns and indexes the API needs to the artifacts table first')
     args = parser.parse_args()
+    if not args.inputs and not args.migrate:
+        parser.error('at least one input path (or --migrate) is required')
+
+    if args.migrate:
+        import psycopg2
+        from utils.db_client import ensure_schema
+        conn = psycopg2.connect(**load_db_config())
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        print("Artifacts table is up to date.")
+        if not args.inputs:
+            return
 
     files = gather_files(args.inputs)
     if not files:
@@ -81,41 +451,46 @@ def main():
         sys.exit(0)
 
     db_cfg = load_db_config()
+    if args.bulk:
+        inserted, skipped, failures = bulk_load(
+            files, db_cfg, args.workers, args.batch_size, Path(args.checkpoint)
+        )
+        print(f"\nSummary: {inserted} inserted, {skipped} already present, {len(failures)} failures.")
+        for fpath, reason in failures:
+            print(f" - {fpath}: {reason}")
+        return
+
+    import psycopg2
+    from psycopg2.extras import Json
     conn = psycopg2.connect(**db_cfg)
     cur = conn.cursor()
 
     success = 0
     failures = []
-    for f in files:
-        try:
-            data = json.loads(f.read_text(encoding='utf-8'))
-        except Exception as e:
-            failures.append((str(f), f"JSON parse error: {e}"))
+    for source, data, err in read_artifacts(files):
+        if err is not None:
+            failures.append((source, err))
             continue
 
-        valid, err = validate_artifact(data)
+        valid, err = validate_artifact(data) if isinstance(data, dict) else (False, "Artifact must be an object")
         if not valid:
-            failures.append((str(f), err))
+            failures.append((source, err))
             continue
 
         try:
+            row = artifact_row(data)
             cur.execute(
                 """
-                INSERT INTO artifacts (knowledge_id, created_at, content, epistemic_trace)
-                VALUES (%s, %s, %s, %s)
+                INSERT INTO artifacts (knowledge_id, created_at, content, epistemic_trace, user_id, thread_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
                 """,
-                (
-                    data['id'],
-                    data['created_at'],
-                    data['content'],
-                    Json(data['epistemic_trace']),
-                )
+                (*row[:3], Json(row[3]), *row[4:]),
             )
             conn.commit()
             success += 1
         except Exception as e:
             conn.rollback()
-            failures.append((str(f), str(e)))
+            failures.append((source, str(e)))
 
     cur.close()
     conn.close()
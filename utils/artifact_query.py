@@ -0,0 +1,141 @@
+"""Read access to stored artifacts, for GET /artifacts.
+
+Two backends offer the same get / list_artifacts / search methods: the
+local artifact store (its SQLite index, with FTS5 search; see
+utils.artifact_store) and PostgresArtifactQuery below (tsvector search over
+a GIN expression index; see utils.db_client.ensure_schema). Results are
+paginated by key rather than offset: every result comes with its sort key,
+and the key of a page's last result, encoded as an opaque cursor, selects
+the page after it. Results are produced lazily, so a page can be streamed
+to the client as it is read.
+"""
+import base64
+import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from utils.db_client import SEARCH_DOCUMENT, pooled_connection
+
+# Rows fetched per round trip from a Postgres server-side cursor
+FETCH_SIZE = 200
+
+_COLUMNS = "knowledge_id, created_at, content, epistemic_trace, user_id, thread_id"
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Opaque page cursor for a result's sort key."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """The sort key in a cursor from encode_cursor(). Raises ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _timestamp(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _artifact(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    knowledge_id, created_at, content, trace, user_id, thread_id = row[:6]
+    return {
+        "id": knowledge_id,
+        "created_at": _timestamp(created_at),
+        "content": content,
+        "epistemic_trace": json.loads(trace) if isinstance(trace, str) else trace,
+        "user_id": user_id,
+        "thread_id": thread_id,
+    }
+
+
+class PostgresArtifactQuery:
+    """
+    Queries over the Postgres artifacts table. Pages are read through a
+    server-side cursor, FETCH_SIZE rows at a time. The table must have been
+    migrated with ensure_schema().
+    """
+
+    def get(self, knowledge_id: str) -> Optional[Dict[str, Any]]:
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(f"SELECT {_COLUMNS} FROM artifacts WHERE knowledge_id = %s", (knowledge_id,))
+                row = cur.fetchone()
+            finally:
+                cur.close()
+                conn.rollback()
+        return _artifact(row) if row else None
+
+    def _stream(self, sql: str, params: Sequence[Any]) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        with pooled_connection() as conn:
+            cur = conn.cursor(name=f"artifact_query_{uuid4().hex}")
+            cur.itersize = FETCH_SIZE
+            try:
+                cur.execute(sql, params)
+                for row in cur:
+                    art = _artifact(row)
+                    # The sort key follows the artifact columns
+                    yield [_timestamp(row[6]), art["id"]], art
+            finally:
+                cur.close()
+                conn.rollback()
+
+    def list_artifacts(
+        self,
+        user_id: str,
+        thread_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        """Same as ArtifactStore.list_artifacts."""
+        where = ["user_id = %s"]
+        params: List[Any] = [user_id]
+        if thread_id is not None:
+            where.append("thread_id = %s")
+            params.append(thread_id)
+        if after is not None:
+            where.append("(created_at, knowledge_id) > (%s, %s)")
+            params.extend(after)
+        sql = f"""
+            SELECT {_COLUMNS}, created_at FROM artifacts
+            WHERE {" AND ".join(where)} ORDER BY created_at, knowledge_id LIMIT %s
+        """
+        return self._stream(sql, (*params, limit))
+
+    def search(
+        self,
+        query: str,
+        user_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        """
+        Same as ArtifactStore.search, ranked by ts_rank (highest first).
+        Keys hold the rank as a real, so cursors compare it exactly.
+        """
+        where = [f"{SEARCH_DOCUMENT} @@ query"]
+        params: List[Any] = [query]
+        for column, value in (("user_id", user_id), ("thread_id", thread_id)):
+            if value is not None:
+                where.append(f"{column} = %s")
+                params.append(value)
+        page = ""
+        if after is not None:
+            page = "WHERE rank < %s::real OR (rank = %s::real AND knowledge_id > %s)"
+            params.extend((after[0], after[0], after[1]))
+        sql = f"""
+            SELECT {_COLUMNS}, rank FROM (
+                SELECT {_COLUMNS}, ts_rank({SEARCH_DOCUMENT}, query) AS rank
+                FROM artifacts, plainto_tsquery('english', %s) query
+                WHERE {" AND ".join(where)}
+            ) hits {page}
+            ORDER BY rank DESC, knowledge_id LIMIT %s
+        """
+        return self._stream(sql, (*params, limit))
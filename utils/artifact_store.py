@@ -0,0 +1,388 @@
+"""Append-only local artifact store.
+
+Artifacts are appended as JSON lines to rotating shard files, and an SQLite
+index maps each artifact id to its (shard, offset, length). Looking up one
+artifact is a single seek and read; iterating streams the shards line by
+line. Each process appends to its own shard, so several workers can share
+a store directory without locking the shard files.
+
+The index also records each artifact's user_id, thread_id and created_at,
+for listing a thread's artifacts page by page, and keeps a contentless
+FTS5 table over the content and justification for full-text search; the
+text itself is only stored in the shards. Deleting an artifact drops it
+from the index; its record stays in the shard but is no longer read,
+iterated or exported.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+
+SHARD_GLOB = "shard-*.jsonl"
+INDEX_NAME = "index.sqlite3"
+# Index columns added after the first release, created on open if missing
+_OWNER_COLUMNS = ("user_id", "thread_id", "created_at")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _to_dict(artifact: Union[BaseModel, Dict[str, Any]]) -> Dict[str, Any]:
+    return artifact.model_dump() if isinstance(artifact, BaseModel) else artifact
+
+
+def _justification(art: Dict[str, Any]) -> str:
+    trace = art.get("epistemic_trace")
+    if not isinstance(trace, dict):
+        return ""
+    return trace.get("justification") or ""
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 query matching all words of `query`, each quoted so that
+    punctuation in user input is never parsed as query syntax. None if
+    the query has no words.
+    """
+    words = _WORD_RE.findall(query)
+    return " ".join(f'"{w}"' for w in words) if words else None
+
+
+class ArtifactStore:
+    """
+    Rotating JSONL shards plus an id -> (shard, offset, length) index.
+    """
+    def __init__(self, root: Union[str, Path] = "data/artifacts", max_shard_bytes: int = 64 * 1024 * 1024):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_shard_bytes = max_shard_bytes
+        self._lock = threading.Lock()
+        self._shard: Optional[Path] = None
+        self._shard_fh = None
+        self._shard_pid: Optional[int] = None
+        self._shard_seq = 0
+        self._index = sqlite3.connect(str(self.root / INDEX_NAME), check_same_thread=False)
+        self._index.execute("PRAGMA journal_mode=WAL")
+        # Processes opening the store together (API workers) take turns checking and migrating the schema
+        self._index.execute("BEGIN IMMEDIATE")
+        self._index.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self._index.execute("PRAGMA table_info(artifacts)")}
+        for column in _OWNER_COLUMNS:
+            if column not in columns:
+                self._index.execute(f"ALTER TABLE artifacts ADD COLUMN {column} TEXT")
+        self._index.execute(
+            "CREATE INDEX IF NOT EXISTS artifacts_thread ON artifacts (user_id, thread_id, created_at, id)"
+        )
+        has_search = self._index.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'artifacts_fts'"
+        ).fetchone() is not None
+        # Contentless: the index keeps only the terms, keyed by the artifacts table's rowid
+        self._index.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS artifacts_fts USING fts5(content, justification, content='')"
+        )
+        self._index.commit()
+        if not has_search:
+            self._backfill()
+
+    def _open_shard(self):
+        """Start a new shard owned by this process."""
+        if self._shard_fh is not None:
+            self._shard_fh.close()
+        pid = os.getpid()
+        if pid != self._shard_pid:
+            self._shard_pid = pid
+            self._shard_seq = 0
+        self._shard_seq += 1
+        # Timestamp first so that sorting shard names gives write order
+        name = f"shard-{time.time_ns():020d}-{pid}-{self._shard_seq:04d}.jsonl"
+        self._shard = self.root / name
+        self._shard_fh = self._shard.open("ab")
+
+    def put_many(self, artifacts: Iterable[Union[BaseModel, Dict[str, Any]]]):
+        """
+        Append artifacts to the current shard and index them, in one write and one commit.
+        """
+        arts = [_to_dict(art) for art in artifacts]
+        lines = [(art["id"], (json.dumps(art, ensure_ascii=False) + "\n").encode("utf-8")) for art in arts]
+        if not lines:
+            return
+        with self._lock:
+            # Rotate when the shard is full, or after a fork so processes never share a shard
+            if (
+                self._shard_fh is None
+                or self._shard_pid != os.getpid()
+                or self._shard_fh.tell() >= self.max_shard_bytes
+            ):
+                self._open_shard()
+            offset = self._shard_fh.tell()
+            locations: List[Tuple[str, int, int]] = []
+            for _, data in lines:
+                locations.append((self._shard.name, offset, len(data)))
+                offset += len(data)
+            self._shard_fh.write(b"".join(data for _, data in lines))
+            self._shard_fh.flush()
+            self._index_many(zip(arts, locations))
+            self._index.commit()
+
+    def _index_many(self, entries: Iterable[Tuple[Dict[str, Any], Tuple[str, int, int]]]):
+        """
+        Point the index at each artifact's record. Artifacts seen for the
+        first time are added to the search index; re-written ones keep their
+        rowid, and with it their search entry.
+        """
+        for art, (shard, offset, length) in entries:
+            known = self._index.execute("SELECT 1 FROM artifacts WHERE id = ?", (art["id"],)).fetchone()
+            cur = self._index.execute(
+                """
+                INSERT INTO artifacts (id, shard, offset, length, user_id, thread_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET shard = excluded.shard, offset = excluded.offset,
+                    length = excluded.length
+                """,
+                (art["id"], shard, offset, length, art.get("user_id"), art.get("thread_id"), art.get("created_at")),
+            )
+            if known is None:
+                self._index.execute(
+                    "INSERT INTO artifacts_fts (rowid, content, justification) VALUES (?, ?, ?)",
+                    (cur.lastrowid, art.get("content") or "", _justification(art)),
+                )
+
+    def _backfill(self):
+        """Fill in owner columns and search entries for an index created before they existed."""
+        rows = self._index.execute("SELECT rowid, shard, offset, length FROM artifacts").fetchall()
+        for rowid, shard, offset, length in rows:
+            art = self._read(shard, offset, length)
+            self._index.execute(
+                "UPDATE artifacts SET user_id = ?, thread_id = ?, created_at = ? WHERE rowid = ?",
+                (art.get("user_id"), art.get("thread_id"), art.get("created_at"), rowid),
+            )
+            self._index.execute(
+                "INSERT INTO artifacts_fts (rowid, content, justification) VALUES (?, ?, ?)",
+                (rowid, art.get("content") or "", _justification(art)),
+            )
+        self._index.commit()
+
+    def delete_many(self, artifact_ids: Iterable[str]) -> int:
+        """
+        Remove artifacts from the index and the search index, in one commit.
+        Returns how many were stored.
+        """
+        deleted = 0
+        with self._lock:
+            for artifact_id in artifact_ids:
+                row = self._index.execute(
+                    "SELECT rowid, shard, offset, length FROM artifacts WHERE id = ?", (artifact_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                rowid, shard, offset, length = row
+                art = self._read(shard, offset, length)
+                # A contentless FTS5 entry is deleted by passing the values it was indexed with
+                self._index.execute(
+                    "INSERT INTO artifacts_fts (artifacts_fts, rowid, content, justification) VALUES ('delete', ?, ?, ?)",
+                    (rowid, art.get("content") or "", _justification(art)),
+                )
+                self._index.execute("DELETE FROM artifacts WHERE rowid = ?", (rowid,))
+                deleted += 1
+            self._index.commit()
+        return deleted
+
+    def _read(self, shard: str, offset: int, length: int) -> Dict[str, Any]:
+        with (self.root / shard).open("rb") as fh:
+            fh.seek(offset)
+            return json.loads(fh.read(length))
+
+    def put(self, artifact: Union[BaseModel, Dict[str, Any]]):
+        """Append a single artifact."""
+        self.put_many([artifact])
+
+    def get(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the artifact with the given id, reading only its own record.
+        """
+        row = self._index.execute(
+            "SELECT shard, offset, length FROM artifacts WHERE id = ?", (artifact_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._read(*row)
+
+    def _reader(self) -> sqlite3.Connection:
+        # Queries get their own connection: a consistent snapshot that writers do not block
+        return sqlite3.connect(f"file:{self.root / INDEX_NAME}?mode=ro", uri=True)
+
+    def _stream(self, rows: Sequence[Tuple[Any, ...]]) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        """Read the artifacts for (shard, offset, length, *key) rows, keeping each shard open once."""
+        handles: Dict[str, Any] = {}
+        try:
+            for shard, offset, length, *key in rows:
+                fh = handles.get(shard)
+                if fh is None:
+                    fh = handles[shard] = (self.root / shard).open("rb")
+                fh.seek(offset)
+                yield key, json.loads(fh.read(length))
+        finally:
+            for fh in handles.values():
+                fh.close()
+
+    def list_artifacts(
+        self,
+        user_id: str,
+        thread_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        """
+        Up to `limit` of a user's artifacts (optionally one thread's), oldest
+        first, as (key, artifact) pairs. Pass the key of the last artifact
+        as `after` to continue with the next page.
+        """
+        where = ["user_id = ?"]
+        params: List[Any] = [user_id]
+        if thread_id is not None:
+            where.append("thread_id = ?")
+            params.append(thread_id)
+        if after is not None:
+            where.append("(created_at, id) > (?, ?)")
+            params.extend(after)
+        conn = self._reader()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT shard, offset, length, created_at, id FROM artifacts
+                WHERE {" AND ".join(where)} ORDER BY created_at, id LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return self._stream(rows)
+
+    def search(
+        self,
+        query: str,
+        user_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[Tuple[List[Any], Dict[str, Any]]]:
+        """
+        Artifacts whose content or justification contains every word of
+        `query`, best match (BM25) first, as (key, artifact) pairs; paged
+        like list_artifacts.
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return iter(())
+        where = ["artifacts_fts MATCH ?"]
+        params: List[Any] = [expression]
+        for column, value in (("user_id", user_id), ("thread_id", thread_id)):
+            if value is not None:
+                where.append(f"a.{column} = ?")
+                params.append(value)
+        page = ""
+        if after is not None:
+            page = "WHERE score > ? OR (score = ? AND id > ?)"
+            params.extend((after[0], after[0], after[1]))
+        conn = self._reader()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT shard, offset, length, score, id FROM (
+                    SELECT a.shard, a.offset, a.length, a.id, bm25(artifacts_fts) AS score
+                    FROM artifacts_fts JOIN artifacts a ON a.rowid = artifacts_fts.rowid
+                    WHERE {" AND ".join(where)}
+                ) {page}
+                ORDER BY score, id LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return self._stream(rows)
+
+    def __contains__(self, artifact_id: str) -> bool:
+        return self._index.execute(
+            "SELECT 1 FROM artifacts WHERE id = ?", (artifact_id,)
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._index.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+
+    def shard_paths(self) -> List[Path]:
+        """Shard files in write order."""
+        return sorted(self.root.glob(SHARD_GLOB))
+
+    def live_ranges(self) -> Iterator[Tuple[str, int, int]]:
+        """(shard, start, end) byte ranges holding the stored artifacts, adjacent records merged."""
+        conn = self._reader()
+        try:
+            rows = conn.execute("SELECT shard, offset, length FROM artifacts ORDER BY shard, offset").fetchall()
+        finally:
+            conn.close()
+        current: Optional[List[Any]] = None
+        for shard, offset, length in rows:
+            if current is not None and current[0] == shard and current[2] == offset:
+                current[2] = offset + length
+                continue
+            if current is not None:
+                yield tuple(current)
+            current = [shard, offset, offset + length]
+        if current is not None:
+            yield tuple(current)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream every stored artifact, in write order."""
+        for shard, start, end in self.live_ranges():
+            with (self.root / shard).open("rb") as fh:
+                fh.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    line = fh.readline(remaining)
+                    remaining -= len(line)
+                    if line.strip():
+                        yield json.loads(line)
+
+    def export(self, dest: Union[str, Path]) -> int:
+        """
+        Write every stored artifact to a single JSONL file (one artifact per line),
+        which submit_to_db.py can load directly. Runs of records are copied
+        from the shards in bulk. Returns the number of bytes written.
+        """
+        written = 0
+        with Path(dest).open("wb") as out:
+            for shard, start, end in self.live_ranges():
+                with (self.root / shard).open("rb") as fh:
+                    fh.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = fh.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        written += len(chunk)
+                        remaining -= len(chunk)
+        return written
+
+    def close(self):
+        """
+        Close the current shard and the index.
+        """
+        with self._lock:
+            if self._shard_fh is not None:
+                self._shard_fh.close()
+                self._shard_fh = None
+            self._index.close()
@@ -0,0 +1,47 @@
+"""Routing rules of the contour model cascade.
+
+With a cascade, a fast model judges every segment first and reports its
+confidence. Its verdict stands unless the rules below escalate the segment
+to the main model, whose verdict then replaces it:
+
+- "uncertain": confidence below `min_confidence`;
+- "flagged": the fast model raised diagnostic_flags (if `escalate_on_flags`);
+- "audit": a confident verdict sampled at `audit_rate` (chosen by a hash of
+  the text, so reruns pick the same segments). Comparing both verdicts
+  measures how often the fast model would have been wrong.
+
+Segments the fast model failed on are escalated as "error".
+"""
+from utils.models import EpistemicContourTriage
+from utils.sampling import hash_sampled
+
+# Route names; "accepted" keeps the fast model's verdict
+ROUTES = ("accepted", "uncertain", "flagged", "audit", "error")
+
+
+class CascadePolicy:
+    """
+    Decides which of the fast model's verdicts are judged again by the main model.
+    """
+    def __init__(self, min_confidence: float = 0.8, escalate_on_flags: bool = True, audit_rate: float = 0.05):
+        self.min_confidence = min_confidence
+        self.escalate_on_flags = escalate_on_flags
+        self.audit_rate = audit_rate
+
+    def sampled(self, text: str) -> bool:
+        """Whether a confident verdict is audited by the main model."""
+        return hash_sampled(text, self.audit_rate)
+
+    def route(self, text: str, verdict: EpistemicContourTriage) -> str:
+        """The route of one segment: "accepted", or the reason to escalate it."""
+        if verdict.confidence < self.min_confidence:
+            return "uncertain"
+        if self.escalate_on_flags and verdict.diagnostic_flags:
+            return "flagged"
+        if self.sampled(text):
+            return "audit"
+        return "accepted"
+
+    def describe(self) -> str:
+        """The rules as a string, for cache keys."""
+        return f"min_confidence={self.min_confidence},flags={self.escalate_on_flags},audit={self.audit_rate}"
@@ -5,5 +5,91 @@ import os
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise EnvironmentError("Please set the OPENAI_API_KEY in your .env file")
\ No newline at end of file
+
+
+def require_openai_api_key() -> str:
+    """
+    The OpenAI API key. Raises EnvironmentError if it is not set; checked
+    when agents are built rather than on import, so tools that never call
+    the model (segmentation, submit_to_db.py) run without one.
+    """
+    if not OPENAI_API_KEY:
+        raise EnvironmentError("Please set the OPENAI_API_KEY in your .env file")
+    return OPENAI_API_KEY
+
+# Maximum number of segments processed concurrently by the pipeline
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "8"))
+
+# Character budget for packing several segments into one contour call (0 = one segment per call)
+CONTOUR_BATCH_CHARS = int(os.getenv("CONTOUR_BATCH_CHARS", "0"))
+
+# How approved segments become artifacts: "local" (no model call) or "agent" (ArtifactAssemblerAgent)
+ASSEMBLY_MODE = os.getenv("ASSEMBLY_MODE", "local")
+
+# Persistent contour verdict cache (empty path disables it)
+VERDICT_CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "data/cache/verdicts.sqlite3")
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "100000"))
+VERDICT_CACHE_MAX_AGE_DAYS = float(os.getenv("VERDICT_CACHE_MAX_AGE_DAYS", "30"))
+
+# Background ingest jobs (POST /ingest?mode=async): worker count and maximum queued jobs
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_QUEUE_DEPTH = int(os.getenv("INGEST_JOB_QUEUE_DEPTH", "32"))
+# Job status shared by all API worker processes, so any of them can answer GET /jobs/{id} (empty path:
+# each process only knows its own jobs)
+JOB_STATE_PATH = os.getenv("JOB_STATE_PATH", "data/cache/jobs.sqlite3")
+
+# Group-commit artifacts from concurrent ingests (write-behind buffer)
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+DB_FLUSH_INTERVAL_MS = int(os.getenv("DB_FLUSH_INTERVAL_MS", "50"))
+DB_FLUSH_MAX_ROWS = int(os.getenv("DB_FLUSH_MAX_ROWS", "1000"))
+
+# Local artifact store: directory for JSONL shards and their index, and shard rotation size
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "data/artifacts")
+ARTIFACT_SHARD_MAX_MB = int(os.getenv("ARTIFACT_SHARD_MAX_MB", "64"))
+
+# Near-duplicate segment index (empty path disables it) and the similarity above which segments are skipped
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "data/cache/dedup.sqlite3")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# Model call scheduler: requests and estimated tokens per minute (0 = unlimited), adaptive
+# concurrency bounds, and retries for rate-limited or transient failures
+MODEL_RPM = float(os.getenv("MODEL_RPM", "0"))
+MODEL_TPM = float(os.getenv("MODEL_TPM", "0"))
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "32"))
+MODEL_MIN_CONCURRENCY = int(os.getenv("MODEL_MIN_CONCURRENCY", "1"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "4"))
+MODEL_RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5"))
+MODEL_RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "30"))
+# Shrink concurrency when a call takes longer than this (0 = react to 429s only)
+MODEL_LATENCY_TARGET_SECONDS = float(os.getenv("MODEL_LATENCY_TARGET_SECONDS", "0"))
+# Per-thread ingestion watermarks, so re-posted threads only process new turns (empty path disables it)
+THREAD_STATE_PATH = os.getenv("THREAD_STATE_PATH", "data/cache/threads.sqlite3")
+# Local pre-filter: segments scoring below the threshold skip the model (0, the default, disables it). Skips
+# go to the audit log, and the given share of them is judged anyway so the filter's recall can be measured
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0"))
+PREFILTER_AUDIT_PATH = os.getenv("PREFILTER_AUDIT_PATH", "data/logs/prefilter_audit.jsonl")
+PREFILTER_AUDIT_RATE = float(os.getenv("PREFILTER_AUDIT_RATE", "0.05"))
+# The audit log is rotated to <path>.1 once it reaches this size
+PREFILTER_AUDIT_MAX_MB = float(os.getenv("PREFILTER_AUDIT_MAX_MB", "10"))
+# Segmenter: "paragraph" (fixed minimum length) or "topic" (cut where the vocabulary shifts). Topic
+# segments stay within the character bounds; the window is the paragraphs compared on each side of a gap
+SEGMENTATION_MODE = os.getenv("SEGMENTATION_MODE", "paragraph")
+TOPIC_MIN_SEGMENT_CHARS = int(os.getenv("TOPIC_MIN_SEGMENT_CHARS", "250"))
+TOPIC_MAX_SEGMENT_CHARS = int(os.getenv("TOPIC_MAX_SEGMENT_CHARS", "4000"))
+TOPIC_WINDOW = int(os.getenv("TOPIC_WINDOW", "4"))
+# Artifact query API (GET /artifacts): "local" reads the artifact store's index (FTS5 search), "postgres"
+# the artifacts table (tsvector search); default and largest page sizes
+ARTIFACT_QUERY_BACKEND = os.getenv("ARTIFACT_QUERY_BACKEND", "local")
+ARTIFACT_PAGE_SIZE = int(os.getenv("ARTIFACT_PAGE_SIZE", "50"))
+ARTIFACT_MAX_PAGE_SIZE = int(os.getenv("ARTIFACT_MAX_PAGE_SIZE", "500"))
+# CLI --review: verdicts and decisions of review sessions, so an interrupted review can be resumed
+REVIEW_STORE_PATH = os.getenv("REVIEW_STORE_PATH", "data/cache/reviews.sqlite3")
+# Model cascade: a fast contour model (empty disables it) judges segments first; verdicts below the
+# confidence floor, with diagnostic flags, or sampled for audit at the given rate go to the main model
+CONTOUR_CASCADE_MODEL = os.getenv("CONTOUR_CASCADE_MODEL", "")
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.8"))
+CASCADE_ESCALATE_ON_FLAGS = os.getenv("CASCADE_ESCALATE_ON_FLAGS", "true").lower() in ("1", "true", "yes")
+CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.05"))
+# Largest POST /ingest body accepted, in megabytes (0 = unlimited); larger bodies get a 413
+INGEST_MAX_BODY_MB = int(os.getenv("INGEST_MAX_BODY_MB", "64"))
+# API startup: build agents and open stores when each worker starts instead of on first request
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "true").lower() in ("1", "true", "yes")
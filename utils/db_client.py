@@ -1,60 +1,325 @@
+"""Postgres access for artifacts: a process-wide connection pool and bulk writes.
+
+psycopg2 is imported when the pool is first created, so importing this
+module costs nothing for code paths that never touch the database. The pool
+belongs to the process that created it: a forked worker (e.g. under
+`uvicorn --workers N`) that inherited one opens its own on first use.
+"""
+import asyncio
 import os
-from typing import List, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import Json
+
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+
+_pool: Optional["ThreadedConnectionPool"] = None
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+# Process that created _pool; connections are never shared across a fork
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+# An artifact's full-text search document. Queries must use the same expression to use the GIN index.
+SEARCH_DOCUMENT = (
+    "to_tsvector('english', coalesce(content, '') || ' ' || coalesce(epistemic_trace->>'justification', ''))"
+)
+# Owner columns and indexes added to the artifacts table by ensure_schema(); every statement is idempotent.
+# Inserts use ON CONFLICT (knowledge_id), which needs the unique index.
+SCHEMA_STATEMENTS = (
+    "ALTER TABLE artifacts ADD COLUMN IF NOT EXISTS user_id TEXT, ADD COLUMN IF NOT EXISTS thread_id TEXT",
+    "CREATE UNIQUE INDEX IF NOT EXISTS artifacts_knowledge_id_key ON artifacts (knowledge_id)",
+    "CREATE INDEX IF NOT EXISTS artifacts_thread_idx ON artifacts (user_id, thread_id, created_at, knowledge_id)",
+    f"CREATE INDEX IF NOT EXISTS artifacts_search_idx ON artifacts USING GIN ({SEARCH_DOCUMENT})",
+)
+
+
+def load_db_config() -> Dict[str, str]:
+    """
+    Read the Postgres connection settings from the environment (or .env).
+    """
+    load_dotenv()
+    cfg = {
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT'),
+        'dbname': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+    }
+    missing = [k for k, v in cfg.items() if not v]
+    if missing:
+        raise EnvironmentError(f"Missing DB config for: {', '.join(missing)}")
+    return cfg
+
+
+def get_pool() -> "ThreadedConnectionPool":
+    """
+    Process-wide connection pool, created on first use.
+
+    Size is controlled by DB_POOL_MIN (default 1) and DB_POOL_MAX (default 10).
+    A pool inherited across a fork is dropped, not closed: its sockets are
+    shared with the parent, which still uses them.
+    """
+    global _pool, _pool_slots, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid != os.getpid():
+            _pool = None
+            _pool_slots = None
+        if _pool is None:
+            from psycopg2.pool import ThreadedConnectionPool
+            cfg = load_db_config()
+            maxconn = int(os.getenv('DB_POOL_MAX', '10'))
+            _pool = ThreadedConnectionPool(int(os.getenv('DB_POOL_MIN', '1')), maxconn, **cfg)
+            _pool_slots = threading.BoundedSemaphore(maxconn)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def close_pool():
+    """
+    Close every connection in the process-wide pool.
+    """
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            if _pool_pid == os.getpid():
+                _pool.closeall()
+            _pool = None
+            _pool_slots = None
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the pool, blocking while all connections are in use.
+
+    Connections that failed at the driver level are discarded instead of
+    being returned to the pool.
+    """
+    import psycopg2
+    pool = get_pool()
+    slots = _pool_slots
+    slots.acquire()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+        slots.release()
+
+
+def ensure_schema(conn):
+    """
+    Bring the artifacts table up to date with SCHEMA_STATEMENTS, on the
+    given connection. A migration step (`submit_to_db.py --migrate`), run
+    once before the API starts, not on the request path: the statements
+    take exclusive locks and can build a large index.
+    """
+    cur = conn.cursor()
+    try:
+        for statement in SCHEMA_STATEMENTS:
+            cur.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _artifact_row(art: Dict[str, Any]) -> Tuple[Any, ...]:
+    from psycopg2.extras import Json
+    trace = art.get('epistemic_trace')
+    # Ensure trace is a plain dict
+    if hasattr(trace, 'dict'):
+        trace_dict = trace.dict()
+    else:
+        trace_dict = trace
+    return (
+        art.get('id'), art.get('created_at'), art.get('content'), Json(trace_dict),
+        art.get('user_id'), art.get('thread_id'),
+    )
+
 
 class DBClient:
     """
     Database client for inserting artifacts into the Postgres database.
+
+    Connections come from a process-wide pool and are only held for the
+    duration of a write.
     """
     def __init__(self):
-        load_dotenv()
-        cfg = {
-            'host': os.getenv('DB_HOST'),
-            'port': os.getenv('DB_PORT'),
-            'dbname': os.getenv('DB_NAME'),
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD'),
-        }
-        missing = [k for k, v in cfg.items() if not v]
-        if missing:
-            raise EnvironmentError(f"Missing DB config for: {', '.join(missing)}")
-        self._conn = psycopg2.connect(**cfg)
+        # Fail early on missing configuration, as before
+        get_pool()
 
     def insert_artifacts(self, artifacts: List[Dict[str, Any]]):
         """
         Bulk insert a list of artifact dictionaries into the artifacts table.
-        Each artifact dict should contain keys: id, created_at, content, epistemic_trace.
+        Each artifact dict should contain keys: id, created_at, content, epistemic_trace,
+        and optionally user_id and thread_id.
+        All rows are sent in a single multi-row INSERT and committed together.
+        Artifacts whose knowledge_id is already stored are skipped, so a
+        retried write is harmless.
         """
-        cur = self._conn.cursor()
-        try:
-            for art in artifacts:
-                art_id = art.get('id')
-                created_at = art.get('created_at')
-                content = art.get('content')
-                trace = art.get('epistemic_trace')
-                # Ensure trace is a plain dict
-                if hasattr(trace, 'dict'):
-                    trace_dict = trace.dict()
-                else:
-                    trace_dict = trace
-                cur.execute(
+        if not artifacts:
+            return
+        from psycopg2.extras import execute_values
+        rows = [_artifact_row(art) for art in artifacts]
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            try:
+                execute_values(
+                    cur,
                     """
-                    INSERT INTO artifacts (knowledge_id, created_at, content, epistemic_trace)
-                    VALUES (%s, %s, %s, %s)
+                    INSERT INTO artifacts (knowledge_id, created_at, content, epistemic_trace, user_id, thread_id)
+                    VALUES %s
+                    ON CONFLICT (knowledge_id) DO NOTHING
                     """,
-                    (art_id, created_at, content, Json(trace_dict))
+                    rows,
+                    page_size=len(rows),
                 )
-            self._conn.commit()
-        except Exception:
-            self._conn.rollback()
-            raise
-        finally:
-            cur.close()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+    async def insert_artifacts_async(self, artifacts: List[Dict[str, Any]]):
+        """
+        Same as insert_artifacts, run in a worker thread so the event loop is not blocked.
+        """
+        await asyncio.to_thread(self.insert_artifacts, artifacts)
+
+    def delete_artifacts(self, knowledge_ids: List[str]):
+        """
+        Delete the artifacts with the given knowledge_ids, in one statement.
+        """
+        if not knowledge_ids:
+            return
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("DELETE FROM artifacts WHERE knowledge_id = ANY(%s)", (list(knowledge_ids),))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+    async def delete_artifacts_async(self, knowledge_ids: List[str]):
+        """
+        Same as delete_artifacts, run in a worker thread so the event loop is not blocked.
+        """
+        await asyncio.to_thread(self.delete_artifacts, knowledge_ids)
 
     def close(self):
         """
-        Close the database connection.
+        Release the client. Pooled connections stay open for reuse; see close_pool().
+        """
+
+
+class ArtifactWriteBuffer:
+    """
+    Write-behind buffer that group-commits artifacts from concurrent callers.
+
+    write() enqueues artifacts and waits until the transaction containing them
+    has committed (or failed). A background task flushes whatever is pending
+    at most `flush_interval` seconds after the first write of a group, or as
+    soon as `max_rows` rows are waiting, in one transaction. If that
+    transaction fails, each caller's artifacts are retried in a transaction
+    of their own, so only the callers whose rows still fail see an error.
+    """
+    def __init__(self, client: Optional[DBClient] = None, flush_interval: float = 0.05, max_rows: int = 1000):
+        self.client = client or DBClient()
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._pending: List[Tuple[List[Dict[str, Any]], asyncio.Future]] = []
+        self._pending_rows = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self):
+        """Start the background flush task. Must be called from the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush anything still pending and stop the background task."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def write(self, artifacts: List[Dict[str, Any]]):
+        """
+        Queue artifacts for the next group commit and wait for it to complete.
+        Raises whatever the group's INSERT raised.
         """
-        self._conn.close()
\ No newline at end of file
+        if not artifacts:
+            return
+        if self._task is None or self._closing:
+            raise RuntimeError("ArtifactWriteBuffer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((artifacts, future))
+        self._pending_rows += len(artifacts)
+        self._wakeup.set()
+        if self._pending_rows >= self.max_rows:
+            self._full.set()
+        await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush()
+            if self._closing and not self._pending:
+                return
+
+    async def _flush(self):
+        group, self._pending, self._pending_rows = self._pending, [], 0
+        self._wakeup.clear()
+        self._full.clear()
+        if not group:
+            return
+        if len(group) == 1:
+            await self._write_one(*group[0])
+            return
+        rows = [art for artifacts, _ in group for art in artifacts]
+        try:
+            await self.client.insert_artifacts_async(rows)
+        except Exception:
+            # One caller's bad row sinks the whole group: retry each caller on its own
+            await asyncio.gather(*(self._write_one(artifacts, future) for artifacts, future in group))
+            return
+        for _, future in group:
+            if not future.done():
+                future.set_result(None)
+
+    async def _write_one(self, artifacts: List[Dict[str, Any]], future: asyncio.Future):
+        """Insert one caller's artifacts in their own transaction and report the result to it."""
+        try:
+            await self.client.insert_artifacts_async(artifacts)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(None)
@@ -0,0 +1,231 @@
+"""Near-duplicate segment detection with MinHash and locality-sensitive hashing.
+
+Each segment is reduced to a MinHash signature over its word shingles. The
+signature is split into bands, and every band is stored as an indexed
+bucket in SQLite, so finding candidates for a new segment costs one index
+lookup per band however many segments are stored. Candidates are confirmed
+by comparing signatures, which estimates the Jaccard similarity of the
+shingle sets.
+
+Entries can belong to an owner (the user_id of the ingest). The owner is
+mixed into the band hashes, so a lookup only ever finds the owner's own
+segments and one user's text never links to another user's artifact.
+Entries whose verdict is still pending after `pending_ttl` seconds are
+left over from a process that died mid-run and are ignored.
+
+The connection is shared by all threads and guarded by a lock. The *_many
+methods check, resolve or remove a whole batch of segments in one
+transaction, so a pipeline commits once per batch instead of once per
+segment.
+"""
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+# Mersenne prime for the universal hash family; signature values fit in 32 bits
+_PRIME = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class DuplicateMatch(BaseModel):
+    """A previously seen segment that a new segment nearly duplicates."""
+    entry_id: int
+    similarity: float
+    knowledge_id: Optional[str] = None
+    is_artifact: Optional[bool] = None
+
+
+def shingles(text: str, size: int = 5) -> List[str]:
+    """
+    Word n-grams of the lowercased text. Texts shorter than `size` words
+    yield a single shingle of all their words.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) <= size:
+        return [" ".join(tokens)]
+    return [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash-LSH index of segments seen so far.
+
+    Entries remember the verdict and, for artifacts, the knowledge_id, so a
+    near-duplicate can be skipped or linked to the existing artifact. With
+    the defaults (64 permutations in 16 bands of 4), pairs at the default
+    0.8 threshold become candidates with probability above 0.999.
+    """
+    def __init__(
+        self, path: str, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, pending_ttl: float = 3600
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.pending_ttl = pending_ttl
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Fixed seed: signatures must be comparable across processes and restarts
+        rng = random.Random(0x5EED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                is_artifact INTEGER,
+                knowledge_id TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                hash INTEGER NOT NULL,
+                segment_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, hash);
+            CREATE INDEX IF NOT EXISTS buckets_segment ON buckets (segment_id);
+            """
+        )
+        self._conn.commit()
+
+    def signature(self, text: str) -> List[int]:
+        """MinHash signature of the text's shingles."""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+            for s in set(shingles(text))
+        ]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_hashes(self, sig: Sequence[int], owner: Optional[str] = None) -> List[Tuple[int, int]]:
+        # Unowned entries keep the plain band hashes, as stored before owners existed
+        salt = b"" if owner is None else hashlib.blake2b(owner.encode("utf-8"), digest_size=16).digest()
+        out = []
+        for band in range(self.bands):
+            chunk = array("I", sig[band * self.rows:(band + 1) * self.rows]).tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8, key=salt).digest()
+            out.append((band, int.from_bytes(digest, "little", signed=True)))
+        return out
+
+    def query(self, sig: Sequence[int], owner: Optional[str] = None) -> Optional[DuplicateMatch]:
+        """
+        Return the most similar segment of `owner` stored at or above the threshold, if any.
+        """
+        with self._lock:
+            return self._query(sig, owner)
+
+    def _query(self, sig: Sequence[int], owner: Optional[str]) -> Optional[DuplicateMatch]:
+        candidates = set()
+        for band, h in self._band_hashes(sig, owner):
+            for (segment_id,) in self._conn.execute(
+                "SELECT segment_id FROM buckets WHERE band = ? AND hash = ?", (band, h)
+            ):
+                candidates.add(segment_id)
+        best: Optional[DuplicateMatch] = None
+        stale = time.time() - self.pending_ttl
+        for segment_id in candidates:
+            row = self._conn.execute(
+                "SELECT signature, is_artifact, knowledge_id, created_at FROM segments WHERE id = ?", (segment_id,)
+            ).fetchone()
+            if row is None or (row[1] is None and row[3] < stale):
+                continue
+            stored = array("I")
+            stored.frombytes(row[0])
+            similarity = sum(1 for x, y in zip(sig, stored) if x == y) / self.num_perm
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = DuplicateMatch(
+                    entry_id=segment_id,
+                    similarity=similarity,
+                    is_artifact=None if row[1] is None else bool(row[1]),
+                    knowledge_id=row[2],
+                )
+        return best
+
+    def add(self, sig: Sequence[int], owner: Optional[str] = None) -> int:
+        """
+        Store a segment's signature for `owner`, with its verdict still pending. Returns the entry id.
+        """
+        with self._lock:
+            entry_id = self._add(sig, owner)
+            self._conn.commit()
+        return entry_id
+
+    def _add(self, sig: Sequence[int], owner: Optional[str]) -> int:
+        cur = self._conn.execute(
+            "INSERT INTO segments (signature, created_at) VALUES (?, ?)",
+            (array("I", sig).tobytes(), time.time()),
+        )
+        entry_id = cur.lastrowid
+        self._conn.executemany(
+            "INSERT INTO buckets (band, hash, segment_id) VALUES (?, ?, ?)",
+            [(band, h, entry_id) for band, h in self._band_hashes(sig, owner)],
+        )
+        return entry_id
+
+    def check_many(
+        self, checks: Sequence[Tuple[Sequence[int], bool, bool]], owner: Optional[str] = None
+    ) -> List[Tuple[Optional[DuplicateMatch], Optional[int]]]:
+        """
+        Check a batch of (signature, query, add) segments of `owner` in order,
+        in one transaction. Each is looked up if `query`; if it matched
+        nothing and `add` is set, it is stored with its verdict pending, so
+        later segments of the batch can match it. Returns (match, entry id)
+        per segment.
+        """
+        results: List[Tuple[Optional[DuplicateMatch], Optional[int]]] = []
+        with self._lock:
+            try:
+                for sig, query, add in checks:
+                    match = self._query(sig, owner) if query else None
+                    entry_id = self._add(sig, owner) if match is None and add else None
+                    results.append((match, entry_id))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return results
+
+    def resolve(self, entry_id: int, is_artifact: bool, knowledge_id: Optional[str] = None):
+        """Record the verdict (and artifact id) for a stored segment."""
+        self.resolve_many([(entry_id, is_artifact, knowledge_id)])
+
+    def resolve_many(self, verdicts: Iterable[Tuple[int, bool, Optional[str]]]):
+        """Record (entry id, is_artifact, knowledge_id) verdicts of stored segments, in one transaction."""
+        rows = [(int(is_artifact), knowledge_id, entry_id) for entry_id, is_artifact, knowledge_id in verdicts]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE segments SET is_artifact = ?, knowledge_id = ? WHERE id = ?", rows)
+            self._conn.commit()
+
+    def remove(self, entry_id: int):
+        """Forget a stored segment, e.g. one whose evaluation failed."""
+        self.remove_many([entry_id])
+
+    def remove_many(self, entry_ids: Iterable[int]):
+        """Forget stored segments, in one transaction."""
+        rows = [(entry_id,) for entry_id in entry_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM buckets WHERE segment_id = ?", rows)
+            self._conn.executemany("DELETE FROM segments WHERE id = ?", rows)
+            self._conn.commit()
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        with self._lock:
+            self._conn.close()
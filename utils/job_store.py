@@ -0,0 +1,84 @@
+"""Shared state of background ingest jobs.
+
+Each API worker process runs its own jobs, but a client polling GET
+/jobs/{job_id} may reach any worker. JobManager writes a job's status here
+when it is queued, while it runs and when it finishes, so every worker
+sharing the file can answer for it.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class JobStore:
+    """
+    SQLite-backed map of job id to the job's last recorded status.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_idx ON jobs (finished_at)")
+        self._conn.commit()
+
+    def save(self, job_id: str, data: Dict[str, Any]):
+        """Store a job's status, replacing any earlier one."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, finished_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(data, ensure_ascii=False), data.get("finished_at"), time.time()),
+            )
+            self._conn.commit()
+
+    def save_many(self, jobs: Dict[str, Dict[str, Any]]):
+        """Store the statuses of several jobs by id, in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (job_id, data, finished_at, updated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (job_id, json.dumps(data, ensure_ascii=False), data.get("finished_at"), now)
+                    for job_id, data in jobs.items()
+                ],
+            )
+            self._conn.commit()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The last recorded status of a job, or None if it is unknown."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self, max_finished: int):
+        """Forget the oldest finished jobs beyond the newest `max_finished`."""
+        with self._lock:
+            self._conn.execute(
+                """
+                DELETE FROM jobs WHERE finished_at IS NOT NULL AND job_id NOT IN (
+                    SELECT job_id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?
+                )
+                """,
+                (max_finished,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        self._conn.close()
@@ -0,0 +1,188 @@
+"""Incremental parsing of a JSON object from a stream of bytes.
+
+POST /ingest bodies can hold threads of thousands of turns. JSONObjectStream
+reads the members of the body's top-level object as the bytes arrive and
+hands out the elements of one array member (the turns) one at a time, so
+the raw body, and the parsed payload as a whole, are never held in memory.
+Every member and array element is decoded by the json module itself
+(JSONDecoder.raw_decode) once enough of it has been received; only the
+structure between them is scanned here.
+"""
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+_WHITESPACE = " \t\n\r"
+# Characters that may continue a number
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+class PayloadTooLargeError(Exception):
+    """Raised when a request body exceeds the allowed size."""
+
+
+class InvalidJSONError(ValueError):
+    """Raised when a request body is not a well-formed JSON object."""
+
+
+class JSONObjectStream:
+    """
+    Reader of a JSON object arriving as byte chunks, at most `max_bytes`
+    of them (0 = unlimited).
+
+    members_until(key) returns the members before `key`; if its value is an
+    array, items() then yields the elements, and rest() reads the members
+    after it. Raises PayloadTooLargeError once more than `max_bytes` were
+    received, and InvalidJSONError for malformed input, from whichever call
+    reads that far.
+    """
+    def __init__(self, chunks: AsyncIterable[bytes], max_bytes: int = 0):
+        self._chunks = chunks.__aiter__()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        # Decoded text not consumed yet starts at _pos in _buf; chunks received
+        # since the last decode attempt wait in _pending so they are joined once
+        self._buf = ""
+        self._pos = 0
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._eof = False
+        self._started = False
+        self._in_array = False
+        self._closed = False
+        # Whether the next member or element needs a comma before it
+        self._comma = False
+        # Whether members_until() stopped at the array it was looking for
+        self.found = False
+
+    def _available(self) -> int:
+        return len(self._buf) - self._pos + self._pending_chars
+
+    async def _read(self) -> bool:
+        """Receive one more chunk; False at the end of the body."""
+        if self._eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            self.bytes_read += len(chunk)
+            if self.max_bytes and self.bytes_read > self.max_bytes:
+                raise PayloadTooLargeError(f"Request body exceeds {self.max_bytes} bytes")
+            try:
+                text = self._utf8.decode(chunk)
+            except UnicodeDecodeError as e:
+                raise InvalidJSONError("Request body is not valid UTF-8") from e
+        if text:
+            self._pending.append(text)
+            self._pending_chars += len(text)
+        return not self._eof
+
+    def _join(self):
+        if self._pending:
+            self._buf = self._buf[self._pos:] + "".join(self._pending)
+            self._pos = 0
+            self._pending = []
+            self._pending_chars = 0
+
+    async def _peek(self) -> str:
+        """Skip whitespace and return the next character ("" at the end of the body)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._pending and not await self._read() and not self._pending:
+                return ""
+            self._join()
+
+    async def _expect(self, char: str):
+        if await self._peek() != char:
+            raise InvalidJSONError(f"Expected {char!r} at byte {self.bytes_read}")
+        self._pos += 1
+
+    async def _value(self) -> Any:
+        """Decode the JSON value at the current position."""
+        await self._peek()
+        need = 0
+        while True:
+            if self._available() >= need or self._eof:
+                self._join()
+                try:
+                    value, end = self._decoder.raw_decode(self._buf, self._pos)
+                except json.JSONDecodeError as e:
+                    if self._eof:
+                        raise InvalidJSONError(str(e)) from e
+                else:
+                    # A number running into the end of the input so far (or
+                    # cut short inside, e.g. "1.5e") may still continue
+                    if self._eof or (end < len(self._buf) and self._buf[end] not in _NUMBER_CHARS):
+                        self._pos = end
+                        return value
+                # Retry once the unparsed input has doubled, so a long value is
+                # scanned a bounded number of times rather than once per chunk
+                need = max(2 * self._available(), 1)
+            await self._read()
+
+    async def _start(self):
+        if not self._started:
+            await self._expect("{")
+            self._started = True
+
+    async def members_until(self, key: Optional[str]) -> Dict[str, Any]:
+        """
+        Read members up to the one named `key` whose value is an array, and
+        return them. Stops there (see items()) or at the end of the object;
+        `found` tells which. A `key` of None reads the whole object.
+        """
+        await self._start()
+        members: Dict[str, Any] = {}
+        self.found = False
+        while not self._closed:
+            if await self._peek() == "}":
+                self._pos += 1
+                self._closed = True
+                await self._end()
+                break
+            if self._comma:
+                await self._expect(",")
+            name = await self._value()
+            if not isinstance(name, str):
+                raise InvalidJSONError("Object keys must be strings")
+            await self._expect(":")
+            self._comma = True
+            if key is not None and name == key and await self._peek() == "[":
+                self._pos += 1
+                self._in_array = True
+                self.found = True
+                return members
+            members[name] = await self._value()
+        return members
+
+    async def items(self) -> AsyncIterator[Any]:
+        """Yield the elements of the array members_until() stopped at, one at a time."""
+        first = True
+        while self._in_array:
+            if await self._peek() == "]":
+                self._pos += 1
+                self._in_array = False
+                return
+            if not first:
+                await self._expect(",")
+            first = False
+            yield await self._value()
+
+    async def rest(self) -> Dict[str, Any]:
+        """Read the members after the array, through the end of the body."""
+        async for _ in self.items():
+            pass
+        return await self.members_until(None)
+
+    async def _end(self):
+        if await self._peek() != "":
+            raise InvalidJSONError("Unexpected data after the JSON object")
+
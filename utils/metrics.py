@@ -0,0 +1,326 @@
+"""Pipeline metrics in Prometheus text format, without external dependencies.
+
+A MetricsRegistry holds counters, gauges and histograms, each with optional
+labels, and renders them in the Prometheus exposition format. PipelineMetrics
+defines the instruments the pipeline records (stage durations, segment
+outcomes, tokens per model call, retries, queue depth) and can also keep the
+raw duration samples to produce an exact-percentile JSON report for the CLI.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; the Prometheus client defaults plus room for slow model calls
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, label string, value) triples for rendering."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(v)}" for suffix, labels, v in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def label_sets(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(zip(self.labelnames, k)) for k in sorted(self._values)]
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [("", _format_labels(self.labelnames, k), v) for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down. With `callback`, the value is read from
+    it at render time instead (labels are not supported then).
+    """
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        if self.callback is not None:
+            return self.callback()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self.callback is not None:
+            return [("", "", self.callback())]
+        with self._lock:
+            return [("", _format_labels(self.labelnames, k), v) for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram. With `keep_samples`, every observation is
+    also kept so exact percentiles can be reported (meant for one-off runs,
+    not a long-lived server).
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+        keep_samples: bool = False,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.keep_samples = keep_samples
+        # label key -> (per-bucket counts, sum, count)
+        self._data: Dict[LabelKey, List] = {}
+        self._samples: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[0][i] += 1
+                    break
+            data[1] += value
+            data[2] += 1
+            if self.keep_samples:
+                self._samples.setdefault(key, []).append(value)
+
+    def label_sets(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(zip(self.labelnames, k)) for k in sorted(self._data)]
+
+    def summary(self, **labels: str) -> Dict[str, float]:
+        """Count, sum and (with keep_samples) p50/p90/p99/max for one label set."""
+        key = self._key(labels)
+        with self._lock:
+            data = self._data.get(key)
+            values = sorted(self._samples.get(key, []))
+        if data is None:
+            return {"count": 0, "sum": 0.0}
+        out = {"count": data[2], "sum": round(data[1], 6)}
+        if values:
+            def rank(p: float) -> float:
+                return values[min(len(values) - 1, max(0, math.ceil(p * len(values)) - 1))]
+            out.update(p50=round(rank(0.5), 6), p90=round(rank(0.9), 6), p99=round(rank(0.99), 6),
+                       max=round(values[-1], 6))
+        return out
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._data.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = f'le="{_format_value(bound)}"'
+                    out.append(("_bucket", _format_labels(self.labelnames, key, le), cumulative))
+                out.append(("_bucket", _format_labels(self.labelnames, key, 'le="+Inf"'), count))
+                out.append(("_sum", _format_labels(self.labelnames, key), total))
+                out.append(("_count", _format_labels(self.labelnames, key), count))
+        return out
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+class PipelineMetrics:
+    """
+    Instruments for the artifacting pipeline.
+
+    Stages are "segmentation", "model_queue" (waiting for one of the
+    pipeline's model-call slots), "scheduler_wait" (waiting for the shared
+    scheduler's slots and rate limits), "contour", "assembly" and "db_insert". Segment outcomes are "artifact",
+    "rejected", "error" and "skipped".
+    """
+    def __init__(self, registry: Optional[MetricsRegistry] = None, keep_samples: bool = False):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.stage_seconds = r.register(Histogram(
+            "artifacting_stage_duration_seconds", "Time spent per pipeline stage operation.",
+            ["stage"], keep_samples=keep_samples,
+        ))
+        self.segments = r.register(Counter(
+            "artifacting_segments_total", "Segments processed, by outcome.", ["outcome"]
+        ))
+        self.approval_ratio = r.register(Gauge(
+            "artifacting_approval_ratio", "Share of judged segments that became artifacts.",
+            callback=self._approval_ratio,
+        ))
+        self.model_tokens = r.register(Histogram(
+            "artifacting_model_tokens", "Tokens per model call.",
+            ["stage", "direction"], buckets=TOKEN_BUCKETS, keep_samples=keep_samples,
+        ))
+        self.model_calls = r.register(Counter(
+            "artifacting_model_calls_total", "Model calls, by stage and status.", ["stage", "status"]
+        ))
+        self.retries = r.register(Counter(
+            "artifacting_retries_total", "Segments re-submitted to the model, by reason.", ["reason"]
+        ))
+        self.in_flight = r.register(Gauge(
+            "artifacting_model_calls_in_flight", "Model calls currently running."
+        ))
+        self.waiting = r.register(Gauge(
+            "artifacting_model_calls_waiting", "Model calls queued for a free slot."
+        ))
+        self.db_rows = r.register(Counter(
+            "artifacting_db_rows_total", "Artifact rows written to the database."
+        ))
+        self.prefiltered = r.register(Counter(
+            "artifacting_prefilter_segments_total",
+            "Segments the prefilter would skip: skipped, or judged anyway as an audit sample.", ["action"]
+        ))
+        self.cascade = r.register(Counter(
+            "artifacting_cascade_segments_total",
+            "Segments judged by the cascade's fast model, by route (accepted, or why it was escalated).", ["route"]
+        ))
+        self.cascade_audits = r.register(Counter(
+            "artifacting_cascade_audits_total",
+            "Audited fast-model verdicts, by whether the main model agreed.", ["result"]
+        ))
+
+    def _cascade_report(self) -> Dict[str, object]:
+        routes = {labels["route"]: int(self.cascade.value(**labels)) for labels in self.cascade.label_sets()}
+        total = sum(routes.values())
+        audits = {labels["result"]: int(self.cascade_audits.value(**labels)) for labels in self.cascade_audits.label_sets()}
+        audited = sum(audits.values())
+        return {
+            "routes": routes,
+            "escalation_rate": round((total - routes.get("accepted", 0)) / total, 4) if total else 0.0,
+            "audit_agreement": round(audits.get("agreed", 0) / audited, 4) if audited else None,
+        }
+
+    def _approval_ratio(self) -> float:
+        judged = sum(self.segments.value(outcome=o) for o in ("artifact", "rejected"))
+        return self.segments.value(outcome="artifact") / judged if judged else 0.0
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block under `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+    def observe_tokens(self, stage: str, input_tokens: int, output_tokens: int):
+        self.model_tokens.observe(input_tokens, stage=stage, direction="input")
+        self.model_tokens.observe(output_tokens, stage=stage, direction="output")
+
+    def render(self) -> str:
+        return self.registry.render()
+
+    def report(self) -> Dict[str, object]:
+        """JSON-friendly summary: per-stage timings, outcomes, tokens and retries."""
+        return {
+            "stages": {
+                labels["stage"]: self.stage_seconds.summary(**labels)
+                for labels in self.stage_seconds.label_sets()
+            },
+            "segments": {
+                o: int(self.segments.value(outcome=o)) for o in ("artifact", "rejected", "error", "skipped")
+            },
+            "approval_ratio": round(self._approval_ratio(), 4),
+            "tokens": {
+                f"{labels['stage']}_{labels['direction']}": self.model_tokens.summary(**labels)
+                for labels in self.model_tokens.label_sets()
+            },
+            "model_calls": {
+                f"{labels['stage']}_{labels['status']}": int(self.model_calls.value(**labels))
+                for labels in self.model_calls.label_sets()
+            },
+            "retries": {
+                labels["reason"]: int(self.retries.value(**labels)) for labels in self.retries.label_sets()
+            },
+            "db_rows": int(self.db_rows.value()),
+            "prefilter": {
+                labels["action"]: int(self.prefiltered.value(**labels)) for labels in self.prefiltered.label_sets()
+            },
+            "cascade": self._cascade_report(),
+        }
@@ -1,6 +1,6 @@
-"""Pydantic models for artifacting pipeline."""
+"""Pydantic models for artifacting pipeline, plus its per-segment SegmentOutcome record."""
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class Segment(BaseModel):
     id: str
@@ -19,6 +19,23 @@ class EpistemicContourResult(BaseModel):
 class EpistemicContourOutput(BaseModel):
     segments: List[EpistemicContourResult]
 
+class EpistemicContourVerdict(BaseModel):
+    """Contour decision for a segment, without echoing the segment text."""
+    id: str
+    is_artifact: bool = Field(..., description="Whether this segment is an artifact")
+    justification: str = Field(..., description="Justification for the artifact decision")
+    diagnostic_flags: List[str] = Field(default_factory=list, description="Diagnostic flags for issues or uncertainties")
+
+class EpistemicContourVerdictOutput(BaseModel):
+    segments: List[EpistemicContourVerdict]
+
+class EpistemicContourTriage(EpistemicContourVerdict):
+    """First-pass verdict of the cascade's fast model, with how sure it is."""
+    confidence: float = Field(..., description="Confidence in the decision, from 0 (a guess) to 1 (certain)")
+
+class EpistemicContourTriageOutput(BaseModel):
+    segments: List[EpistemicContourTriage]
+
 class Artifact(BaseModel):
     id: str
     content: str
@@ -35,4 +52,70 @@ class ArtifactOutput(BaseModel):
     id: str
     created_at: str
     content: str
-    epistemic_trace: EpistemicTrace
\ No newline at end of file
+    epistemic_trace: EpistemicTrace
+    # Owner of the conversation the artifact came from, when ingested through the API
+    user_id: Optional[str] = None
+    thread_id: Optional[str] = None
+
+class SegmentOutcome:
+    """
+    Result of running one segment through the pipeline.
+
+    A plain __slots__ record rather than a pydantic model, since one is kept
+    per segment for the whole run. It holds the segment itself (usually a
+    SegmentSpan, see utils.segments) and the model's verdict, but not a copy
+    of the text: `result` builds the full EpistemicContourResult on access.
+    """
+    __slots__ = ("segment_id", "segment", "verdict", "_result", "artifact", "error", "skip_reason", "duplicate_of")
+
+    def __init__(
+        self,
+        segment_id: str,
+        segment: Any = None,
+        verdict: Optional[EpistemicContourVerdict] = None,
+        result: Optional[EpistemicContourResult] = None,
+        artifact: Optional[ArtifactOutput] = None,
+        error: Optional[str] = None,
+        skip_reason: Optional[str] = None,
+        duplicate_of: Optional[str] = None,
+    ):
+        self.segment_id = segment_id
+        self.segment = segment
+        self.verdict = verdict
+        self._result = result
+        self.artifact = artifact
+        self.error = error
+        # Set when the segment was not sent to the model, with the reason
+        self.skip_reason = skip_reason
+        # knowledge_id of an existing artifact this segment nearly duplicates
+        self.duplicate_of = duplicate_of
+
+    @property
+    def result(self) -> Optional[EpistemicContourResult]:
+        """The contour result: the verdict together with the segment text."""
+        if self._result is not None:
+            return self._result
+        if self.verdict is None or self.segment is None:
+            return None
+        return EpistemicContourResult(
+            id=self.segment_id,
+            text=self.segment["text"],
+            **self.verdict.model_dump(exclude={"id"}),
+        )
+
+    @result.setter
+    def result(self, value: Optional[EpistemicContourResult]):
+        self._result = value
+
+    def replace(self, **changes: Any) -> "SegmentOutcome":
+        """A copy with the given fields changed."""
+        fields = {name: getattr(self, name) for name in self.__slots__ if name != "_result"}
+        fields["result"] = self._result
+        fields.update(changes)
+        return SegmentOutcome(**fields)
+
+    def __repr__(self) -> str:
+        return (
+            f"SegmentOutcome(segment_id={self.segment_id!r}, verdict={self.verdict!r}, "
+            f"artifact={self.artifact!r}, error={self.error!r}, skip_reason={self.skip_reason!r})"
+        )
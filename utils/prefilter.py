@@ -0,0 +1,177 @@
+"""Local pre-filter for segments that are plainly not knowledge artifacts.
+
+Every line of a segment is classified as prose, code, chatter ("You said:",
+"Copy"/"Edit" buttons, greetings) or list (titles and other short fragments).
+A segment's score is the amount of prose it contains, scaled to 0-1:
+PROSE_WORDS words of prose (about two sentences) or more score 1. Segments
+scoring below the threshold are skipped without a model call, and each skip
+is appended to a JSONL audit log with its score, features, a hash of its
+text and a short excerpt, so the recall of the filter can be checked without
+the log keeping whole conversations. The log is rotated once it reaches
+`audit_max_bytes`, keeping one older file. A sample of would-be skips can
+still be sent to the model (`audit_rate`); their verdicts are logged as
+well, which measures how many artifacts the filter would have dropped.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from utils.sampling import hash_sampled
+
+# Words of prose at which a segment scores 1.0
+PROSE_WORDS = 40
+# Lines of a prose sentence have at least this many words
+MIN_PROSE_LINE_WORDS = 4
+# Characters of segment text kept in an audit record
+AUDIT_EXCERPT_CHARS = 200
+
+LINE_KINDS = ("prose", "code", "chatter", "list")
+
+_WORD_RE = re.compile(r"[^\W\d_][^\W\d_'’-]*")
+# Transcript labels, copy buttons and the language tags ChatGPT puts above code blocks
+_CHATTER_RE = re.compile(
+    r"^(you said|chatgpt said|copy|edit|copy code|bash|zsh|sh|shell|json|python|pgsql|sql|javascript|js|"
+    r"typescript|ts|yaml|toml|html|css|text|plaintext|markdown|mermaid|diff|csharp|java|go|rust|swift)\s*:?$",
+    re.IGNORECASE,
+)
+_GREETING_RE = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|great|absolutely|sure|ok|okay|perfect|got it|sounds good|yes|yep|"
+    r"yea|yeah|no problem|awesome|cool|nice|excellent|love it)\b",
+    re.IGNORECASE,
+)
+# Lines that are code whatever their wording
+_CODE_RE = re.compile(
+    r"^(#!|\$ |>>> |import \w|from [\w.]+ import |def |class \w+[(:]|return\b|export |sudo |pip3? |npm |"
+    r"cd |ls\b|chmod |mkdir |git |curl |python3? |SELECT |INSERT |CREATE |UPDATE |[{}\[\]]|//|</?\w+>|\"[\w-]+\":|"
+    r"[╔╗╚╝║═│┌┐└┘├┤─+|])"
+)
+# Weaker signs of code, only applied to lines that do not read as prose
+_CODE_HINT_RE = re.compile(r"[=;{}]|\w\([^)]*\)\s*$|-{3,}|/\w+/\w+")
+
+
+class PrefilterDecision(BaseModel):
+    """Score of one segment, the dominant kind of non-prose in it, and its line statistics."""
+    score: float
+    reason: str
+    features: Dict[str, int]
+
+
+def classify_lines(text: str) -> Dict[str, int]:
+    """
+    Characters per line kind, plus the number of prose words, for one segment.
+    """
+    chars = {kind: 0 for kind in LINE_KINDS}
+    prose_words = 0
+    in_fence = False
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("```"):
+            in_fence = not in_fence
+            chars["code"] += len(line)
+            continue
+        if in_fence or _CODE_RE.match(line):
+            kind = "code"
+        elif _CHATTER_RE.match(line):
+            kind = "chatter"
+        else:
+            # Table rows read as prose if one of their cells does
+            cells = line.split("\t")
+            words = max((_WORD_RE.findall(cell) for cell in cells), key=len)
+            letters = sum(len(w) for w in words)
+            text_chars = len(max(cells, key=len).replace(" ", ""))
+            if _GREETING_RE.match(line) and len(words) < 12:
+                kind = "chatter"
+            elif len(words) >= MIN_PROSE_LINE_WORDS and letters >= 0.7 * text_chars:
+                kind = "prose"
+                prose_words += sum(len(_WORD_RE.findall(cell)) for cell in cells)
+            elif _CODE_HINT_RE.search(line):
+                kind = "code"
+            else:
+                kind = "list"
+        chars[kind] += len(line)
+    return {**chars, "prose_words": prose_words}
+
+
+def score_segment(text: str) -> PrefilterDecision:
+    """Plausibility of a segment being a knowledge artifact, from 0 (none) to 1."""
+    features = classify_lines(text)
+    score = min(1.0, features["prose_words"] / PROSE_WORDS)
+    # Name the kind of content that crowded the prose out
+    reason = max(("code", "chatter", "list"), key=lambda kind: features[kind])
+    if not features[reason]:
+        reason = "too little text"
+    return PrefilterDecision(score=round(score, 3), reason=reason, features=features)
+
+
+class Prefilter:
+    """
+    Decides which segments are worth a model call, and logs the ones it skips.
+
+    Segments scoring below `threshold` are skipped. With `audit_rate` > 0,
+    that share of them (chosen by a hash of the text, so reruns pick the
+    same ones) is judged by the model anyway for measuring recall.
+    """
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        audit_path: Optional[str] = None,
+        audit_rate: float = 0.0,
+        audit_max_bytes: int = 10 * 1024 * 1024,
+    ):
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.audit_max_bytes = audit_max_bytes
+        self.audit_path = Path(audit_path) if audit_path else None
+        if self.audit_path is not None:
+            self.audit_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def check(self, text: str) -> PrefilterDecision:
+        return score_segment(text)
+
+    def skips(self, decision: PrefilterDecision) -> bool:
+        return decision.score < self.threshold
+
+    def sampled(self, text: str) -> bool:
+        """Whether a segment the filter would skip is sent to the model for auditing."""
+        return hash_sampled(text, self.audit_rate)
+
+    def log(self, seg: Dict[str, str], decision: PrefilterDecision, verdict: Optional[bool] = None):
+        """
+        Append a skipped (or, with `verdict`, an audited) segment to the audit log.
+        """
+        if self.audit_path is None:
+            return
+        record = {
+            "time": time.time(),
+            "segment_id": seg["id"],
+            "action": "skipped" if verdict is None else "audited",
+            "score": decision.score,
+            "threshold": self.threshold,
+            "reason": decision.reason,
+            "features": decision.features,
+            "text_sha256": hashlib.sha256(seg["text"].encode("utf-8")).hexdigest(),
+            "excerpt": seg["text"][:AUDIT_EXCERPT_CHARS],
+        }
+        if verdict is not None:
+            record["is_artifact"] = verdict
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                full = self.audit_path.stat().st_size >= self.audit_max_bytes
+            except FileNotFoundError:
+                full = False
+            if full:
+                # Start a new log; the previous one is kept as <path>.1
+                os.replace(self.audit_path, f"{self.audit_path}.1")
+            with open(self.audit_path, "a", encoding="utf-8") as fh:
+                fh.write(line)
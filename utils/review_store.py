@@ -0,0 +1,96 @@
+"""Persistent state of CLI review sessions.
+
+For every segment of a session that reached review, the store keeps its
+contour verdict, the order in which it arrived, the reviewer's decision
+(once made) and the knowledge_id of the artifact assembled from it.
+Segments are keyed by a hash of their text, which stays the same when the
+session is segmented again, so an interrupted review can be resumed without
+judging any segment twice.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+
+class ReviewStore:
+    """
+    SQLite-backed map of (session, text hash) to a segment's review state.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                session TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                verdict TEXT NOT NULL,
+                decision INTEGER,
+                knowledge_id TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (session, text_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, session: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Every recorded segment of a session by text hash, with its verdict,
+        seq, decision (None while undecided) and knowledge_id.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text_hash, seq, verdict, decision, knowledge_id FROM reviews WHERE session = ?",
+                (session,),
+            ).fetchall()
+        return {
+            text_hash: {
+                "seq": seq,
+                "verdict": json.loads(verdict),
+                "decision": None if decision is None else bool(decision),
+                "knowledge_id": knowledge_id,
+            }
+            for text_hash, seq, verdict, decision, knowledge_id in rows
+        }
+
+    def record(self, session: str, text_hash: str, seq: int, verdict: Dict[str, Any]):
+        """Store a segment's verdict, unless the segment is already recorded."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR IGNORE INTO reviews (session, text_hash, seq, verdict, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (session, text_hash, seq, json.dumps(verdict, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def decide(self, session: str, text_hash: str, accepted: bool):
+        """Record the reviewer's decision on a segment."""
+        self._update(session, text_hash, "decision", int(accepted))
+
+    def assembled(self, session: str, text_hash: str, knowledge_id: str):
+        """Record the artifact assembled from an accepted segment."""
+        self._update(session, text_hash, "knowledge_id", knowledge_id)
+
+    def _update(self, session: str, text_hash: str, column: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE reviews SET {column} = ?, updated_at = ? WHERE session = ? AND text_hash = ?",
+                (value, time.time(), session, text_hash),
+            )
+            self._conn.commit()
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        self._conn.close()
@@ -0,0 +1,15 @@
+"""Deterministic sampling of segments by content.
+
+Audits (the prefilter's would-be skips, the cascade's confident verdicts)
+pick their sample by a hash of the segment text rather than at random, so
+reruns over the same input audit the same segments.
+"""
+import hashlib
+
+
+def hash_sampled(text: str, rate: float) -> bool:
+    """Whether `text` falls in a `rate` share (0-1) of all texts, the same share every time."""
+    if rate <= 0:
+        return False
+    bucket = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big") / 2 ** 32
+    return bucket < rate
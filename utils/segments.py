@@ -0,0 +1,97 @@
+"""Compact segment representation for the pipeline.
+
+Segmenters produce {"id", "text"} dicts. segment_spans() turns them into
+SegmentSpan records as they are produced: the text is appended, UTF-8
+encoded, to one SessionBuffer shared by the whole session, and the record
+keeps only its id and (offset, length) in that buffer. The text is decoded
+again only where it is needed (the model call payload, local scoring and
+assembly). This keeps one compact copy of a session in memory while its
+segments are in flight, instead of one str per segment. A str holding a
+single emoji uses four bytes for every character, whereas UTF-8 uses one
+byte for ASCII.
+
+SegmentSpan supports seg["id"] and seg["text"], so code written for
+segment dicts accepts spans unchanged.
+"""
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+
+class SessionBuffer:
+    """Append-only UTF-8 text of a session's segments."""
+    __slots__ = ("_data",)
+
+    def __init__(self):
+        self._data = bytearray()
+
+    def append(self, text: str) -> Tuple[int, int]:
+        """Store `text` and return its (offset, length) in bytes."""
+        data = text.encode("utf-8")
+        offset = len(self._data)
+        self._data += data
+        return offset, len(data)
+
+    def read(self, offset: int, length: int) -> str:
+        return self._data[offset:offset + length].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SegmentSpan:
+    """
+    A segment as an id plus a span of a SessionBuffer. `chars` is the
+    length of the text in characters, available without decoding it.
+    """
+    __slots__ = ("id", "buffer", "offset", "length", "chars")
+
+    def __init__(self, id: str, buffer: SessionBuffer, offset: int, length: int, chars: int):
+        self.id = id
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+        self.chars = chars
+
+    @property
+    def text(self) -> str:
+        """The segment text, decoded from the buffer on every access."""
+        return self.buffer.read(self.offset, self.length)
+
+    def __getitem__(self, key: str) -> str:
+        if key == "id":
+            return self.id
+        if key == "text":
+            return self.text
+        raise KeyError(key)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"id": self.id, "text": self.text}
+
+    def __repr__(self) -> str:
+        return f"SegmentSpan(id={self.id!r}, offset={self.offset}, length={self.length})"
+
+
+Segment = Union[Dict[str, str], SegmentSpan]
+
+
+def segment_spans(
+    segments: Iterable[Dict[str, str]], buffer: Optional[SessionBuffer] = None
+) -> Iterator[SegmentSpan]:
+    """
+    Move each segment's text into `buffer` (a new one if not given) as the
+    segments are produced, yielding spans in their place.
+    """
+    buffer = buffer if buffer is not None else SessionBuffer()
+    for seg in segments:
+        text = seg["text"]
+        offset, length = buffer.append(text)
+        yield SegmentSpan(seg["id"], buffer, offset, length, len(text))
+
+
+def text_length(seg: Segment) -> int:
+    """Characters of segment text, without decoding a span."""
+    return seg.chars if isinstance(seg, SegmentSpan) else len(seg["text"])
+
+
+def as_dict(seg: Segment) -> Dict[str, str]:
+    """The segment as an {"id", "text"} dict, e.g. for a model call payload."""
+    return seg.to_dict() if isinstance(seg, SegmentSpan) else seg
@@ -0,0 +1,81 @@
+"""Per-thread ingestion state.
+
+For each (user_id, thread_id) the store keeps how many turns have been
+ingested (the watermark), a digest of those turns, the segmenter's open
+state and the knowledge_ids produced so far, so a re-POST of a grown thread
+only has to process the new turns. Updates are compare-and-set on the
+watermark, so two workers ingesting the same thread cannot both advance it.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class ThreadStateStore:
+    """
+    SQLite-backed map of (user_id, thread_id) to the thread's ingestion state.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS threads (
+                user_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                turn_count INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, thread_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, user_id: str, thread_id: str) -> Optional[Dict[str, Any]]:
+        """The stored state for a thread, or None if it was never ingested."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM threads WHERE user_id = ? AND thread_id = ?", (user_id, thread_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, user_id: str, thread_id: str, state: Dict[str, Any], expected_turns: Optional[int]) -> bool:
+        """
+        Store a thread's new state if its watermark is still `expected_turns`
+        (None: the thread must not exist yet). Returns False if another
+        writer got there first.
+        """
+        data = json.dumps(state, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            if expected_turns is None:
+                cur = self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO threads (user_id, thread_id, turn_count, state, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (user_id, thread_id, state["turn_count"], data, now),
+                )
+            else:
+                cur = self._conn.execute(
+                    """
+                    UPDATE threads SET turn_count = ?, state = ?, updated_at = ?
+                    WHERE user_id = ? AND thread_id = ? AND turn_count = ?
+                    """,
+                    (state["turn_count"], data, now, user_id, thread_id, expected_turns),
+                )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        self._conn.close()
@@ -0,0 +1,197 @@
+"""Persistent, content-addressed cache of contour verdicts.
+
+Verdicts are keyed by a hash of the segment text together with the contour
+agent's instructions, model, settings and output schema, so any change to the
+agent invalidates earlier entries. Entries are stored in SQLite and evicted
+by age and by total count.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def agent_fingerprint(agent: Any) -> str:
+    """
+    Hash the parts of an agent's configuration that influence its verdicts.
+    """
+    settings = agent.model_settings.to_json_dict() if agent.model_settings is not None else None
+    output_type = agent.output_type
+    schema = output_type.json_schema() if hasattr(output_type, "json_schema") else repr(output_type)
+    payload = json.dumps(
+        {
+            "instructions": agent.instructions,
+            "model": str(agent.model),
+            "model_settings": settings,
+            "output_schema": schema,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    SQLite-backed cache mapping (segment text, agent fingerprint) to a verdict.
+
+    Stored verdicts hold only the fields the model decided (is_artifact,
+    justification, diagnostic_flags); id and text are supplied by the caller.
+
+    Hits do not write: their last_used times are kept in memory and written
+    in one statement with the next put(), before eviction, on close(), or
+    once TOUCH_FLUSH_EVERY of them are pending.
+
+    The connection is shared by all threads and guarded by a lock. Every
+    method blocks on SQLite, so async callers run them in a worker thread,
+    a whole batch of keys per call (get_many() / put_many()).
+    """
+    # Run eviction after this many writes
+    EVICT_EVERY = 100
+    # Write pending last_used times once this many hits have accumulated
+    TOUCH_FLUSH_EVERY = 500
+
+    def __init__(self, path: str, max_entries: int = 100_000, max_age_seconds: float = 30 * 86400):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # key -> last_used time of hits not yet written
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                verdict TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str) -> str:
+        """Content address for a segment judged by an agent with the given fingerprint."""
+        h = hashlib.sha256()
+        h.update(fingerprint.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached verdict for `key`, or None on a miss or expired entry.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the cached verdicts of those `keys` that have a live entry;
+        the others count as misses.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT verdict, created_at FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.max_age_seconds:
+                    self.misses += 1
+                    continue
+                self._touched[key] = now
+                self.hits += 1
+                found[key] = json.loads(row[0])
+            if len(self._touched) >= self.TOUCH_FLUSH_EVERY:
+                self._write_touched()
+                self._conn.commit()
+        return found
+
+    def _write_touched(self):
+        """Write the pending last_used times, without committing. Called with the lock held."""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._conn.executemany(
+            "UPDATE verdicts SET last_used = ? WHERE key = ?", [(t, key) for key, t in touched.items()]
+        )
+
+    def put(self, key: str, verdict: Dict[str, Any]):
+        """
+        Store a verdict, replacing any existing entry for `key`.
+        """
+        self.put_many({key: verdict})
+
+    def put_many(self, verdicts: Dict[str, Dict[str, Any]]):
+        """
+        Store verdicts by key in one transaction, replacing existing entries.
+        """
+        if not verdicts:
+            return
+        with self._lock:
+            now = time.time()
+            for key in verdicts:
+                self._touched.pop(key, None)
+            self._write_touched()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, created_at, last_used) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(verdict, ensure_ascii=False), now, now) for key, verdict in verdicts.items()],
+            )
+            self._conn.commit()
+            writes = self._writes
+            self._writes += len(verdicts)
+            if self._writes // self.EVICT_EVERY > writes // self.EVICT_EVERY:
+                self._evict()
+
+    def evict(self):
+        """
+        Drop entries older than max_age_seconds, then the least recently used
+        entries beyond max_entries.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """evict() with the lock held."""
+        self._write_touched()
+        cutoff = time.time() - self.max_age_seconds
+        self._conn.execute("DELETE FROM verdicts WHERE created_at < ?", (cutoff,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                """
+                DELETE FROM verdicts WHERE key IN (
+                    SELECT key FROM verdicts ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for this process and the current number of entries."""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+    def close(self):
+        """
+        Write any pending last_used times and close the underlying SQLite connection.
+        """
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()